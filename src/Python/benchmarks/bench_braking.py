@@ -0,0 +1,143 @@
+"""
+Benchmark of predictive braking: the robot drives at a wall and is to stop
+10 cm from it, at several speeds. A plain stop on the distance reading is
+compared with move_until_distance braking predictively, which learns the
+stopping distance of each speed from the stops before it. Runs on a virtual
+clock, with the ultrasonic reading played by a wall at a fixed distance,
+sampled at 25 Hz as on the robot. The dummy motors stop dead the moment they
+are told to, so the wheels are played by a model which reacts to commands
+after a delay and brakes at a limited deceleration.
+
+Run from anywhere: python bench_braking.py
+
+Author: Jack McDonald
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+clock.set_clock(clock.VirtualClock())
+
+from chassis import Chassis
+from stop_conditions import distance_below
+
+START = 100  # (cm) Distance to the wall at the start of each run
+THRESHOLD = 10  # (cm)
+SAMPLE_PERIOD = 1 / 25  # (seconds) Period of the ultrasonic readings
+SPEEDS = (150, 300, 450)  # (deg per sec)
+RUNS = 4  # Predictive runs at each speed
+REACTION = 0.03  # (seconds) Delay before the wheels respond to a command
+DECELERATION = 1500  # (deg per sec^2) Largest change of speed of the wheels
+STEP = 0.001  # (seconds) Integration step of the wheel model
+
+
+class Wheels:
+    """Speed and position of both wheels, which follow the commanded speed after REACTION, at most DECELERATION."""
+
+    def __init__(self):
+        self.time = clock.monotonic()
+        self.speed = 0.0
+        self.target = 0.0
+        self.position = 0.0
+        self.commands = []
+
+    def command(self, speed: float):
+        self.commands.append((clock.monotonic() + REACTION, speed))
+
+    def advance(self):
+        now = clock.monotonic()
+        while self.time < now:
+            while self.commands and self.commands[0][0] <= self.time:
+                self.target = self.commands.pop(0)[1]
+            change = max(-DECELERATION * STEP, min(DECELERATION * STEP, self.target - self.speed))
+            self.speed += change
+            self.position += self.speed * STEP
+            self.time += STEP
+
+
+class Wheel:
+    """Stands in for a Motor, driven by the shared Wheels."""
+
+    def __init__(self, wheels: Wheels):
+        self.wheels = wheels
+
+    def set_dps(self, dps):
+        self.wheels.command(dps)
+
+    def set_power(self, power):
+        self.wheels.command(0 if power == 0 else self.wheels.speed)
+
+    def set_limits(self, power=0, dps=0):
+        pass
+
+    def get_encoder(self):
+        self.wheels.advance()
+        return self.wheels.position
+
+    def get_speed(self):
+        self.wheels.advance()
+        return 0 if abs(self.wheels.speed) < 1e-6 else self.wheels.speed
+
+
+class Wall:
+    """Plays the SensorHub, with a distance reading taken from how far the wheels have driven."""
+
+    def __init__(self):
+        self.chassis = None
+        self.origin = 0.0
+        self.reading = None
+        self.sampled = -1.0
+
+    def reset(self):
+        self.origin = self.travelled()
+        self.reading, self.sampled = None, -1.0
+
+    def travelled(self) -> float:
+        motors = self.chassis.MotorController
+        return (motors.motor_left.get_encoder() + motors.motor_right.get_encoder()) / 2 / motors.DISTANCE_TO_DEGREES
+
+    def gap(self) -> float:
+        return START - 100 * (self.travelled() - self.origin)
+
+    def get_value(self, name: str):
+        if name != "distance":
+            return None
+        if clock.monotonic() - self.sampled >= SAMPLE_PERIOD:
+            self.reading, self.sampled = self.gap(), clock.monotonic()
+        return self.reading
+
+
+class Robot:
+    def __init__(self):
+        self.sensor_hub = Wall()
+
+
+def main():
+    robot = Robot()
+    chassis = Chassis(robot)
+    wheels = Wheels()
+    chassis.MotorController.motor_left = chassis.MotorController.motor_right = Wheel(wheels)
+    robot.sensor_hub.chassis = chassis
+    wall = robot.sensor_hub
+    print(f"Stopping {THRESHOLD} cm from a wall {START} cm away (final gap, cm):")
+    for speed in SPEEDS:
+        wall.reset()
+        chassis.drive_until(distance_below(THRESHOLD), speed=speed)
+        plain = wall.gap()
+        gaps = []
+        for _ in range(RUNS):
+            wall.reset()
+            started = clock.monotonic()
+            chassis.move_until_distance(THRESHOLD, speed=speed)
+            gaps.append((wall.gap(), clock.monotonic() - started))
+        predicted = ", ".join(f"{gap:.1f} in {time:.2f} s" for gap, time in gaps)
+        print(f"  {speed} deg/s: plain stop {plain:.1f}, predictive {predicted}")
+    print("Learnt stopping distances (cm):",
+          ", ".join(f"{speed} deg/s {100 * chassis.braking.stopping_distance(speed):.1f}" for speed in SPEEDS))
+
+
+if __name__ == '__main__':
+    main()
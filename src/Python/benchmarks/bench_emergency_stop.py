@@ -0,0 +1,70 @@
+"""
+Benchmark of the press-to-motor-stop latency of EmergencyStop against the
+dummy brick.
+
+Each trial spins all four motors, starts a watcher, presses the fake touch
+sensor at a random point of the poll cycle and measures how long it takes
+until every motor reports zero power.
+
+Run from anywhere: python bench_emergency_stop.py [trials]
+
+Author: Jack McDonald
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from emergency_stop import EmergencyStop
+from project.utils import brick
+from project.utils.brick import TouchSensor, wait_ready_sensors
+
+TRIALS = 200
+PRESS_TIMEOUT = 1  # (seconds) Give up on a trial after this long
+
+
+def motors_stopped() -> bool:
+    return all(brick.BP.get_motor_status(brick.PORTS[port])[1] == 0 for port in EmergencyStop.MOTOR_PORTS)
+
+
+def run_trial(touch_sensor: TouchSensor) -> float:
+    brick.BP.set_sensor(brick.BP.PORT_1, 0)
+    for port in EmergencyStop.MOTOR_PORTS:
+        brick.BP.set_motor_power(brick.PORTS[port], 50)
+
+    emergency_stop = EmergencyStop(touch_sensor)
+    emergency_stop.start()
+    time.sleep(random.uniform(0.002, 0.01))
+
+    pressed = time.monotonic()
+    brick.BP.set_sensor(brick.BP.PORT_1, 1)
+    while not motors_stopped():
+        if time.monotonic() - pressed > PRESS_TIMEOUT:
+            raise RuntimeError("motors did not stop")
+    stopped = time.monotonic()
+
+    emergency_stop.stop()
+    return stopped - pressed
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else TRIALS
+    touch_sensor = TouchSensor(1)
+    wait_ready_sensors()
+
+    latencies = sorted(run_trial(touch_sensor) for _ in range(trials))
+    budget = EmergencyStop.LATENCY_BUDGET
+    print(f"Press-to-stop latency over {trials} trials (budget {budget * 1000:.1f} ms):")
+    print(f"  min    {latencies[0] * 1000:.3f} ms")
+    print(f"  mean   {statistics.mean(latencies) * 1000:.3f} ms")
+    print(f"  median {statistics.median(latencies) * 1000:.3f} ms")
+    print(f"  p99    {latencies[int(0.99 * (trials - 1))] * 1000:.3f} ms")
+    print(f"  max    {latencies[-1] * 1000:.3f} ms")
+    print(f"  over budget: {sum(latency > budget for latency in latencies)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark of frontier exploration as the arena grows. The robot starts in
+the middle of an unknown square arena scattered with furniture, and for a
+fixed number of steps drives to the target the explorer picks, finding the
+furniture next to each tile it reaches. The time to choose each target is
+reported for several arena sizes; it should hardly grow with the arena.
+
+Run from anywhere: python bench_explore.py [steps]
+
+Author: Jack McDonald
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from exploration import Explorer
+from grid import STEPS, Cell, Grid
+from navigation import Navigation
+
+SIDES = (25, 50, 100, 200)  # (tiles)
+STEPS_PER_RUN = 300
+FURNITURE = 0.2  # Share of the tiles holding furniture
+
+
+def explore(side: int, steps: int) -> list:
+    random.seed(side)
+    start = (side // 2, side // 2)
+    furniture = {(row, col) for row in range(side) for col in range(side)
+                 if random.random() < FURNITURE and (row, col) != start}
+    navigation = Navigation()
+    navigation.search_array = Grid(side, side)
+    navigation.search_array[start] = Cell.CURRENT
+    navigation.position = start
+    explorer = Explorer(navigation)
+
+    durations = []
+    for _ in range(steps):
+        started = time.perf_counter()
+        choice = explorer.next_target()
+        durations.append(time.perf_counter() - started)
+        if choice is None:
+            break
+        target, _ = choice
+        if target in furniture:
+            navigation.set_cell(*target, Cell.FURNITURE)
+            continue
+        navigation.update_position(*target)
+        for row_step, col_step in STEPS:
+            neighbour = (target[0] + row_step, target[1] + col_step)
+            if neighbour in furniture and navigation.search_array[neighbour] == Cell.UNSEARCHED:
+                navigation.set_cell(*neighbour, Cell.FURNITURE)
+    return durations
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else STEPS_PER_RUN
+    print(f"Choosing the next target, over {steps} steps, median / max:")
+    for side in SIDES:
+        durations = explore(side, steps)
+        print(f"  {side}x{side}: {statistics.median(durations) * 1000:.3f} / {max(durations) * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the speed governor: the colour sensor is read through a
+SensorHub at its default rate, with reads of increasing cost, and the governor
+reports the sample rate it measures and the speed it allows. Runs on a
+virtual clock, so a read costing more than the period slows the sampling
+down exactly as it would on the robot.
+
+Run from anywhere: python bench_governor.py
+
+Author: Jack McDonald
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+clock.set_clock(clock.VirtualClock())
+
+from chassis import DRIVE_RATE
+from sensor_hub import SensorHub
+from speed_governor import SpeedGovernor
+
+READ_COSTS = (0.0, 0.015, 0.03, 0.05, 0.1)  # (seconds) Time taken by each colour read
+DURATION = 2.0  # (seconds) Sampling time for each cost
+
+
+class Sensors:
+    """Stands in for the SensorController, with colour reads taking `cost` seconds."""
+    sensor_process = None
+
+    def __init__(self, cost: float):
+        self.cost = cost
+
+    def get_colour_name(self):
+        if self.cost:
+            clock.sleep(self.cost)
+        return "white"
+
+    def get_us_sensor_distance(self):
+        return 100
+
+    def get_touch_sensor_state(self):
+        return False
+
+
+def main():
+    print(f"Colour sampled at {SensorHub.DEFAULT_RATES['colour']} Hz, drive loop at {DRIVE_RATE} Hz, "
+          f"{SpeedGovernor.SAMPLES_PER_LINE} samples on a {100 * SpeedGovernor.LINE_WIDTH:.1f} cm line:")
+    sensors = Sensors(0.0)
+    hub = SensorHub(sensors, rates={"distance": 1, "touch": 1})
+    hub.start()
+    for cost in READ_COSTS:
+        sensors.cost = cost
+        governor = SpeedGovernor(hub, loop_rate=DRIVE_RATE)
+        clock.sleep(DURATION)
+        print(f"  read of {1000 * cost:4.0f} ms: {governor.sample_rate:6.1f} Hz measured, "
+              f"speed capped at {governor.speed_limit():.0f} deg/s")
+    # Let the last slow read finish on the virtual clock, which cannot move on while this thread joins the sampler
+    sensors.cost = 0.0
+    clock.sleep(max(READ_COSTS))
+    hub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark of gyro closed-loop turning: the robot makes a series of quarter
+turns, first with MotorController.rotate, which stops on an encoder angle,
+then with the GyroTurner, which stops on the heading the gyro measures.
+Runs on a virtual clock. The dummy motors do not model the robot turning at
+all, so the wheels are played by a model which reacts to commands after a
+delay, at a limited acceleration, and slips on the floor so the robot turns
+by only SLIP of what the encoders count. The gyro reads the heading of that
+model, clockwise and rounded to whole degrees as the EV3 gyro does.
+
+Run from anywhere: python bench_gyro_turn.py
+
+Author: Jack McDonald
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+clock.set_clock(clock.VirtualClock())
+
+from chassis import LEFT, RIGHT
+from gyro_turning import GyroTurner
+from motor import MotorController
+
+TURNS = (RIGHT, RIGHT, LEFT, RIGHT, LEFT, LEFT, RIGHT, RIGHT)
+SLIP = 0.93  # Heading turned over heading counted by the encoders
+REACTION = 0.01  # (seconds) Delay before a wheel responds to a command
+ACCELERATION = 1500  # (deg per sec^2) Largest change of speed of a wheel
+STEP = 0.001  # (seconds) Integration step of the wheel model
+
+
+class Wheel:
+    """Stands in for a Motor, in speed mode after set_dps and position mode after set_position_relative."""
+
+    def __init__(self):
+        self.time = clock.monotonic()
+        self.speed = 0.0
+        self.position = 0.0
+        self.mode = ("speed", 0.0)
+        self.limit = MotorController.SPEED_LIMIT
+        self.commands = []
+
+    def command(self, mode: str, value: float):
+        self.advance()
+        self.commands.append((clock.monotonic() + REACTION, (mode, value)))
+
+    def set_dps(self, dps):
+        self.command("speed", dps)
+
+    def set_power(self, power):
+        self.command("speed", 0.0)
+
+    def set_limits(self, power=0, dps=0):
+        self.limit = dps or self.limit
+
+    def set_position_relative(self, degrees):
+        self.advance()
+        self.command("position", self.position + degrees)
+
+    def get_encoder(self):
+        self.advance()
+        return self.position
+
+    def get_speed(self):
+        self.advance()
+        return 0 if abs(self.speed) < 1e-6 else self.speed
+
+    def advance(self):
+        now = clock.monotonic()
+        while self.time < now:
+            while self.commands and self.commands[0][0] <= self.time:
+                self.mode = self.commands.pop(0)[1]
+            mode, value = self.mode
+            if mode == "speed":
+                target = value
+            else:
+                error = value - self.position
+                braking = (2 * ACCELERATION * abs(error)) ** 0.5
+                target = (1 if error > 0 else -1) * min(self.limit, braking) if abs(error) > 0.5 else 0.0
+            change = max(-ACCELERATION * STEP, min(ACCELERATION * STEP, target - self.speed))
+            self.speed += change
+            self.position += self.speed * STEP
+            self.time += STEP
+
+
+class Gyro:
+    """Plays an EV3GyroSensor in "both" mode, reading the heading of the slipping wheels."""
+
+    def __init__(self, motors: MotorController):
+        self.motors = motors
+
+    def heading(self) -> float:
+        """Counter-clockwise, as the angles of MotorController.rotate."""
+        left, right = self.motors.motor_left.get_encoder(), self.motors.motor_right.get_encoder()
+        return SLIP * (right - left) / 2 / self.motors.ORIENTATION_TO_DEGREES
+
+    def get_both_measure(self):
+        rate = (self.motors.motor_left.get_speed() - self.motors.motor_right.get_speed()) / 2
+        return [int(round(-self.heading())), int(round(SLIP * rate / self.motors.ORIENTATION_TO_DEGREES))]
+
+
+def run(turn) -> tuple:
+    """Makes TURNS with `turn`, and returns the error of the heading after each and the total time."""
+    motors = MotorController()
+    motors.motor_left, motors.motor_right = Wheel(), Wheel()
+    gyro = Gyro(motors)
+    turner = GyroTurner(motors, gyro)
+    start, wanted, errors = clock.monotonic(), 0.0, []
+    for angle in TURNS:
+        turn(motors, turner, angle)
+        wanted += angle
+        errors.append(gyro.heading() - wanted)
+    return errors, clock.monotonic() - start
+
+
+def main():
+    print(f"{len(TURNS)} quarter turns, wheels turning the robot by {SLIP:.0%} of the encoder angle:")
+    encoder = run(lambda motors, turner, angle: motors.rotate(angle, motors.TRN_SPEED))
+    gyro = run(lambda motors, turner, angle: turner.turn(angle, motors.TRN_SPEED))
+    for name, (errors, time) in (("Encoder angle", encoder), ("Gyro heading", gyro)):
+        worst = max(abs(error) for error in errors)
+        print(f"  {name}: heading error after the last turn {errors[-1]:+.1f} deg, "
+              f"worst {worst:.1f} deg, {time / len(TURNS):.2f} s per turn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark of the PID line follower against driving open-loop, over two
+metres along the edge of a tile line, with the right wheel travelling 0.5%
+further than the left for the same rotation, as a worn tyre or a slipping
+wheel would. The robot, its wheels and the colour sensor are simulated
+kinematically, with the wheels following their commands with a small lag,
+so the benchmark needs no brick and runs in a moment.
+
+Run from anywhere: python bench_line_following.py
+
+Author: Jack McDonald
+"""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from chassis import DRIVE_RATE
+from line_following import LEFT_EDGE, LineFollower
+from motor import MotorController
+from stop_conditions import SensorSnapshot
+
+DISTANCE = 2.0  # (metres)
+SPEEDS = (100, 250, 400)  # (deg per sec)
+RIGHT_WHEEL_GAIN = 1.005 # Travel of the right wheel relative to the left
+WHEEL_LAG = 0.05  # (seconds) Time constant of the wheel speed following its command
+LINE_WIDTH = 0.02  # (metres) The line lies between y = 0 and y = LINE_WIDTH, on the robot's left
+SPOT = 0.01  # (metres) Width of the patch of floor the colour sensor sees
+SENSOR_AHEAD = 0.05  # (metres) Distance of the colour sensor ahead of the wheel axle
+SUBSTEPS = 10  # Integration steps per tick of the drive loop
+START_OFFSET = -0.005  # (metres) The robot starts 5 mm off the edge, over the floor
+
+
+class Wheel:
+    def __init__(self):
+        self.command = 0.0
+        self.speed = 0.0
+
+    def set_dps(self, dps):
+        self.command = dps
+
+
+class Drive:
+    """Stands in for the MotorController, with a robot which moves as its wheels turn."""
+
+    def __init__(self):
+        self.motor_left = Wheel()
+        self.motor_right = Wheel()
+        self.x = self.theta = 0.0
+        self.y = START_OFFSET
+
+    def set_wheel_speeds(self, left, right):
+        self.motor_left.set_dps(left)
+        self.motor_right.set_dps(right)
+
+    def step(self, dt: float):
+        to_metres = 1 / MotorController.DISTANCE_TO_DEGREES
+        track = 2 * MotorController.AXLE_LENGTH
+        for wheel in (self.motor_left, self.motor_right):
+            wheel.speed += (wheel.command - wheel.speed) * dt / WHEEL_LAG
+        left = self.motor_left.speed * to_metres
+        right = self.motor_right.speed * to_metres * RIGHT_WHEEL_GAIN
+        self.theta += (right - left) / track * dt
+        self.x += (left + right) / 2 * math.cos(self.theta) * dt
+        self.y += (left + right) / 2 * math.sin(self.theta) * dt
+
+    def reflectance(self) -> float:
+        # Fraction of the patch under the sensor which is floor rather than line
+        y = self.y + SENSOR_AHEAD * math.sin(self.theta)
+        overlap = max(0.0, min(y + SPOT / 2, LINE_WIDTH) - max(y - SPOT / 2, 0.0))
+        return 1 - overlap / SPOT
+
+
+def run(speed: float, follow: bool):
+    drive = Drive()
+    follower = LineFollower(drive, drive.reflectance, LEFT_EDGE)
+    dt = 1 / DRIVE_RATE
+    elapsed, worst = 0.0, 0.0
+    drive.motor_left.set_dps(speed)
+    drive.motor_right.set_dps(speed)
+    while drive.x < DISTANCE:
+        if follow:
+            follower(SensorSnapshot(None, None, None, drive.x, elapsed), speed)
+        for _ in range(SUBSTEPS):
+            drive.step(dt / SUBSTEPS)
+        elapsed += dt
+        worst = max(worst, abs(drive.y))
+    return drive.y, worst, math.degrees(drive.theta)
+
+
+def main():
+    print(f"Over {DISTANCE} m, right wheel travelling {100 * (RIGHT_WHEEL_GAIN - 1):.1f}% further, "
+          f"starting {1000 * abs(START_OFFSET):.0f} mm off the edge (final offset / worst offset / final heading):")
+    for speed in SPEEDS:
+        for name, follow in (("open loop", False), ("following", True)):
+            offset, worst, heading = run(speed, follow)
+            print(f"  {speed} deg/s {name:10}: {1000 * offset:6.1f} mm / {1000 * worst:6.1f} mm / {heading:6.2f} deg")
+
+
+if __name__ == '__main__':
+    main()
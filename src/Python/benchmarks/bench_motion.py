@@ -0,0 +1,83 @@
+"""
+Benchmark of driving a route of tiles and turns with the MotionQueue,
+which blends from one move into the next, against the MotorController
+calls that stop completely after every move. Both run against the dummy
+brick on a virtual clock, so the times are mission seconds.
+
+Each is reported with its dead time, the time it takes beyond what the
+wheels need to travel the route at their commanded speeds. The dummy motors
+move in steps of THREAD_INTERVAL, so that travel is counted in whole steps
+per move, and stop dead on their target, so the dead time here is only the
+wait for each move to be seen complete; on the robot, each stop also
+decelerates and settles, which the blended moves skip as well.
+
+Run from anywhere: python bench_motion.py
+
+Author: Jack McDonald
+"""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+clock.set_clock(clock.VirtualClock())
+
+from chassis import TURN_ANGLES
+from motion import MotionQueue
+from motor import MotorController
+from navigation import FORWARD, TURN_LEFT, TURN_RIGHT
+from project.utils.dummy import _FakeMotor
+
+# Zigzags across the arena, so most moves are followed by a change of direction
+ROUTE = [FORWARD, TURN_RIGHT, FORWARD, TURN_LEFT, FORWARD, TURN_LEFT, FORWARD, TURN_RIGHT,
+         FORWARD, TURN_RIGHT, TURN_RIGHT, FORWARD]
+
+
+def travel_time(motors: MotorController) -> float:
+    """Time the dummy wheels take to travel the route at their commanded speeds, with no time lost between moves."""
+    def steps(degrees, speed):
+        return math.ceil(abs(degrees) / speed / _FakeMotor.THREAD_INTERVAL) * _FakeMotor.THREAD_INTERVAL
+
+    tile = steps(motors.SQUARE_LENGTH * motors.DISTANCE_TO_DEGREES, motors.FWD_SPEED)
+    turns = {primitive: steps(angle * motors.ORIENTATION_TO_DEGREES, motors.TRN_SPEED)
+             for primitive, angle in TURN_ANGLES.items()}
+    return sum(tile if primitive == FORWARD else turns[primitive] for primitive in ROUTE)
+
+
+def one_move_at_a_time(motors: MotorController) -> float:
+    start = clock.monotonic()
+    for primitive in ROUTE:
+        if primitive == FORWARD:
+            motors.move_distance_forward(motors.SQUARE_LENGTH, motors.FWD_SPEED)
+        else:
+            motors.rotate(TURN_ANGLES[primitive], motors.TRN_SPEED)
+    return clock.monotonic() - start
+
+
+def blended(motors: MotorController) -> float:
+    queue = MotionQueue(motors)
+    for primitive in ROUTE:
+        if primitive == FORWARD:
+            queue.straight(motors.SQUARE_LENGTH, motors.FWD_SPEED)
+        else:
+            queue.rotate(TURN_ANGLES[primitive], motors.TRN_SPEED)
+    start = clock.monotonic()
+    queue.run()
+    return clock.monotonic() - start
+
+
+def main():
+    motors = MotorController()
+    travel = travel_time(motors)
+    print(f"Route of {ROUTE.count(FORWARD)} tiles and {len(ROUTE) - ROUTE.count(FORWARD)} turns, "
+          f"{travel:.2f} s of travel:")
+    for name, run in (("one move at a time", one_move_at_a_time), ("blended", blended)):
+        elapsed = run(motors)
+        print(f"  {name + ':':19} {elapsed:.2f} s, {elapsed - travel:.2f} s dead time")
+
+
+if __name__ == '__main__':
+    main()
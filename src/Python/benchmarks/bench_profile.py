@@ -0,0 +1,57 @@
+"""
+Benchmark of the profiled moves of the MotorController, which stream the
+speed setpoints of an S-curve at a raised peak speed, against the moves at
+a constant FWD_SPEED and TRN_SPEED. Both run against the dummy brick on a
+virtual clock, so the times are mission seconds. The dummy motors switch
+speed instantly, so the constant-speed moves get their steps in torque for
+free here; on the robot those are what keep FWD_SPEED and TRN_SPEED low.
+
+Run from anywhere: python bench_profile.py
+
+Author: Jack McDonald
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+clock.set_clock(clock.VirtualClock())
+
+from chassis import LEFT
+from motor import MotorController
+
+
+def timed(move, *args) -> float:
+    start = clock.monotonic()
+    move(*args)
+    return clock.monotonic() - start
+
+
+def largest_step(speeds, rate: float) -> float:
+    """Largest change between consecutive setpoints, as an acceleration."""
+    speeds = [0.0] + list(speeds) + [0.0]
+    return max(abs(after - before) for before, after in zip(speeds, speeds[1:])) * rate
+
+
+def main():
+    motors = MotorController()
+    tile = motors.SQUARE_LENGTH * motors.DISTANCE_TO_DEGREES
+    turn = LEFT * motors.ORIENTATION_TO_DEGREES
+    for name, degrees, speed, turning in (("tile", tile, motors.PROFILED_FWD_SPEED, False),
+                                          ("turn", turn, motors.PROFILED_TRN_SPEED, True)):
+        profile = motors.profile(degrees, speed, turning)
+        print(f"{name} profile: {len(profile)} setpoints over {profile.duration:.2f} s, "
+              f"peak {max(profile.speeds):.0f} deg/s, largest step {largest_step(profile.speeds, motors.PROFILE_RATE):.0f} deg/s^2")
+
+    print("One tile:")
+    print(f"  constant {motors.FWD_SPEED} deg/s:      {timed(motors.move_distance_forward, motors.SQUARE_LENGTH, motors.FWD_SPEED):.2f} s")
+    print(f"  profiled, peak {motors.PROFILED_FWD_SPEED} deg/s: {timed(motors.move_distance_profiled, motors.SQUARE_LENGTH):.2f} s")
+    print("Quarter turn:")
+    print(f"  constant {motors.TRN_SPEED} deg/s:      {timed(motors.rotate, LEFT, motors.TRN_SPEED):.2f} s")
+    print(f"  profiled, peak {motors.PROFILED_TRN_SPEED} deg/s: {timed(motors.rotate_profiled, LEFT):.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of replanning when furniture is discovered on the route, on a
+square arena much larger than the real one. The robot drives towards the
+far corner, and every few tiles a tile just ahead of it turns out to be
+furniture. Each time, the incremental planner repairs its plan, and a
+breadth-first search from scratch is timed for comparison.
+
+Run from anywhere: python bench_replan.py [arena side in tiles]
+
+Author: Jack McDonald
+"""
+import os
+import statistics
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from dstar_lite import DStarLite
+from grid import Cell, Grid
+
+SIDE = 200  # (tiles)
+DISCOVERIES = 50
+
+
+def breadth_first(grid: Grid, start: tuple, goal: tuple):
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        tile = queue.popleft()
+        if tile == goal:
+            return distances[tile]
+        for neighbour in grid.neighbours(tile):
+            if neighbour not in distances:
+                distances[neighbour] = distances[tile] + 1
+                queue.append(neighbour)
+    return None
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else SIDE
+    grid = Grid(side, side)
+    goal = (side - 1, side - 1)
+    planner = DStarLite(side, side, grid.is_free, (0, 0), goal)
+
+    started = time.perf_counter()
+    planner.next_tile()
+    print(f"Arena {side}x{side}, initial plan: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    incremental, scratch = [], []
+    for _ in range(DISCOVERIES):
+        planner.move_to(planner.next_tile())
+        ahead = planner.path()[2]
+        grid[ahead] = Cell.FURNITURE
+
+        started = time.perf_counter()
+        planner.update_tile(ahead)
+        planner.next_tile()
+        incremental.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        breadth_first(grid, planner.start, goal)
+        scratch.append(time.perf_counter() - started)
+
+    print(f"Replanning after {DISCOVERIES} discoveries, median / max:")
+    print(f"  D* Lite repair: {statistics.median(incremental) * 1000:.3f} / {max(incremental) * 1000:.3f} ms")
+    print(f"  from scratch:   {statistics.median(scratch) * 1000:.3f} / {max(scratch) * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the time the robot takes to bring its sensors up, one sensor
+at a time as the sensor modules used to on import, against the device
+registry, which configures every port first and then waits for all of the
+sensors together.
+
+The dummy brick is told to keep each newly configured sensor in the
+CONFIGURING state for a while, as real EV3 sensors do.
+
+Run from anywhere: python bench_startup.py [configure time in seconds]
+
+Author: Jack McDonald
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+started = time.monotonic()
+import robot  # noqa: F401  Registers the sensors without creating them
+imported = time.monotonic()
+
+from project.utils import brick
+from project.utils.brick import EV3ColorSensor, EV3UltrasonicSensor, TouchSensor
+from project.utils.devices import DeviceRegistry
+
+CONFIGURE_TIME = 0.5  # (seconds)
+SENSORS = {
+    "touch": lambda: TouchSensor(1),
+    "colour": lambda: EV3ColorSensor(2),
+    "ultrasonic": lambda: EV3UltrasonicSensor(3),
+}
+
+
+def one_at_a_time() -> float:
+    start = time.monotonic()
+    for factory in SENSORS.values():
+        factory().wait_ready()
+    return time.monotonic() - start
+
+
+def registry() -> float:
+    devices = DeviceRegistry()
+    for name, factory in SENSORS.items():
+        devices.register(name, factory)
+    start = time.monotonic()
+    devices.initialize()
+    return time.monotonic() - start
+
+
+def main():
+    if not hasattr(brick.BP, "CONFIGURE_TIME"):
+        sys.exit("This benchmark needs the dummy brick")
+    brick.BP.CONFIGURE_TIME = float(sys.argv[1]) if len(sys.argv) > 1 else CONFIGURE_TIME
+
+    print(f"Importing robot.py: {(imported - started) * 1000:.1f} ms")
+    print(f"Sensor configure time {brick.BP.CONFIGURE_TIME:.2f} s each:")
+    print(f"  one at a time: {one_at_a_time():.3f} s")
+    print(f"  registry:      {registry():.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Measures how long the route primitives take on the robot, for the cost
+model the navigation plans its routes with: one tile forward, a quarter
+turn and a half turn at the speeds the chassis uses. Each move is timed
+a few times and the median is kept.
+
+Run on the robot: python calibrate_route_costs.py [repetitions]
+With --virtual the moves run against the dummy brick on a virtual clock,
+which checks the script quickly but only reflects the dummy motors.
+
+Author: Jack McDonald
+"""
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+if "--virtual" in sys.argv:
+    sys.argv.remove("--virtual")
+    clock.set_clock(clock.VirtualClock())
+
+from motor import MotorController
+
+REPETITIONS = 3
+
+
+def measure(move, repetitions: int) -> float:
+    durations = []
+    for _ in range(repetitions):
+        start = clock.monotonic()
+        move()
+        durations.append(clock.monotonic() - start)
+    return statistics.median(durations)
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else REPETITIONS
+    motors = MotorController()
+    forward = measure(lambda: motors.move_distance_forward(motors.SQUARE_LENGTH, motors.FWD_SPEED), repetitions)
+    turn = measure(lambda: motors.rotate(90, motors.TRN_SPEED), repetitions)
+    around = measure(lambda: motors.rotate(180, motors.TRN_SPEED), repetitions)
+
+    print(f"One tile forward: {forward:.2f} s")
+    print(f"Quarter turn:     {turn:.2f} s")
+    print(f"Half turn:        {around:.2f} s")
+    print(f"navigation.set_costs(forward_time={forward:.2f}, turn_time={turn:.2f}, around_time={around:.2f})")
+
+
+if __name__ == '__main__':
+    main()
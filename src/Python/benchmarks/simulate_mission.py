@@ -0,0 +1,81 @@
+"""
+Runs a complete mission against the dummy brick on a virtual clock, and
+reports how much faster than real time it ran.
+
+A small world model plays the arena: it watches the robot's state and sets
+the colour and ultrasonic readings each state waits for, a short (virtual)
+while after the state is entered. Virtual time only advances when every
+thread of the robot is waiting on the clock, so the mission timings
+printed at the end are the same from one run to the next, whatever the
+load on the host.
+
+Run from anywhere: python simulate_mission.py [--real] [--profiled]
+With --real the same mission runs on the wall clock, for comparison.
+With --profiled the robot turns and moves fixed distances along velocity
+profiles.
+
+Author: Jack McDonald
+"""
+import builtins
+import os
+import sys
+import time
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from project.utils import clock
+
+if "--real" not in sys.argv:
+    # Must be installed before the brick is imported, so the dummy motors run on it too
+    clock.set_clock(clock.VirtualClock())
+
+from project.utils import brick
+from robot import Robot
+
+YELLOW = (491, 477, 31, 0)
+RED = (695, 205, 99, 0)
+WHITE = (416, 403, 181, 0)
+FAR = 200  # (cm)
+NEAR = 2  # (cm)
+REACTION_TIME = 0.15  # (seconds) Time after entering a state before the world changes
+WORLD_PERIOD = 0.01  # (seconds)
+
+
+def world(robot: Robot):
+    bp = brick.BP
+    last_state = None
+    while not robot.state_machine.is_finished():
+        state = robot.state
+        if state != last_state:
+            clock.sleep(REACTION_TIME)
+            if state.endswith("MoveToLine"):
+                bp.set_sensor(bp.PORT_2, YELLOW)
+            elif state.endswith("MoveToWall") or state.endswith("MoveToExit"):
+                bp.set_sensor(bp.PORT_3, NEAR)
+            elif state == "Search":
+                bp.set_sensor(bp.PORT_2, RED)
+            else:
+                bp.set_sensor(bp.PORT_2, WHITE)
+                bp.set_sensor(bp.PORT_3, FAR)
+            last_state = state
+        clock.sleep(WORLD_PERIOD)
+
+
+def main():
+    builtins.input = lambda prompt="": ""  # Nobody is there to press Enter
+    robot = Robot(profiled="--profiled" in sys.argv)
+    thread = Thread(target=world, args=(robot,), daemon=True, name="world")
+    clock.attach(thread)
+    thread.start()
+
+    started, started_wall = clock.monotonic(), time.monotonic()
+    robot.run()
+    mission, wall = clock.monotonic() - started, time.monotonic() - started_wall
+    robot.stop()
+
+    print(f"Mission time {mission:.2f} s, wall time {wall:.2f} s, {mission / wall:.1f}x real time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from motor import MotorController
+
+
+class BrakingModel:
+    """
+    Learns how long and how far the robot takes to stop from each speed, so
+    stops can be triggered early enough to end on the threshold rather than
+    past it.
+
+    Every stop made by Chassis.drive_until is recorded, as the time and the
+    distance from the snapshot that triggered it to the wheels coming to
+    rest. This covers the whole chain: the age of the reading, the loop
+    period, the motor command and the braking itself. Measurements are
+    grouped by speed in SPEED_BUCKET ranges and smoothed with a running
+    average, as single stops vary with the floor and the battery.
+
+    Between measured speeds, the stopping distance is interpolated, from zero
+    at rest. Above the fastest measured speed, it is scaled up with the
+    square of the speed, which never underestimates as the part of the
+    distance covered before braking only grows linearly. Until anything has
+    been measured, DEFAULT_LATENCY and DEFAULT_DECELERATION are assumed.
+
+    :ivar measurements: Smoothed (latency, distance) of the stops measured at each speed.
+    :type measurements: dict[int, tuple[float, float]]
+    Author: Jack McDonald
+    """
+    DEFAULT_LATENCY = 0.05  # (seconds) Time from a triggering reading to the wheels braking, until measured
+    DEFAULT_DECELERATION = 2000  # (deg per sec^2) Deceleration of the wheels once braking, until measured
+    SMOOTHING = 0.25  # Weight of a new measurement in the running average of its speed
+    SPEED_BUCKET = 10  # (deg per sec) Width of the speed ranges measurements are grouped in
+    MIN_SPEED = 30  # (deg per sec) Slowest approach speed, so the robot still reaches its threshold
+
+    def __init__(self, distance_to_degrees: float = MotorController.DISTANCE_TO_DEGREES):
+        """
+        :param distance_to_degrees: Degrees of wheel rotation per metre travelled.
+        :type distance_to_degrees: float
+        Author: Jack McDonald
+        """
+        self.distance_to_degrees = distance_to_degrees
+        self.measurements = {}
+
+    def record(self, speed: float, latency: float, distance: float):
+        """
+        Adds a measured stop.
+
+        :param speed: Speed of the wheels when the stop was triggered, in degrees per second.
+        :type speed: float
+        :param latency: Time from the triggering snapshot to the wheels coming to rest, in seconds.
+        :type latency: float
+        :param distance: Distance travelled over that time, in metres.
+        :type distance: float
+        :return: None
+        Author: Jack McDonald
+        """
+        bucket = self.__bucket(speed)
+        if bucket <= 0:
+            return
+        if bucket in self.measurements:
+            old_latency, old_distance = self.measurements[bucket]
+            latency = old_latency + self.SMOOTHING * (latency - old_latency)
+            distance = old_distance + self.SMOOTHING * (distance - old_distance)
+        self.measurements[bucket] = (latency, max(0.0, distance))
+
+    def latency(self, speed: float) -> float:
+        """The time (s) the robot takes to stop from `speed`, from the reading that triggers it."""
+        if not self.measurements:
+            return self.DEFAULT_LATENCY + abs(speed) / self.DEFAULT_DECELERATION
+        speeds = sorted(self.measurements)
+        speed = min(max(abs(speed), speeds[0]), speeds[-1])
+        return self.__interpolate(speeds, speed, 0)
+
+    def stopping_distance(self, speed: float) -> float:
+        """The distance (m) the robot travels while stopping from `speed`, from the reading that triggers it."""
+        speed = abs(speed)
+        if not self.measurements:
+            degrees = speed * self.DEFAULT_LATENCY + speed ** 2 / (2 * self.DEFAULT_DECELERATION)
+            return degrees / self.distance_to_degrees
+        speeds = sorted(self.measurements)
+        if speed >= speeds[-1]:
+            return self.measurements[speeds[-1]][1] * (speed / speeds[-1]) ** 2
+        return self.__interpolate([0] + speeds, speed, 1)
+
+    def braking_speed(self, remaining: float, max_speed: float) -> float:
+        """
+        The highest speed, up to `max_speed`, from which the robot still stops
+        within `remaining` metres, but never below MIN_SPEED.
+
+        :param remaining: Distance left to the threshold, in metres.
+        :type remaining: float
+        :param max_speed: Speed to use when there is room to stop from it, in degrees per second.
+        :type max_speed: float
+        :return: The speed, in degrees per second.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        if self.stopping_distance(max_speed) <= remaining:
+            return max_speed
+        # The stopping distance grows with the speed, so bisect for the fastest one that fits
+        low, high = 0.0, max_speed
+        for _ in range(30):
+            middle = (low + high) / 2
+            low, high = (middle, high) if self.stopping_distance(middle) <= remaining else (low, middle)
+        return min(max_speed, max(self.MIN_SPEED, low))
+
+    def __bucket(self, speed: float) -> int:
+        return int(round(abs(speed) / self.SPEED_BUCKET)) * self.SPEED_BUCKET
+
+    def __interpolate(self, speeds: list, speed: float, field: int) -> float:
+        values = [0.0 if known == 0 else self.measurements[known][field] for known in speeds]
+        for (low, low_value), (high, high_value) in zip(zip(speeds, values), zip(speeds[1:], values[1:])):
+            if speed <= high:
+                return low_value + (high_value - low_value) * (speed - low) / (high - low)
+        return values[-1]
@@ -1,14 +1,26 @@
+import math
+
+from braking import BrakingModel
+from line_following import LEFT_EDGE, LineFollower
+from motion import MotionQueue
 from motor import MotorController
+from navigation import FORWARD, TURN_AROUND, TURN_LEFT, TURN_RIGHT
+from project.utils import clock
+from scheduler import AsyncRate, Rate
+from stop_conditions import Condition, Outcome, SensorSnapshot, colour_is, distance_below
 import time
 
 #define constants pertaining to robot turning (in the functions turn_right(), turn_left(), and turn_around())
 LEFT = 90 #positive constant for left turn
 RIGHT = -90 #negative constant for right turn
 AROUND = 180
+TURN_ANGLES = {TURN_LEFT: LEFT, TURN_RIGHT: RIGHT, TURN_AROUND: AROUND}  # Rotation of each turn of a route
 
 # Constants for movement tuning
 OVERRUN_DISTANCE = 15   # meters to move past the line (adjust based on robot size)
 TIMEOUT = 5 #timeout constant for one tile forward move
+DRIVE_RATE = 100  # (Hz) Rate at which drive_until evaluates its stop conditions
+CALIBRATION_SWEEP = 20  # (degrees) How far the robot turns to either side to sweep the colour sensor across a line
 
 class Chassis:
     """
@@ -35,27 +47,165 @@ class Chassis:
         :Attributes:
             MotorController (MotorController): An instance of the 
             MotorController class, initialized when creating this class.
+            braking (BrakingModel): Learns the stopping distance of the
+            robot from every stop of `drive_until`.
+            speed_governor (SpeedGovernor): Caps the speed of governed moves to
+            what the colour sampling can keep up with, once the robot sets it.
+            gyro_turner (GyroTurner): When set, turns stop on the heading the
+            gyro measures rather than on an encoder angle.
+            profiled (bool): When set, encoder turns and fixed distance moves
+            follow a velocity profile, at the higher PROFILED speeds.
         Author: Jack McDonald
         """
         self.MotorController = MotorController()
         self.robot = robot
+        self.braking = BrakingModel(self.MotorController.DISTANCE_TO_DEGREES)
+        self.speed_governor = None
+        self.gyro_turner = None
+        self.profiled = False
+
+    def drive_until(self, *conditions: Condition, speed: float = None, governor=None,
+                    anticipate: bool = False) -> Outcome:
+        """
+        Drives forward until one of the stop conditions holds, then stops.
+
+        Every condition is evaluated at DRIVE_RATE on the same SensorSnapshot,
+        which gathers the latest readings of the SensorHub with the distance
+        travelled by the wheels and the time elapsed, so one loop covers any
+        mix of colours, distances, encoder travel, time and touch without a
+        polling thread per sensor. Once a condition fires, the motors are
+        stopped and the wheels waited on, for at most
+        MotorController.SETTLE_TIMEOUT, and the distance they travelled past
+        the point where it became true is reported as the overshoot.
+
+        The time and distance from the snapshot that fired to the wheels
+        coming to rest are recorded in `braking`, under the wheel speed
+        measured when it fired. With `anticipate`, conditions
+        on distances fire that far ahead of holding, for the current speed, so
+        the robot comes to rest on the threshold rather than past it.
+
+        Example:
+        chassis.drive_until(colour_is("black"), travelled(0.6), elapsed(5))
+
+        :param conditions: The conditions to stop on, checked in the given order.
+        :type conditions: Condition
+        :param speed: Speed of the wheels in degrees per second, or None to
+            drive as MotorController.move_forward does.
+        :type speed: float
+        :param governor: Optional callable receiving each snapshot and the
+            current speed, and returning the speed to drive at until the next one.
+        :type governor: Callable[[SensorSnapshot, float], float]
+        :param anticipate: Whether to stop early by the stopping distance.
+        :type anticipate: bool
+        :return: Which condition fired, the snapshot it fired on and the overshoot.
+        :rtype: Outcome
+        :raises ValueError: If no condition is given, as the robot would never stop.
+        Author: Jack McDonald
+        """
+        if not conditions:
+            raise ValueError("drive_until needs at least one stop condition")
+        start = self.__start_drive(speed)
+        speed = self.MotorController.FWD_SPEED if speed is None else speed
+        rate = Rate(DRIVE_RATE)
+        try:
+            while True:
+                self.MotorController.check_halted()
+                snapshot = self.__snapshot(start)
+                fired = self.__first_holding(conditions, snapshot, speed if anticipate else 0)
+                if fired is not None:
+                    trigger_speed = self.__wheel_speed()
+                    self.MotorController.stop()
+                    settled = self.__wait_stopped()
+                    return self.__outcome(fired, snapshot, start, trigger_speed, settled)
+                speed = self.__govern(governor, snapshot, speed)
+                rate.sleep()
+        finally:
+            self.MotorController.stop()
+
+    async def drive_until_async(self, *conditions: Condition, speed: float = None, governor=None,
+                                anticipate: bool = False) -> Outcome:
+        """
+        Drives forward until one of the stop conditions holds, awaiting each
+        tick instead of blocking. See `drive_until`.
+
+        :param conditions: The conditions to stop on, checked in the given order.
+        :type conditions: Condition
+        :param speed: Speed of the wheels in degrees per second, or None to
+            drive as MotorController.move_forward does.
+        :type speed: float
+        :param governor: Optional callable receiving each snapshot and the
+            current speed, and returning the speed to drive at until the next one.
+        :type governor: Callable[[SensorSnapshot, float], float]
+        :param anticipate: Whether to stop early by the stopping distance.
+        :type anticipate: bool
+        :return: Which condition fired, the snapshot it fired on and the overshoot.
+        :rtype: Outcome
+        :raises ValueError: If no condition is given, as the robot would never stop.
+        Author: Jack McDonald
+        """
+        if not conditions:
+            raise ValueError("drive_until needs at least one stop condition")
+        start = self.__start_drive(speed)
+        speed = self.MotorController.FWD_SPEED if speed is None else speed
+        rate = AsyncRate(DRIVE_RATE)
+        try:
+            while True:
+                self.MotorController.check_halted()
+                snapshot = self.__snapshot(start)
+                fired = self.__first_holding(conditions, snapshot, speed if anticipate else 0)
+                if fired is not None:
+                    trigger_speed = self.__wheel_speed()
+                    self.MotorController.stop()
+                    settled = await self.__wait_stopped_async()
+                    return self.__outcome(fired, snapshot, start, trigger_speed, settled)
+                speed = self.__govern(governor, snapshot, speed)
+                await rate.sleep()
+        finally:
+            self.MotorController.stop()
 
-    def move_until_colour(self, colour: str):
+    def move_until_colour(self, colour: str, speed: float = None, governed: bool = False):
         """
         Moves the robot until the specified colour is detected. The movement stops when the given
         colour is identified. This function assumes a mechanism to detect colours and halts operation
         when the desired condition is fulfilled.
 
+        When governed, the speed is set by the `speed_governor` instead, and
+        follows the rate the colour samples actually arrive at throughout the move.
+        Without a `speed_governor`, a governed move drives at `speed`.
+
         :param colour: The target colour to be detected during the movement.
         :type colour: str
+        :param speed: Speed of the wheels in degrees per second, or None for the default drive.
+        :type speed: float
+        :param governed: Whether to drive at the speed allowed by the `speed_governor`.
+        :type governed: bool
         :return: None
         """
-        self.MotorController.move_forward()
-        while self.robot.get_colour() != colour:
-            pass
-        self.MotorController.stop()
+        if governed and self.speed_governor is not None:
+            self.drive_until(colour_is(colour), speed=self.speed_governor.speed_limit(), governor=self.speed_governor)
+        else:
+            self.drive_until(colour_is(colour), speed=speed)
+
+    async def move_until_colour_async(self, colour: str, speed: float = None, governed: bool = False):
+        """
+        Moves the robot until the specified colour is detected, awaiting the
+        colour on the event loop instead of blocking. See `move_until_colour`.
 
-    def move_until_distance(self, distance: int):
+        :param colour: The target colour to be detected during the movement.
+        :type colour: str
+        :param speed: Speed of the wheels in degrees per second, or None for the default drive.
+        :type speed: float
+        :param governed: Whether to drive at the speed allowed by the `speed_governor`.
+        :type governed: bool
+        :return: None
+        """
+        if governed and self.speed_governor is not None:
+            await self.drive_until_async(colour_is(colour), speed=self.speed_governor.speed_limit(),
+                                         governor=self.speed_governor)
+        else:
+            await self.drive_until_async(colour_is(colour), speed=speed)
+
+    def move_until_distance(self, distance: int, speed: float = None):
         """
         Move the robot until the distance to an object is less than or equal to
         the specified value in centimeters.
@@ -64,17 +214,156 @@ class Chassis:
         to an object falls below or equals the specified threshold. The
         distance is measured in centimeters using the robot's sensors.
 
+        Given a speed, the robot brakes predictively: it slows down as it
+        nears the threshold, to the highest speed it can still stop from in
+        the distance left, and stops early by its stopping distance. Both come
+        from the stops measured in `braking`, so a much higher speed than
+        FWD_SPEED can be used without running into the wall.
+
         :param distance: The maximum distance in centimeters to an object
                         before the robot should stop moving.
         :type distance: int
+        :param speed: Top speed of the wheels in degrees per second, or None
+            to drive as MotorController.move_forward does, without braking early.
+        :type speed: float
         :return: None
         Author: Jack McDonald
         """
+        if speed is None:
+            self.drive_until(distance_below(distance))
+        else:
+            self.drive_until(distance_below(distance), speed=speed, governor=self.__approach(distance, speed),
+                             anticipate=True)
 
-        self.MotorController.move_forward()
-        while self.robot.get_distance() > distance:
-            pass
-        self.MotorController.stop()
+    async def move_until_distance_async(self, distance: int, speed: float = None):
+        """
+        Move the robot until the distance to an object is less than or equal to
+        the specified value in centimeters, awaiting the distance on the event
+        loop instead of blocking. See `move_until_distance`.
+
+        :param distance: The maximum distance in centimeters to an object
+                        before the robot should stop moving.
+        :type distance: int
+        :param speed: Top speed of the wheels in degrees per second, or None
+            to drive as MotorController.move_forward does, without braking early.
+        :type speed: float
+        :return: None
+        Author: Jack McDonald
+        """
+        if speed is None:
+            await self.drive_until_async(distance_below(distance))
+        else:
+            await self.drive_until_async(distance_below(distance), speed=speed,
+                                         governor=self.__approach(distance, speed), anticipate=True)
+
+    def follow_line(self, *conditions: Condition, speed: float = None, edge: int = LEFT_EDGE) -> Outcome:
+        """
+        Drives along the edge of a line until one of the stop conditions
+        holds, steering with a LineFollower on every tick of `drive_until`.
+
+        Open-loop moves pick up a little heading error from every wheel slip,
+        which adds up tile after tile, whereas following the edge of a tile
+        line holds the heading of the line itself. The first time, the
+        reflectance is calibrated with `calibrate_line_sensor`, so the robot
+        must start on the edge of the line.
+
+        Example:
+        chassis.follow_line(travelled(chassis.MotorController.SQUARE_LENGTH), edge=RIGHT_EDGE)
+
+        :param conditions: The conditions to stop on, checked in the given order.
+        :type conditions: Condition
+        :param speed: Average speed of the wheels in degrees per second, FWD_SPEED if None.
+        :type speed: float
+        :param edge: Which edge of the line to follow, LEFT_EDGE or RIGHT_EDGE.
+        :type edge: int
+        :return: Which condition fired, the snapshot it fired on and the overshoot.
+        :rtype: Outcome
+        Author: Jack McDonald
+        """
+        if not self.robot.sensors.reflectance_calibrated:
+            self.calibrate_line_sensor()
+        follower = LineFollower(self.MotorController, self.robot.sensors.get_reflectance, edge)
+        speed = self.MotorController.FWD_SPEED if speed is None else speed
+        return self.drive_until(*conditions, speed=speed, governor=follower)
+
+    async def follow_line_async(self, *conditions: Condition, speed: float = None,
+                                edge: int = LEFT_EDGE) -> Outcome:
+        """
+        Drives along the edge of a line until one of the stop conditions
+        holds, awaiting each tick instead of blocking. See `follow_line`.
+
+        :param conditions: The conditions to stop on, checked in the given order.
+        :type conditions: Condition
+        :param speed: Average speed of the wheels in degrees per second, FWD_SPEED if None.
+        :type speed: float
+        :param edge: Which edge of the line to follow, LEFT_EDGE or RIGHT_EDGE.
+        :type edge: int
+        :return: Which condition fired, the snapshot it fired on and the overshoot.
+        :rtype: Outcome
+        Author: Jack McDonald
+        """
+        if not self.robot.sensors.reflectance_calibrated:
+            await self.calibrate_line_sensor_async()
+        follower = LineFollower(self.MotorController, self.robot.sensors.get_reflectance, edge)
+        speed = self.MotorController.FWD_SPEED if speed is None else speed
+        return await self.drive_until_async(*conditions, speed=speed, governor=follower)
+
+    def calibrate_line_sensor(self) -> bool:
+        """
+        Measures how bright the line and the floor look to the colour sensor.
+        The robot turns on the spot CALIBRATION_SWEEP degrees one way, twice
+        that back and returns, reading the intensity at DRIVE_RATE, so a
+        sensor over the edge of a line passes over both. The readings are
+        given to SensorController.calibrate_reflectance.
+
+        :return: Whether the reflectance was calibrated.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        intensities = []
+        try:
+            rate = Rate(DRIVE_RATE)
+            for speed, duration in self.__sweep():
+                self.MotorController.set_wheel_speeds(-speed, speed)
+                end = clock.monotonic() + duration
+                while clock.monotonic() < end:
+                    intensities.append(self.robot.sensors.get_intensity())
+                    rate.sleep()
+        except IOError as error:
+            print(error)
+        finally:
+            self.MotorController.stop()
+        return self.robot.sensors.calibrate_reflectance(intensities)
+
+    async def calibrate_line_sensor_async(self) -> bool:
+        """
+        Measures how bright the line and the floor look to the colour sensor,
+        awaiting each reading instead of blocking. See `calibrate_line_sensor`.
+
+        :return: Whether the reflectance was calibrated.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        intensities = []
+        try:
+            rate = AsyncRate(DRIVE_RATE)
+            for speed, duration in self.__sweep():
+                self.MotorController.set_wheel_speeds(-speed, speed)
+                end = clock.monotonic() + duration
+                while clock.monotonic() < end:
+                    intensities.append(self.robot.sensors.get_intensity())
+                    await rate.sleep()
+        except IOError as error:
+            print(error)
+        finally:
+            self.MotorController.stop()
+        return self.robot.sensors.calibrate_reflectance(intensities)
+
+    def __sweep(self):
+        # Right wheel speed and duration of each leg of the calibration sweep, which ends where it started
+        speed = self.MotorController.TRN_SPEED
+        duration = CALIBRATION_SWEEP * self.MotorController.ORIENTATION_TO_DEGREES / speed
+        return [(speed, duration), (-speed, 2 * duration), (speed, duration)]
 
     def move_one_tile(self):
         """
@@ -91,6 +380,36 @@ class Chassis:
         # Move past the line by specified overrun distance
         self.move_until_distance(OVERRUN_DISTANCE)
 
+    def follow_route(self, route: list, blend: bool = False):
+        """
+        Carries out a route planned by the navigation, one primitive at a time,
+        keeping the navigation's heading up to date as the robot turns.
+
+        With `blend`, the whole route is handed to a MotionQueue instead, which
+        runs from one move into the next without stopping in between. Tiles are
+        then driven as a fixed distance, rather than up to the next line.
+
+        :param route: The names of the Chassis methods to call, in order.
+        :type route: list[str]
+        :param blend: Whether to drive the route as one blended motion.
+        :type blend: bool
+        :return: None
+        """
+        if not blend:
+            for primitive in route:
+                getattr(self, primitive)()
+                self.robot.navigation.turned(primitive)
+            return
+        queue = MotionQueue(self.MotorController)
+        for primitive in route:
+            if primitive == FORWARD:
+                queue.straight(self.MotorController.SQUARE_LENGTH, self.MotorController.FWD_SPEED)
+            else:
+                queue.rotate(TURN_ANGLES[primitive], self.MotorController.TRN_SPEED)
+        queue.run()
+        for primitive in route:
+            self.robot.navigation.turned(primitive)
+
     def turn_right(self):
         """
         Executes a right turn operation.
@@ -101,10 +420,7 @@ class Chassis:
         
         :return: None
         """
-        self.MotorController.rotate(
-            angle=RIGHT,
-            speed=self.MotorController.TRN_SPEED
-        )
+        self.__turn(RIGHT)
         #Ralph
 
     def turn_left(self):
@@ -117,10 +433,7 @@ class Chassis:
         
         :return: None
         """
-        self.MotorController.rotate(
-            angle=LEFT,
-            speed=self.MotorController.TRN_SPEED
-        )
+        self.__turn(LEFT)
 
         #Ralph
 
@@ -134,10 +447,7 @@ class Chassis:
         
         :return: None
         """
-        self.MotorController.rotate(
-            angle=AROUND,
-            speed=self.MotorController.TRN_SPEED
-        )
+        self.__turn(AROUND)
 
         #Ralph
 
@@ -155,3 +465,159 @@ class Chassis:
         self.MotorController.dispense()
 
         #Ralph
+
+    async def turn_right_async(self):
+        """
+        Executes a right turn operation, awaiting its end. See `turn_right`.
+
+        :return: None
+        """
+        await self.__turn_async(RIGHT)
+
+    async def turn_left_async(self):
+        """
+        Executes a left turn operation, awaiting its end. See `turn_left`.
+
+        :return: None
+        """
+        await self.__turn_async(LEFT)
+
+    async def turn_around_async(self):
+        """
+        Rotates the robot by 180 degrees, awaiting the end of the turn. See `turn_around`.
+
+        :return: None
+        """
+        await self.__turn_async(AROUND)
+
+    async def extinguish_fire_async(self):
+        """
+        Activates the fire extinguisher mechanism, awaiting the end of the
+        dispenser movement. As only the dispenser motor is used, it can run
+        concurrently with a drive, for example:
+
+        await asyncio.gather(chassis.move_until_colour_async("black"), chassis.extinguish_fire_async())
+
+        :return: None
+        """
+        await self.MotorController.dispense_async()
+
+    def move_distance(self, distance: float):
+        """
+        Moves the robot forward a fixed distance, without looking for a line.
+
+        :param distance: The distance in meters to move forward.
+        :type distance: float
+        :return: None
+        """
+        if self.profiled:
+            self.MotorController.move_distance_profiled(distance)
+        else:
+            self.MotorController.move_distance_forward(distance, self.MotorController.FWD_SPEED)
+
+    async def move_distance_async(self, distance: float):
+        """
+        Moves the robot forward a fixed distance, awaiting the end of the move. See `move_distance`.
+
+        :param distance: The distance in meters to move forward.
+        :type distance: float
+        :return: None
+        """
+        if self.profiled:
+            await self.MotorController.move_distance_profiled_async(distance)
+        else:
+            await self.MotorController.move_distance_forward_async(distance, self.MotorController.FWD_SPEED)
+
+    def __turn(self, angle: float):
+        if self.gyro_turner is not None:
+            self.gyro_turner.turn(angle, self.MotorController.TRN_SPEED)
+        elif self.profiled:
+            self.MotorController.rotate_profiled(angle)
+        else:
+            self.MotorController.rotate(angle=angle, speed=self.MotorController.TRN_SPEED)
+
+    async def __turn_async(self, angle: float):
+        if self.gyro_turner is not None:
+            await self.gyro_turner.turn_async(angle, self.MotorController.TRN_SPEED)
+        elif self.profiled:
+            await self.MotorController.rotate_profiled_async(angle)
+        else:
+            await self.MotorController.rotate_async(angle=angle, speed=self.MotorController.TRN_SPEED)
+
+    def __start_drive(self, speed: float) -> tuple:
+        controller = self.MotorController
+        start = (controller.motor_left.get_encoder(), controller.motor_right.get_encoder(), clock.monotonic())
+        if speed is None:
+            controller.move_forward()
+        else:
+            controller.set_forward_speed(speed)
+        return start
+
+    def __snapshot(self, start: tuple) -> SensorSnapshot:
+        controller = self.MotorController
+        hub = self.robot.sensor_hub
+        left = controller.motor_left.get_encoder() - start[0]
+        right = controller.motor_right.get_encoder() - start[1]
+        return SensorSnapshot(hub.get_value("colour"), hub.get_value("distance"), hub.get_value("touch"),
+                              (left + right) / 2 / controller.DISTANCE_TO_DEGREES, clock.monotonic() - start[2])
+
+    def __first_holding(self, conditions, snapshot: SensorSnapshot, speed: float):
+        lead = self.braking.stopping_distance(speed) if speed else 0.0
+        return next((condition for condition in conditions if condition.anticipate(snapshot, lead)), None)
+
+    def __govern(self, governor, snapshot: SensorSnapshot, speed: float) -> float:
+        if governor is None:
+            return speed
+        governed = governor(snapshot, speed)
+        if governed != speed:
+            self.MotorController.set_forward_speed(governed)
+        return governed
+
+    def __approach(self, distance: float, speed: float):
+        # Slows down to a speed the robot can still stop from before the threshold
+        def governor(snapshot: SensorSnapshot, current: float) -> float:
+            if snapshot.distance is None or snapshot.distance <= 0:
+                return current
+            return self.braking.braking_speed((snapshot.distance - distance) / 100, speed)
+        return governor
+
+    def __wheel_speed(self) -> float:
+        # Measured rather than commanded, as move_forward drives on raw power rather than at FWD_SPEED
+        controller = self.MotorController
+        return (abs(controller.motor_left.get_speed()) + abs(controller.motor_right.get_speed())) / 2
+
+    def __wait_stopped(self) -> bool:
+        controller = self.MotorController
+        deadline = clock.monotonic() + controller.SETTLE_TIMEOUT
+        rate = Rate(1 / controller.MOTOR_POLL_DELAY)
+        while not self.__stopped():
+            if clock.monotonic() > deadline:
+                return self.__unsettled()
+            rate.sleep()
+        return True
+
+    async def __wait_stopped_async(self) -> bool:
+        controller = self.MotorController
+        deadline = clock.monotonic() + controller.SETTLE_TIMEOUT
+        rate = AsyncRate(1 / controller.MOTOR_POLL_DELAY)
+        while not self.__stopped():
+            if clock.monotonic() > deadline:
+                return self.__unsettled()
+            await rate.sleep()
+        return True
+
+    def __unsettled(self) -> bool:
+        self.MotorController.stop()
+        print("Wheels still turning after a stop, its braking is not learnt")
+        return False
+
+    def __stopped(self) -> bool:
+        controller = self.MotorController
+        return math.isclose(controller.motor_left.get_speed(), 0) and math.isclose(controller.motor_right.get_speed(), 0)
+
+    def __outcome(self, condition: Condition, snapshot: SensorSnapshot, start: tuple, speed: float,
+                  settled: bool) -> Outcome:
+        rest = self.__snapshot(start)
+        if settled:
+            self.braking.record(speed, rest.elapsed - snapshot.elapsed, abs(rest.travelled) - abs(snapshot.travelled))
+        return Outcome(condition, snapshot, abs(rest.travelled) - condition.fired_at(snapshot))
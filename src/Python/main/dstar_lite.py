@@ -0,0 +1,181 @@
+from heapq import heappop, heappush
+
+from grid import STEPS
+
+INFINITY = float("inf")
+
+
+class DStarLite:
+    """
+    Incremental shortest path planner on a grid of tiles, after Koenig and
+    Likhachev's D* Lite.
+
+    The search runs backwards from the goal, so the costs it has settled stay
+    valid as the robot moves towards the goal. When a tile turns into an
+    obstacle, or stops being one, only the tiles whose distance to the goal
+    actually changes are searched again, rather than the whole grid. That
+    keeps replanning after a discovery mid-route cheap on large arenas.
+
+    Every move to one of the four neighbours of a tile costs one.
+
+    :ivar start: The tile the robot is in.
+    :type start: tuple[int, int]
+    :ivar goal: The tile to reach.
+    :type goal: tuple[int, int]
+    :ivar expanded: Number of tiles expanded by the searches so far.
+    :type expanded: int
+    Author: Jack McDonald
+    """
+
+    def __init__(self, rows: int, cols: int, is_free, start: tuple, goal: tuple):
+        """
+        Creates a planner. No search happens until the path is first asked for.
+
+        :param rows: Number of rows of the grid.
+        :type rows: int
+        :param cols: Number of columns of the grid.
+        :type cols: int
+        :param is_free: Tells whether a (row, column) tile of the grid can be driven through.
+        :type is_free: Callable[[tuple[int, int]], bool]
+        :param start: (row, column) of the tile the robot is in.
+        :type start: tuple[int, int]
+        :param goal: (row, column) of the tile to reach.
+        :type goal: tuple[int, int]
+        Author: Jack McDonald
+        """
+        self.rows = rows
+        self.cols = cols
+        self.is_free = is_free
+        self.start = start
+        self.goal = goal
+        self.expanded = 0
+        self.__last = start
+        self.__offset = 0  # Grows by the distance the robot moves, so queued keys stay lower bounds
+        self.__g = {}
+        self.__rhs = {goal: 0}
+        self.__queue = []
+        self.__keys = {}
+        self.__push(goal)
+
+    def move_to(self, start: tuple):
+        """
+        Moves the start of the path to the tile the robot has reached.
+
+        :param start: (row, column) of the tile the robot is in.
+        :type start: tuple[int, int]
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__offset += self.__heuristic(self.__last, start)
+        self.__last = start
+        self.start = start
+
+    def update_tile(self, tile: tuple):
+        """
+        Repairs the plan after a tile turned into an obstacle or stopped being
+        one. The repair itself is deferred to the next `path` call.
+
+        :param tile: (row, column) of the tile that changed.
+        :type tile: tuple[int, int]
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__update(tile)
+        for neighbour in self.__neighbours(tile):
+            self.__update(neighbour)
+
+    def next_tile(self):
+        """
+        Returns the tile to move to next, without following the whole path.
+
+        :return: (row, column) of the next tile, or None if the goal is reached or cannot be reached.
+        :rtype: tuple[int, int]
+        Author: Jack McDonald
+        """
+        self.__compute()
+        if self.start == self.goal or self.__g.get(self.start, INFINITY) == INFINITY:
+            return None
+        return min(self.__neighbours(self.start), key=lambda neighbour: self.__g.get(neighbour, INFINITY))
+
+    def path(self):
+        """
+        Returns a shortest path from the start to the goal.
+
+        :return: The tiles from the start to the goal, both included, or None if
+            the goal cannot be reached.
+        :rtype: list[tuple[int, int]]
+        Author: Jack McDonald
+        """
+        self.__compute()
+        if self.__g.get(self.start, INFINITY) == INFINITY:
+            return None
+        path = [self.start]
+        tile = self.start
+        while tile != self.goal:
+            tile = min(self.__neighbours(tile), key=lambda neighbour: self.__g.get(neighbour, INFINITY))
+            path.append(tile)
+        return path
+
+    def __compute(self):
+        g, rhs = self.__g, self.__rhs
+        while True:
+            top = self.__top()
+            start_g, start_rhs = g.get(self.start, INFINITY), rhs.get(self.start, INFINITY)
+            if top is None or (top[0] >= self.__key(self.start) and start_g == start_rhs):
+                return
+            key, tile = top
+            heappop(self.__queue)
+            del self.__keys[tile]
+            self.expanded += 1
+            new_key = self.__key(tile)
+            if key < new_key:
+                self.__push(tile, new_key)
+            elif g.get(tile, INFINITY) > rhs.get(tile, INFINITY):
+                g[tile] = rhs[tile]
+                for neighbour in self.__neighbours(tile):
+                    self.__update(neighbour)
+            else:
+                g[tile] = INFINITY
+                self.__update(tile)
+                for neighbour in self.__neighbours(tile):
+                    self.__update(neighbour)
+
+    def __update(self, tile: tuple):
+        if tile != self.goal:
+            if self.is_free(tile):
+                self.__rhs[tile] = min((self.__g.get(neighbour, INFINITY) for neighbour in self.__neighbours(tile)),
+                                       default=INFINITY) + 1
+            else:
+                self.__rhs[tile] = INFINITY
+        # Entries already in the heap are dropped lazily once their key is stale
+        self.__keys.pop(tile, None)
+        if self.__g.get(tile, INFINITY) != self.__rhs.get(tile, INFINITY):
+            self.__push(tile)
+
+    def __push(self, tile: tuple, key: tuple = None):
+        key = self.__key(tile) if key is None else key
+        self.__keys[tile] = key
+        heappush(self.__queue, (key, tile))
+
+    def __top(self):
+        while self.__queue:
+            key, tile = self.__queue[0]
+            if self.__keys.get(tile) == key:
+                return key, tile
+            heappop(self.__queue)
+        return None
+
+    def __key(self, tile: tuple) -> tuple:
+        cost = min(self.__g.get(tile, INFINITY), self.__rhs.get(tile, INFINITY))
+        return cost + self.__heuristic(self.start, tile) + self.__offset, cost
+
+    @staticmethod
+    def __heuristic(a: tuple, b: tuple) -> int:
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    def __neighbours(self, tile: tuple):
+        # Free neighbours only, so obstacles never offer a way through
+        for row_step, col_step in STEPS:
+            row, col = tile[0] + row_step, tile[1] + col_step
+            if 0 <= row < self.rows and 0 <= col < self.cols and self.is_free((row, col)):
+                yield row, col
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+from threading import Event, Thread, current_thread
+
+from project.utils import brick, clock, instrumentation
+from project.utils.brick import TouchSensor
+from scheduler import sleep_until
+
+
+class EmergencyStop:
+    """
+    Watches the touch sensor on a dedicated thread and stops the motors the
+    moment it is pressed.
+
+    The watcher reads the touch sensor directly instead of going through the
+    SensorHub, so a slow colour or ultrasonic read can never delay it, and it
+    commands the motors straight through `brick.BP` rather than through the
+    MotorController. The worst-case press-to-stop latency is therefore one
+    poll period plus one sensor read and one motor command per port, which
+    is kept under LATENCY_BUDGET. When permitted, the thread is given
+    real-time priority so the control threads cannot starve it, and the
+    interpreter's GIL switch interval is lowered so a busy Python thread
+    cannot hold the GIL for the default 5 ms before the watcher gets to run.
+
+    Stopping the rest of the robot is left to the `on_stop` callback, which
+    runs on the watcher thread after the motors have been stopped. The Robot
+    uses it to latch the MotorController with `halt`, so the control loops
+    cannot drive the motors again before they unwind.
+
+    :ivar latency: Time between detecting the press and the last motor
+        command returning, in seconds, or None if not triggered yet.
+    :type latency: float
+    Author: Jack McDonald
+    """
+    POLL_PERIOD = 0.001  # (seconds) Touch sensor poll period
+    LATENCY_BUDGET = 0.005  # (seconds) Worst-case press-to-stop latency we allow
+    MOTOR_PORTS = "ABCD"
+    REALTIME_PRIORITY = 50
+    SWITCH_INTERVAL = 0.0005  # (seconds) Longest time another thread may hold the GIL
+
+    def __init__(self, touch_sensor: TouchSensor, on_stop=None, brake: bool = True,
+                 poll_period: float = POLL_PERIOD):
+        """
+        Creates an emergency stop watching the given touch sensor. Watching
+        does not begin until `start` is called.
+
+        :param touch_sensor: The touch sensor acting as the emergency stop button.
+        :type touch_sensor: TouchSensor
+        :param on_stop: Optional callable run once the motors have been stopped.
+        :type on_stop: Callable[[], None]
+        :param brake: If True, the motors are set to zero power, which holds them
+            in place. If False, they are floated and coast to a stop.
+        :type brake: bool
+        :param poll_period: Time between two reads of the touch sensor, in seconds.
+        :type poll_period: float
+        Author: Jack McDonald
+        """
+        self.touch_sensor = touch_sensor
+        self.on_stop = on_stop
+        self.brake = brake
+        self.poll_period = poll_period
+        self.latency = None
+        self.__triggered = Event()
+        self.__stop_event = Event()
+        self.__thread = None
+        self.__switch_interval = None
+
+    def start(self):
+        """
+        Starts the watcher thread, lowering the GIL switch interval until `stop`.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.__switch_interval, self.SWITCH_INTERVAL))
+        self.__thread = Thread(target=self.__watch, daemon=True, name="em._stop")
+        clock.attach(self.__thread)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops watching the touch sensor, and restores the GIL switch interval
+        `start` lowered. Can safely be called from `on_stop`.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.set()
+        if self.__switch_interval is not None:
+            sys.setswitchinterval(self.__switch_interval)
+            self.__switch_interval = None
+        if self.__thread is not None and self.__thread.is_alive() and self.__thread is not current_thread():
+            self.__thread.join()
+
+    def trigger(self):
+        """
+        Stops every motor immediately, then runs the `on_stop` callback.
+        Only the first call has any effect.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__triggered.is_set():
+            return
+        self.__triggered.set()
+        detected = time.monotonic()
+        self.__stop_motors()
+        self.latency = time.monotonic() - detected
+        if self.latency > self.LATENCY_BUDGET:
+            print(f"Emergency stop took {self.latency * 1000:.1f} ms, over its "
+                  f"{self.LATENCY_BUDGET * 1000:.1f} ms budget", file=sys.stderr)
+        if self.on_stop is not None:
+            self.on_stop()
+
+    def is_triggered(self) -> bool:
+        return self.__triggered.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.__triggered.wait(timeout)
+
+    def __stop_motors(self):
+        power = 0 if self.brake else brick.BP.MOTOR_FLOAT
+        for port in self.MOTOR_PORTS:
+            try:
+                brick.BP.set_motor_power(brick.PORTS[port], power)
+            except IOError as error:
+                print(error)
+
+    def __watch(self):
+        self.__raise_priority()
+        deadline = clock.monotonic()
+        while not self.__stop_event.is_set():
+            try:
+                if self.touch_sensor.get_value() == 1:
+                    self.trigger()
+                    return
+            except IOError as error:
+                print(error)
+            instrumentation.tick(current_thread().name)
+            deadline += self.poll_period
+            sleep_until(deadline, self.__stop_event, spin_threshold=0)
+
+    def __raise_priority(self):
+        try:
+            # On Linux, pid 0 refers to the calling thread only
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.REALTIME_PRIORITY))
+        except (AttributeError, PermissionError, OSError) as err:
+            print(f"Emergency stop running without real-time priority: {err}", file=sys.stderr)
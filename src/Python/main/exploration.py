@@ -0,0 +1,140 @@
+from heapq import heappop, heappush
+
+from grid import STEPS, Cell
+from navigation import FORWARD, TURNS, Navigation
+
+KNOWN_FREE = (Cell.SEARCHED, Cell.CURRENT)
+
+
+class Explorer:
+    """
+    Explores an arena whose layout is unknown, by driving to frontiers: the
+    unsearched tiles next to a tile already known to be free.
+
+    The frontier is kept up to date incrementally. Every change made through
+    `Navigation.set_cell` only re-examines the changed tile and its four
+    neighbours, so the grid is never rescanned while the explorer is in step
+    with it. Changes written to the grid directly are noticed through its
+    version, and trigger a single full scan.
+
+    Each frontier is scored by its information gain, the unsearched tiles
+    among itself and its neighbours, over the time to drive there with the
+    navigation's cost model. The quickest routes are found by a Dijkstra
+    search from the current (tile, heading), which stops as soon as no
+    frontier further away could beat the best one found, so choosing a target
+    mostly looks at the surroundings of the robot, however large the map.
+
+    :ivar frontier: The tiles of the frontier.
+    :type frontier: set[tuple[int, int]]
+    Author: Jack McDonald
+    """
+    MAX_GAIN = 1 + len(STEPS)  # Largest number of tiles a visit can reveal
+
+    def __init__(self, navigation: Navigation):
+        self.navigation = navigation
+        self.frontier = set()
+        self.__synced = None
+        navigation.subscribe(self.update_tile)
+        self.rescan()
+
+    def rescan(self):
+        """
+        Rebuilds the frontier from the whole grid.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        grid = self.navigation.search_array
+        self.frontier = {tile for tile in grid.find(Cell.UNSEARCHED) if self.__is_frontier(tile)}
+        self.__synced = (id(grid), grid.version)
+
+    def update_tile(self, tile: tuple):
+        """
+        Updates the frontier around a tile that changed.
+
+        :param tile: (row, column) of the tile.
+        :type tile: tuple[int, int]
+        :return: None
+        Author: Jack McDonald
+        """
+        grid = self.navigation.search_array
+        if self.__synced != (id(grid), grid.version - 1):
+            self.rescan()
+            return
+        row, col = tile
+        for neighbour in [tile] + [(row + row_step, col + col_step) for row_step, col_step in STEPS]:
+            if grid.in_bounds(neighbour) and self.__is_frontier(neighbour):
+                self.frontier.add(neighbour)
+            else:
+                self.frontier.discard(neighbour)
+        self.__synced = (id(grid), grid.version)
+
+    def gain(self, tile: tuple) -> int:
+        """The number of unsearched tiles among a tile and its four neighbours."""
+        grid = self.navigation.search_array
+        row, col = tile
+        return sum(1 for row_step, col_step in ((0, 0),) + STEPS
+                   if grid.in_bounds((row + row_step, col + col_step))
+                   and grid[row + row_step, col + col_step] == Cell.UNSEARCHED)
+
+    def next_target(self):
+        """
+        Chooses the frontier tile with the best information gain per second of driving.
+
+        :return: The target and the route to it, as Chassis primitives, or None
+            once no frontier can be reached.
+        :rtype: tuple[tuple[int, int], list[str]]
+        Author: Jack McDonald
+        """
+        grid = self.navigation.search_array
+        if self.__synced != (id(grid), grid.version):
+            self.rescan()
+        if not self.frontier:
+            return None
+
+        costs = self.navigation.costs
+        source = (self.navigation.position, self.navigation.heading)
+        times = {source: 0.0}
+        previous = {}
+        queue = [(0.0, source)]
+        best, best_score = None, 0.0
+        while queue:
+            time, state = heappop(queue)
+            if time > times[state]:
+                continue
+            if time > 0 and self.MAX_GAIN / time <= best_score:
+                break  # Nothing further away can score better
+            tile, heading = state
+            if tile in self.frontier:
+                score = self.gain(tile) / time
+                if score > best_score:
+                    best, best_score = state, score
+                continue  # The route ends on entering the frontier
+            moves = [((tile, (heading + quarters) % 4), turns[0]) for quarters, turns in TURNS.items() if turns]
+            step = (tile[0] + STEPS[heading][0], tile[1] + STEPS[heading][1])
+            if grid.is_free(step):
+                moves.append(((step, heading), FORWARD))
+            for following, primitive in moves:
+                arrival = time + costs[primitive]
+                if arrival < times.get(following, float("inf")):
+                    times[following] = arrival
+                    previous[following] = (state, primitive)
+                    heappush(queue, (arrival, following))
+
+        if best is None:
+            return None
+        route = []
+        state = best
+        while state != source:
+            state, primitive = previous[state]
+            route.append(primitive)
+        route.reverse()
+        return best[0], route
+
+    def __is_frontier(self, tile: tuple) -> bool:
+        grid = self.navigation.search_array
+        if grid[tile] != Cell.UNSEARCHED:
+            return False
+        row, col = tile
+        return any(grid.in_bounds((row + row_step, col + col_step))
+                   and grid[row + row_step, col + col_step] in KNOWN_FREE for row_step, col_step in STEPS)
@@ -0,0 +1,180 @@
+from collections import namedtuple
+from enum import Enum
+from itertools import compress
+
+
+class Cell(str, Enum):
+    """State of a tile of the search grid. Each state compares equal to its one-letter symbol."""
+    UNSEARCHED = 'u'
+    WALL = 'w'
+    FURNITURE = 'f'
+    CURRENT = 'c'
+    SEARCHED = 's'
+
+
+OBSTACLES = (Cell.WALL, Cell.FURNITURE)
+STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))  # (row, column) offset of the four neighbours of a tile
+
+Snapshot = namedtuple("Snapshot", ["version", "data"])
+Snapshot.__doc__ = """Immutable copy of the cells of a Grid, taken at the given version."""
+
+_CELLS = {ord(cell.value): cell for cell in Cell}
+_FREE = bytes.maketrans(b"wf", b"\0\0")  # Translates obstacles to zero bytes, leaving the rest non-zero
+
+
+class Grid:
+    """
+    Rectangular grid of tiles, stored one byte per tile in a bytearray.
+
+    Each byte holds the symbol of a Cell state, in row-major order, so a
+    million-tile arena takes a megabyte rather than a list of a million
+    Python strings. Queries over the whole grid (finding every tile in a
+    state, counting states) run over the bytes in C rather than in a Python
+    loop. NumPy users can view the same memory without copying it, as
+    numpy.frombuffer(grid.data, numpy.uint8).reshape(grid.shape).
+
+    Tiles are indexed as grid[row, col], and compare equal to their symbols,
+    so grid[row, col] == 'u' works as it did on the lists of strings. A tile
+    off the grid raises IndexError, rather than wrapping to another row.
+
+    Every write increases `version`, and a write that turns a tile into an
+    obstacle or back also increases `layout_version`, so planners can tell
+    cheaply whether their tables are still valid.
+
+    :ivar rows: Number of rows.
+    :type rows: int
+    :ivar cols: Number of columns.
+    :type cols: int
+    :ivar data: The tiles, one symbol byte each, in row-major order.
+    :type data: bytearray
+    :ivar version: Number of writes so far.
+    :type version: int
+    :ivar layout_version: Number of writes so far that changed which tiles are obstacles.
+    :type layout_version: int
+    Author: Jack McDonald
+    """
+
+    def __init__(self, rows: int, cols: int, fill: Cell = Cell.UNSEARCHED):
+        self.rows = rows
+        self.cols = cols
+        self.data = bytearray(ord(fill.value).to_bytes(1, "little") * (rows * cols))
+        self.version = 0
+        self.layout_version = 0
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "Grid":
+        """
+        Creates a grid from a list of rows of symbols, e.g. [['u', 'w'], ['c', 'u']].
+
+        :param rows: The rows of the grid, all of the same length.
+        :type rows: list[list[str]]
+        :return: The grid.
+        :rtype: Grid
+        Author: Jack McDonald
+        """
+        grid = cls(len(rows), len(rows[0]) if rows else 0)
+        grid.data[:] = "".join("".join(row) for row in rows).encode("ascii")
+        return grid
+
+    @property
+    def shape(self) -> tuple:
+        return self.rows, self.cols
+
+    def __getitem__(self, tile: tuple) -> Cell:
+        row, col = tile
+        if not self.in_bounds(tile):
+            raise IndexError(f"tile {tile} is off the {self.rows}x{self.cols} grid")
+        return _CELLS[self.data[row * self.cols + col]]
+
+    def __setitem__(self, tile: tuple, cell: str):
+        row, col = tile
+        if not self.in_bounds(tile):
+            raise IndexError(f"tile {tile} is off the {self.rows}x{self.cols} grid")
+        index = row * self.cols + col
+        old, new = _CELLS[self.data[index]], Cell(cell)
+        self.data[index] = ord(new.value)
+        self.version += 1
+        if (old in OBSTACLES) != (new in OBSTACLES):
+            self.layout_version += 1
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Grid) and self.shape == other.shape and self.data == other.data
+
+    def __str__(self) -> str:
+        text = self.data.decode("ascii")
+        return "\n".join(text[row * self.cols:(row + 1) * self.cols] for row in range(self.rows))
+
+    def in_bounds(self, tile: tuple) -> bool:
+        return 0 <= tile[0] < self.rows and 0 <= tile[1] < self.cols
+
+    def is_free(self, tile: tuple) -> bool:
+        """Whether the tile is on the grid and is neither a wall nor furniture."""
+        row, col = tile
+        return 0 <= row < self.rows and 0 <= col < self.cols and self.data[row * self.cols + col] not in b"wf"
+
+    def neighbours(self, tile: tuple) -> list:
+        """The free tiles among the four neighbours of a tile."""
+        row, col = tile
+        return [(row + row_step, col + col_step) for row_step, col_step in STEPS
+                if self.is_free((row + row_step, col + col_step))]
+
+    def find(self, *cells: str) -> list:
+        """
+        Returns every tile in one of the given states, in row-major order.
+
+        :param cells: The states to look for.
+        :type cells: Cell
+        :return: The (row, column) of the tiles found.
+        :rtype: list[tuple[int, int]]
+        Author: Jack McDonald
+        """
+        return [divmod(index, self.cols) for index in self.indices(*cells)]
+
+    def indices(self, *cells: str):
+        """Like `find`, but yields the row-major indices of the tiles, which is quicker on large grids."""
+        table = bytearray(256)
+        for cell in cells:
+            table[ord(cell)] = 1
+        return compress(range(len(self.data)), self.data.translate(table))
+
+    def free_tiles(self) -> list:
+        """Every tile that is neither a wall nor furniture, in row-major order."""
+        return [divmod(index, self.cols) for index in compress(range(len(self.data)), self.data.translate(_FREE))]
+
+    def count(self, cell: str) -> int:
+        return self.data.count(ord(cell))
+
+    def counts(self) -> dict:
+        """Number of tiles in each state."""
+        return {cell: self.data.count(ord(cell.value)) for cell in Cell}
+
+    def snapshot(self) -> Snapshot:
+        """Returns an immutable copy of the tiles, which `restore` can return to."""
+        return Snapshot(self.version, bytes(self.data))
+
+    def restore(self, snapshot: Snapshot):
+        """
+        Returns the tiles to a snapshot. The version keeps increasing, so
+        tables built since the snapshot are still seen as stale.
+
+        :param snapshot: A snapshot of this grid.
+        :type snapshot: Snapshot
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.data.translate(_FREE) != snapshot.data.translate(_FREE):
+            self.layout_version += 1
+        self.data[:] = snapshot.data
+        self.version += 1
+
+    def copy(self) -> "Grid":
+        grid = Grid(self.rows, self.cols)
+        grid.data[:] = self.data
+        return grid
+
+    def to_rows(self) -> list:
+        """The grid as a list of rows of symbols."""
+        return [list(row) for row in str(self).split("\n")] if self.rows else []
@@ -0,0 +1,155 @@
+import math
+
+from motor import MotorController
+from project.utils import clock
+from project.utils.brick import EV3GyroSensor
+from scheduler import AsyncRate, Rate
+
+
+class GyroTurner:
+    """
+    Turns the robot on the spot until the gyro reads the wanted heading.
+
+    MotorController.rotate turns the wheels by a fixed encoder angle, so any
+    slip of the wheels on the floor becomes a heading error, and the errors
+    of successive turns add up. The turner instead samples the heading and
+    the rotation rate of the gyro together with get_both_measure at RATE, and
+    commands the wheel speed from the heading left to turn: the full speed
+    while there is room, then the highest speed from which the robot can
+    still stop at DECELERATION, down to MIN_SPEED. The wheels are stopped
+    once the heading predicted LATENCY ahead from the measured rate is within
+    TOLERANCE of the target, which makes up for the time a reading and a
+    motor command take.
+
+    Any EV3GyroSensor works, including a remote.RemoteEV3GyroSensor on a
+    brick reached over the network. DIRECTION gives the sign of the gyro's
+    reading, as mounted, for a turn with a positive angle, which is
+    counter-clockwise. The EV3 gyro counts clockwise turns as positive when
+    mounted upright, hence -1.
+
+    :ivar motor_controller: Gives the drive motors and the robot's dimensions.
+    :type motor_controller: MotorController
+    :ivar gyro: The gyro sensor, in "both" mode.
+    :type gyro: EV3GyroSensor
+    Author: Jack McDonald
+    """
+    RATE = 200  # (Hz) Rate at which the gyro is sampled during a turn
+    DIRECTION = -1  # Sign of the gyro reading for a turn with a positive angle
+    DECELERATION = 400  # (deg per sec^2) Largest deceleration of the heading when nearing the target
+    MIN_SPEED = 40  # (deg per sec) Slowest wheel speed, so the robot still reaches the target
+    LATENCY = 0.015  # (seconds) From a gyro reading to the wheels responding to it
+    TOLERANCE = 0.5  # (degrees) Heading error at which the turn is complete
+    TIMEOUT = 5  # (seconds) Longest a turn may take, in case the gyro stops responding
+    SETTLE_TIMEOUT = MotorController.SETTLE_TIMEOUT  # (seconds) Longest wait for the wheels to stop after a turn
+
+    def __init__(self, motor_controller: MotorController, gyro: EV3GyroSensor):
+        self.motor_controller = motor_controller
+        self.gyro = gyro
+
+    def turn(self, angle: float, speed: float = MotorController.TRN_SPEED) -> float:
+        """
+        Turns the robot by `angle` degrees, with the same sign convention as
+        MotorController.rotate, and blocks until the wheels have stopped, or
+        for SETTLE_TIMEOUT at most once they are commanded to.
+
+        :param angle: The rotation angle in degrees.
+        :type angle: float
+        :param speed: The largest wheel speed in degrees per second.
+        :type speed: float
+        :return: The angle turned according to the gyro, or None if it could not be read.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        try:
+            start = self.__heading()
+            if start is None:
+                return None
+            deadline = clock.monotonic() + self.TIMEOUT
+            rate = Rate(self.RATE)
+            while not self.__step(start + self.DIRECTION * angle, angle, speed) and clock.monotonic() < deadline:
+                rate.sleep()
+            self.motor_controller.stop()
+            deadline = clock.monotonic() + self.SETTLE_TIMEOUT
+            rate = Rate(1 / self.motor_controller.MOTOR_POLL_DELAY)
+            while not self.__stopped():
+                if clock.monotonic() > deadline:
+                    self.__unsettled()
+                    break
+                rate.sleep()
+            return self.__turned(start)
+        except IOError as error:
+            print(error)
+            self.motor_controller.stop()
+
+    async def turn_async(self, angle: float, speed: float = MotorController.TRN_SPEED) -> float:
+        """
+        Turns the robot by `angle` degrees, awaiting the end of the turn
+        instead of blocking. See `turn`.
+
+        :param angle: The rotation angle in degrees.
+        :type angle: float
+        :param speed: The largest wheel speed in degrees per second.
+        :type speed: float
+        :return: The angle turned according to the gyro, or None if it could not be read.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        try:
+            start = self.__heading()
+            if start is None:
+                return None
+            deadline = clock.monotonic() + self.TIMEOUT
+            rate = AsyncRate(self.RATE)
+            while not self.__step(start + self.DIRECTION * angle, angle, speed) and clock.monotonic() < deadline:
+                await rate.sleep()
+            self.motor_controller.stop()
+            deadline = clock.monotonic() + self.SETTLE_TIMEOUT
+            rate = AsyncRate(1 / self.motor_controller.MOTOR_POLL_DELAY)
+            while not self.__stopped():
+                if clock.monotonic() > deadline:
+                    self.__unsettled()
+                    break
+                await rate.sleep()
+            return self.__turned(start)
+        except IOError as error:
+            print(error)
+            self.motor_controller.stop()
+
+    def wheel_speed(self, remaining: float, speed: float) -> float:
+        """
+        The wheel speed to turn at with `remaining` degrees of heading left,
+        the highest from which the heading can still stop at DECELERATION,
+        between MIN_SPEED and `speed`.
+        """
+        heading_speed = math.sqrt(2 * self.DECELERATION * max(0.0, remaining))
+        return max(self.MIN_SPEED, min(speed, heading_speed * self.motor_controller.ORIENTATION_TO_DEGREES))
+
+    def __step(self, target: float, angle: float, speed: float) -> bool:
+        # Commands the wheels for the heading left to turn, and returns True once the turn is complete
+        measure = self.gyro.get_both_measure()
+        if not measure or measure[0] is None:
+            return False
+        heading, rate = measure[0], measure[1] or 0
+        turning = 1 if angle >= 0 else -1
+        remaining = (target - heading) * self.DIRECTION * turning
+        if remaining - rate * self.DIRECTION * turning * self.LATENCY <= self.TOLERANCE:
+            return True
+        wheel = turning * self.wheel_speed(remaining, speed)
+        self.motor_controller.set_wheel_speeds(-wheel, wheel)
+        return False
+
+    def __heading(self):
+        measure = self.gyro.get_both_measure()
+        return measure[0] if measure else None
+
+    def __turned(self, start: float):
+        heading = self.__heading()
+        return None if heading is None else (heading - start) * self.DIRECTION
+
+    def __unsettled(self):
+        self.motor_controller.stop()
+        print("Wheels still turning after a gyro turn")
+
+    def __stopped(self) -> bool:
+        controller = self.motor_controller
+        return math.isclose(controller.motor_left.get_speed(), 0) and math.isclose(controller.motor_right.get_speed(), 0)
@@ -0,0 +1,124 @@
+from motor import MotorController
+from stop_conditions import SensorSnapshot
+
+LEFT_EDGE = 1  # Follows the left edge of a line, keeping the line on the robot's left
+RIGHT_EDGE = -1  # Follows the right edge of a line, keeping the line on the robot's right
+
+
+class PID:
+    """
+    Proportional-integral-derivative controller.
+
+    The integral is clamped to `integral_limit`, so it cannot wind up while
+    the output is saturated, and the derivative is taken on the error, from
+    the second update onwards.
+
+    :ivar kp: Proportional gain.
+    :type kp: float
+    :ivar ki: Integral gain, per second.
+    :type ki: float
+    :ivar kd: Derivative gain, in seconds.
+    :type kd: float
+    Author: Jack McDonald
+    """
+
+    def __init__(self, kp: float, ki: float = 0.0, kd: float = 0.0, integral_limit: float = float("inf")):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.integral_limit = integral_limit
+        self.__integral = 0.0
+        self.__previous = None
+
+    def reset(self):
+        self.__integral = 0.0
+        self.__previous = None
+
+    def update(self, error: float, dt: float) -> float:
+        """
+        Returns the control output for a new error.
+
+        :param error: The error, as setpoint minus measurement or the reverse.
+        :type error: float
+        :param dt: Time since the previous update, in seconds.
+        :type dt: float
+        :return: The control output.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        derivative = 0.0
+        if dt > 0:
+            self.__integral = max(-self.integral_limit, min(self.integral_limit, self.__integral + error * dt))
+            if self.__previous is not None:
+                derivative = (error - self.__previous) / dt
+        self.__previous = error
+        return self.kp * error + self.ki * self.__integral + self.kd * derivative
+
+
+class LineFollower:
+    """
+    Steers the robot along the edge of a line, from the reflectance the
+    colour sensor reads.
+
+    Over the edge, the sensor sees half line and half floor, so the
+    normalised reflectance is about TARGET. Drifting over the floor raises
+    it and drifting over the line lowers it, and a PID loop on the
+    difference sets the wheels apart: one wheel is sped up and the other
+    slowed down by the same amount, so the robot keeps its average speed
+    while it turns back towards the edge. The correction is clamped to
+    MAX_CORRECTION of the speed, so neither wheel ever reverses.
+
+    An instance is a governor for Chassis.drive_until: it is called on every
+    tick of the drive with the snapshot and the speed, commands the wheels
+    itself and leaves the speed as it is.
+
+    :ivar edge: LEFT_EDGE or RIGHT_EDGE.
+    :type edge: int
+    :ivar pid: Turns the reflectance error into a difference of wheel speed, in degrees per second.
+    :type pid: PID
+    Author: Jack McDonald
+    """
+    TARGET = 0.5  # Normalised reflectance over the edge of the line
+    KP = 400  # (deg per sec) Wheel speed difference per unit of reflectance error
+    KI = 150  # (deg per sec^2)
+    KD = 15  # (deg)
+    INTEGRAL_LIMIT = 0.5  # (seconds) Largest accumulated error
+    MAX_CORRECTION = 0.6  # Largest wheel speed difference, as a fraction of the speed
+
+    def __init__(self, motor_controller: MotorController, reflectance, edge: int = LEFT_EDGE,
+                 target: float = TARGET):
+        """
+        :param motor_controller: Gives the drive motors.
+        :type motor_controller: MotorController
+        :param reflectance: A callable taking no arguments and returning the
+            normalised reflectance under the colour sensor, between 0 over black and 1 over white.
+        :type reflectance: Callable[[], float]
+        :param edge: Which edge of the line to follow, LEFT_EDGE or RIGHT_EDGE.
+        :type edge: int
+        :param target: Normalised reflectance to hold, over the edge.
+        :type target: float
+        Author: Jack McDonald
+        """
+        self.motor_controller = motor_controller
+        self.reflectance = reflectance
+        self.edge = edge
+        self.target = target
+        self.pid = PID(self.KP, self.KI, self.KD, self.INTEGRAL_LIMIT)
+        self.__elapsed = None
+
+    def reset(self):
+        self.pid.reset()
+        self.__elapsed = None
+
+    def __call__(self, snapshot: SensorSnapshot, speed: float) -> float:
+        reflectance = self.reflectance()
+        if reflectance is None:
+            return speed
+        dt = 0.0 if self.__elapsed is None else snapshot.elapsed - self.__elapsed
+        self.__elapsed = snapshot.elapsed
+        # Too bright means the robot drifted off the line, so it turns towards the side of the line
+        correction = self.edge * self.pid.update(reflectance - self.target, dt)
+        limit = self.MAX_CORRECTION * abs(speed)
+        correction = max(-limit, min(limit, correction))
+        self.motor_controller.set_wheel_speeds(speed - correction, speed + correction)
+        return speed
@@ -0,0 +1,156 @@
+import math
+from threading import Event
+
+from motor import MotorController
+from navigation import Navigation
+from odometry import Odometry
+from scheduler import AsyncRate
+from sensor_hub import Reading, SensorHub
+
+
+class Localiser:
+    """
+    Keeps the robot localised on the tile grid of the arena.
+
+    Between landmarks the pose comes from odometry, which drifts. The black
+    lines between tiles are landmarks at known positions: the tile
+    boundaries, half a tile either side of the centre of the start tile. The
+    localiser watches the colour readings of the SensorHub and, whenever the
+    colour sensor enters a black line while the robot is heading along one
+    of the grid axes, fuses the position of the nearest line along that axis
+    into the odometry with a Kalman update. Crossings too far from any
+    expected line are ignored rather than trusted.
+
+    The robot starts at the centre of `origin`, facing towards row 0, which
+    is the +x direction of the odometry; +y points towards column 0, so a
+    left turn, rotate(LEFT), takes the robot from facing row 0 to facing
+    column 0, as Navigation.turned expects. The current cell is published
+    to `Navigation.update_position` whenever it changes.
+
+    :ivar cell: The (row, column) the robot is in.
+    :type cell: tuple[int, int]
+    :ivar corrections: Number of line crossings fused into the pose.
+    :type corrections: int
+    :ivar rejected: Number of line crossings ignored by the gate.
+    :type rejected: int
+    Author: Jack McDonald
+    """
+    RATE = 20  # (Hz) How often the current cell is recomputed
+    LINE_COLOUR = "black"
+    SENSOR_OFFSET = 0.0  # (metres) How far ahead of the wheel axle the colour sensor sits
+    LINE_VARIANCE = 0.01 ** 2  # (m^2) Variance of a line position measurement
+    HEADING_TOLERANCE = math.radians(25)  # Largest angle to a grid axis for a crossing to be used
+    GATE = 0.3  # (tiles) Largest distance between the expected and the measured line
+
+    def __init__(self, odometry: Odometry, navigation: Navigation, sensor_hub: SensorHub,
+                 origin: tuple = (2, 1), tile_length: float = MotorController.SQUARE_LENGTH):
+        """
+        Creates a localiser and subscribes it to the colour readings of the hub.
+
+        :param odometry: The odometry to correct.
+        :type odometry: Odometry
+        :param navigation: Receives the current cell.
+        :type navigation: Navigation
+        :param sensor_hub: Publishes the colour readings.
+        :type sensor_hub: SensorHub
+        :param origin: (row, column) of the start tile.
+        :type origin: tuple[int, int]
+        :param tile_length: Side of a tile, in metres.
+        :type tile_length: float
+        Author: Jack McDonald
+        """
+        self.odometry = odometry
+        self.navigation = navigation
+        self.origin = origin
+        self.tile_length = tile_length
+        self.cell = origin
+        self.corrections = 0
+        self.rejected = 0
+        self.__on_line = False
+        self.__stop_event = Event()
+        sensor_hub.subscribe("colour", self.on_colour)
+        sensor_hub.scheduler.add_task("localisation", self.update, self.RATE)
+        self.navigation.update_position(*origin)
+
+    def stop(self):
+        self.__stop_event.set()
+
+    async def run_async(self):
+        """
+        Tracks the current cell from a coroutine on the running event loop,
+        instead of on the scheduler thread. Line crossings are handled as the
+        hub publishes them either way.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        rate = AsyncRate(self.RATE)
+        while not self.__stop_event.is_set():
+            self.update()
+            await rate.sleep()
+
+    def cell_at(self, x: float, y: float) -> tuple:
+        """Returns the (row, column) containing the given odometry position."""
+        return (self.origin[0] - round(x / self.tile_length),
+                self.origin[1] - round(y / self.tile_length))
+
+    def update(self):
+        """
+        Publishes the current cell to the navigation if it changed.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__stop_event.is_set():
+            return
+        pose = self.odometry.pose
+        cell = self.cell_at(pose.x, pose.y)
+        if cell != self.cell:
+            self.cell = cell
+            self.navigation.update_position(*cell)
+
+    def on_colour(self, reading: Reading):
+        """
+        Handles a colour reading, treating the first black reading after any
+        other colour as a line crossing.
+
+        :param reading: The new colour reading.
+        :type reading: Reading
+        :return: None
+        Author: Jack McDonald
+        """
+        on_line = reading.value == self.LINE_COLOUR
+        if on_line and not self.__on_line:
+            self.on_line_crossing()
+        self.__on_line = on_line
+
+    def on_line_crossing(self):
+        """
+        Corrects the odometry with the position of the line the colour sensor
+        has just entered.
+
+        :return: True if the crossing was used, False if it was ignored.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        pose = self.odometry.pose
+        cos, sin = math.cos(pose.theta), math.sin(pose.theta)
+        tolerance = math.cos(self.HEADING_TOLERANCE)
+        if abs(cos) >= tolerance:
+            axis, position, offset = 0, pose.x, self.SENSOR_OFFSET * cos
+        elif abs(sin) >= tolerance:
+            axis, position, offset = 1, pose.y, self.SENSOR_OFFSET * sin
+        else:
+            self.rejected += 1
+            return False
+
+        # Lines lie on the tile boundaries, half a tile off the start tile's centre
+        sensor = position + offset
+        line = (math.floor(sensor / self.tile_length) + 0.5) * self.tile_length
+        if abs(line - sensor) > self.GATE * self.tile_length:
+            self.rejected += 1
+            return False
+        self.odometry.correct(axis, line - offset, self.LINE_VARIANCE)
+        self.corrections += 1
+        return True
@@ -1,9 +1,45 @@
+import argparse
+import asyncio
+
+from project.utils import brick, instrumentation
+from recorder import MissionRecorder, MissionReplay
 from robot import Robot
 
 
 def main():
-    robot = Robot()
-    robot.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run the mission on asyncio")
+    parser.add_argument("--sensor-process", action="store_true", help="sample the sensors in a separate process")
+    parser.add_argument("--gyro", action="store_true", help="turn on the heading of a gyro sensor on port 4")
+    parser.add_argument("--profiled", action="store_true", help="drive turns and fixed moves along velocity profiles")
+    parser.add_argument("--record", metavar="LOG", help="record sensor reads and motor commands to LOG")
+    parser.add_argument("--replay", metavar="LOG", help="feed the sensor readings of LOG to the dummy brick")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed relative to real time")
+    parser.add_argument("--stats", metavar="FILE", help="append runtime statistics to FILE every second")
+    args = parser.parse_args()
+    brick.save_pid()
+
+    recorder = MissionRecorder(args.record) if args.record else None
+    if recorder is not None:
+        recorder.start()
+    if args.stats:
+        instrumentation.start_dump(args.stats)
+    try:
+        robot = Robot(sensor_process=args.sensor_process, gyro=args.gyro, profiled=args.profiled)
+        if args.replay:
+            MissionReplay(args.replay, speed=args.speed).start()
+            if robot.sensor_process is not None:
+                robot.sensor_process.replay = (args.replay, args.speed)
+        if args.use_async:
+            asyncio.run(robot.run_async())
+        else:
+            robot.run()
+    finally:
+        if recorder is not None:
+            recorder.stop()
+        if args.stats:
+            instrumentation.stop_dump()
+            print(instrumentation.report())
 
 
 if __name__ == '__main__':
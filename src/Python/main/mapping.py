@@ -0,0 +1,302 @@
+import math
+import sys
+from array import array
+from threading import Event, Lock
+
+from grid import Cell
+from localisation import Localiser
+from odometry import Odometry
+from scheduler import AsyncRate
+from sensor_hub import Reading, SensorHub
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    print("NumPy is missing, occupancy mapping falls back to pure Python", file=sys.stderr)
+    numpy = None
+
+
+class OccupancyMap:
+    """
+    Occupancy grid of the arena in log-odds, built from range readings.
+
+    Each reading is ray-traced from the sensor: the cells the ray crosses
+    before the reading become more likely to be free, and the cell where it
+    ends, more likely to be occupied. Log-odds make each update an addition,
+    and are clamped so a cell can still change its mind after many readings.
+
+    Each ray walks the grid cell by cell (Amanatides and Woo), so it marks
+    every cell it passes through, even one whose corner it barely cuts.
+    With NumPy, a whole batch of readings is traced at once: the grid lines
+    each ray crosses are sorted along it, each gap between two crossings is
+    a cell, and the cells are updated with numpy.add.at, so the cost barely
+    depends on the number of readings. Without it, the same walk runs ray by
+    ray in Python. The two only differ in that NumPy
+    clamps the log-odds once per batch rather than after every reading.
+
+    x and y are the odometry coordinates in metres; cell (i, j) covers
+    [x_min + i * resolution, x_min + (i + 1) * resolution) along x, and likewise along y.
+
+    :ivar resolution: Side of a cell, in metres.
+    :type resolution: float
+    :ivar rows: Number of cells along x.
+    :type rows: int
+    :ivar cols: Number of cells along y.
+    :type cols: int
+    Author: Jack McDonald
+    """
+    RESOLUTION = 0.05  # (metres)
+    MAX_RANGE = 2.55  # (metres) Readings this long or longer hit nothing
+    OCCUPIED = 0.85  # Log-odds added to the cell where a reading ends
+    FREE = -0.4  # Log-odds added to the cells a reading crosses
+    LIMIT = 5.0  # Largest magnitude of the log-odds of a cell
+
+    def __init__(self, x_min: float, y_min: float, x_max: float, y_max: float, resolution: float = RESOLUTION):
+        self.x_min = x_min
+        self.y_min = y_min
+        self.resolution = resolution
+        self.rows = math.ceil((x_max - x_min) / resolution - 1e-9)
+        self.cols = math.ceil((y_max - y_min) / resolution - 1e-9)
+        if numpy is not None:
+            self.log_odds = numpy.zeros((self.rows, self.cols), dtype=numpy.float32)
+        else:
+            self.log_odds = array("f", bytes(4 * self.rows * self.cols))
+
+    def cell_at(self, x: float, y: float):
+        """Returns the (i, j) cell containing a position, or None outside the map."""
+        i, j = math.floor((x - self.x_min) / self.resolution), math.floor((y - self.y_min) / self.resolution)
+        return (i, j) if 0 <= i < self.rows and 0 <= j < self.cols else None
+
+    def get(self, i: int, j: int) -> float:
+        """The log-odds that cell (i, j) is occupied."""
+        return float(self.log_odds[i, j] if numpy is not None else self.log_odds[i * self.cols + j])
+
+    def probability(self, i: int, j: int) -> float:
+        return 1 - 1 / (1 + math.exp(self.get(i, j)))
+
+    def update(self, poses, ranges):
+        """
+        Integrates a batch of range readings.
+
+        :param poses: (x, y, theta) of the sensor for each reading, in metres and radians.
+        :type poses: Sequence[tuple[float, float, float]]
+        :param ranges: The readings, in metres.
+        :type ranges: Sequence[float]
+        :return: None
+        Author: Jack McDonald
+        """
+        if len(ranges) == 0:
+            return
+        if numpy is not None:
+            self.__update_vectorised(poses, ranges)
+        else:
+            for pose, distance in zip(poses, ranges):
+                self.__update_ray(pose, distance)
+
+    def count_occupied(self, x_min: float, y_min: float, x_max: float, y_max: float, threshold: float) -> int:
+        """
+        Counts the cells inside a rectangle whose log-odds exceed a threshold.
+
+        :return: The number of such cells.
+        :rtype: int
+        Author: Jack McDonald
+        """
+        i_min = max(0, math.ceil((x_min - self.x_min) / self.resolution))
+        j_min = max(0, math.ceil((y_min - self.y_min) / self.resolution))
+        i_max = min(self.rows, math.floor((x_max - self.x_min) / self.resolution))
+        j_max = min(self.cols, math.floor((y_max - self.y_min) / self.resolution))
+        if i_min >= i_max or j_min >= j_max:
+            return 0
+        if numpy is not None:
+            return int(numpy.count_nonzero(self.log_odds[i_min:i_max, j_min:j_max] > threshold))
+        return sum(1 for i in range(i_min, i_max) for j in range(j_min, j_max)
+                   if self.log_odds[i * self.cols + j] > threshold)
+
+    def __crossings(self, origin, direction, start: float):
+        # Distances along each ray at which it crosses the grid lines of one axis, nearest first
+        steps = numpy.arange(int(self.MAX_RANGE / self.resolution) + 2)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            first = start + (numpy.floor((origin - start) / self.resolution) + (direction > 0)) * self.resolution
+            distances = ((first - origin) / direction)[:, None] + steps * (self.resolution / numpy.abs(direction))[:, None]
+        return numpy.where(direction[:, None] != 0, distances, numpy.inf)
+
+    def __update_vectorised(self, poses, ranges):
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 3)
+        ranges = numpy.asarray(ranges, dtype=float)
+        cos, sin = numpy.cos(poses[:, 2]), numpy.sin(poses[:, 2])
+        lengths = numpy.minimum(ranges, self.MAX_RANGE)
+        size = self.rows * self.cols
+
+        # Every ray is cut at the grid lines it crosses; each piece lies in one cell, found from its middle
+        bounds = numpy.sort(numpy.concatenate((numpy.zeros((len(ranges), 1)),
+                                               self.__crossings(poses[:, 0], cos, self.x_min),
+                                               self.__crossings(poses[:, 1], sin, self.y_min)), axis=1), axis=1)
+        starts, ends = bounds[:, :-1], bounds[:, 1:]
+        # A piece is crossed if the ray leaves its cell before the reading ends
+        left = (ends < lengths[:, None]) & (ends > starts)
+        middle = numpy.where(left, (starts + ends) / 2, 0.0)
+        i = numpy.floor((poses[:, 0, None] + middle * cos[:, None] - self.x_min) / self.resolution).astype(int)
+        j = numpy.floor((poses[:, 1, None] + middle * sin[:, None] - self.y_min) / self.resolution).astype(int)
+        crossed = left & (i >= 0) & (i < self.rows) & (j >= 0) & (j < self.cols)
+        rays = numpy.broadcast_to(numpy.arange(len(ranges))[:, None], i.shape)
+
+        hit_i = numpy.floor((poses[:, 0] + lengths * cos - self.x_min) / self.resolution).astype(int)
+        hit_j = numpy.floor((poses[:, 1] + lengths * sin - self.y_min) / self.resolution).astype(int)
+        hit = ((ranges < self.MAX_RANGE) & (hit_i >= 0) & (hit_i < self.rows)
+               & (hit_j >= 0) & (hit_j < self.cols))
+        hits = numpy.arange(len(ranges))[hit] * size + hit_i[hit] * self.cols + hit_j[hit]
+
+        # A ray updates each cell it crosses once, and not the cell it ends in
+        free = numpy.unique(rays[crossed] * size + i[crossed] * self.cols + j[crossed])
+        free = free[~numpy.isin(free, hits)]
+
+        log_odds = self.log_odds.reshape(-1)
+        numpy.add.at(log_odds, free % size, self.FREE)
+        numpy.add.at(log_odds, hits % size, self.OCCUPIED)
+        numpy.clip(log_odds, -self.LIMIT, self.LIMIT, out=log_odds)
+
+    def __walk(self, x: float, y: float, cos: float, sin: float, length: float):
+        # Cells a ray passes through before the one it ends in, walking to whichever grid line is nearest next
+        i, j = math.floor((x - self.x_min) / self.resolution), math.floor((y - self.y_min) / self.resolution)
+        step_i, step_j = (1 if cos > 0 else -1), (1 if sin > 0 else -1)
+        next_i = ((i + (cos > 0)) * self.resolution + self.x_min - x) / cos if cos else math.inf
+        next_j = ((j + (sin > 0)) * self.resolution + self.y_min - y) / sin if sin else math.inf
+        delta_i = self.resolution / abs(cos) if cos else math.inf
+        delta_j = self.resolution / abs(sin) if sin else math.inf
+        while min(next_i, next_j) < length:
+            yield i, j
+            if next_i < next_j:
+                i, next_i = i + step_i, next_i + delta_i
+            else:
+                j, next_j = j + step_j, next_j + delta_j
+
+    def __update_ray(self, pose, distance: float):
+        x, y, theta = pose
+        cos, sin = math.cos(theta), math.sin(theta)
+        length = min(distance, self.MAX_RANGE)
+        hit = self.cell_at(x + length * cos, y + length * sin) if distance < self.MAX_RANGE else None
+        crossed = {(i, j) for i, j in self.__walk(x, y, cos, sin, length)
+                   if 0 <= i < self.rows and 0 <= j < self.cols and (i, j) != hit}
+        for i, j in crossed:
+            self.__add(i * self.cols + j, self.FREE)
+        if hit is not None:
+            self.__add(hit[0] * self.cols + hit[1], self.OCCUPIED)
+
+    def __add(self, index: int, amount: float):
+        self.log_odds[index] = max(-self.LIMIT, min(self.LIMIT, self.log_odds[index] + amount))
+
+
+class Mapper:
+    """
+    Maps the arena from the ultrasonic sensor as the robot drives, so
+    furniture is found from a distance rather than by driving into it.
+
+    Every distance reading of the SensorHub is paired with the pose of the
+    odometry at that moment and queued. A Scheduler task integrates the
+    queued readings into an OccupancyMap in one batch, then marks any
+    unsearched tile of the navigation grid with enough occupied cells in its
+    interior as furniture, which the planners then route around.
+
+    :ivar map: The occupancy map, covering the tiles of the navigation grid.
+    :type map: OccupancyMap
+    Author: Jack McDonald
+    """
+    RATE = 5  # (Hz) How often queued readings are integrated
+    # Placeholder: the sensor has not been measured on the robot yet, so readings are taken from the axle
+    SENSOR_OFFSET = 0.0  # (metres) How far ahead of the wheel axle the ultrasonic sensor sits
+    OCCUPIED_THRESHOLD = 2.0  # Log-odds above which a cell counts as occupied
+    MIN_OCCUPIED_CELLS = 2  # Occupied cells inside a tile for it to be marked as furniture
+    TILE_MARGIN = 0.2  # (tiles) Border of a tile ignored, as walls and lines sit on it
+
+    def __init__(self, odometry: Odometry, localiser: Localiser, sensor_hub: SensorHub,
+                 resolution: float = OccupancyMap.RESOLUTION):
+        """
+        Creates a mapper covering the navigation grid of the localiser, and
+        subscribes it to the distance readings of the hub.
+
+        :param odometry: Gives the pose of each reading.
+        :type odometry: Odometry
+        :param localiser: Gives the navigation grid and where its tiles lie.
+        :type localiser: Localiser
+        :param sensor_hub: Publishes the distance readings, in centimetres.
+        :type sensor_hub: SensorHub
+        :param resolution: Side of a cell of the occupancy map, in metres.
+        :type resolution: float
+        Author: Jack McDonald
+        """
+        self.odometry = odometry
+        self.localiser = localiser
+        self.navigation = localiser.navigation
+        grid = self.navigation.search_array
+        length = localiser.tile_length
+        row, col = localiser.origin
+        # Rows grow towards -x and columns towards -y, from the centre of the origin tile
+        self.map = OccupancyMap((row - grid.rows + 0.5) * length, (col - grid.cols + 0.5) * length,
+                                (row + 0.5) * length, (col + 0.5) * length, resolution)
+        self.__pending = []
+        self.__lock = Lock()
+        self.__stop_event = Event()
+        sensor_hub.subscribe("distance", self.on_distance)
+        sensor_hub.scheduler.add_task("mapping", self.update, self.RATE)
+
+    def stop(self):
+        self.__stop_event.set()
+
+    async def run_async(self):
+        """
+        Integrates the queued readings from a coroutine on the running event
+        loop, instead of on the scheduler thread.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        rate = AsyncRate(self.RATE)
+        while not self.__stop_event.is_set():
+            self.update()
+            await rate.sleep()
+
+    def on_distance(self, reading: Reading):
+        """
+        Queues a distance reading with the current pose of the sensor.
+
+        :param reading: The new distance reading, in centimetres.
+        :type reading: Reading
+        :return: None
+        Author: Jack McDonald
+        """
+        if reading.value is None or reading.value <= 0:
+            return
+        pose = self.odometry.pose
+        sensor = (pose.x + self.SENSOR_OFFSET * math.cos(pose.theta),
+                  pose.y + self.SENSOR_OFFSET * math.sin(pose.theta), pose.theta)
+        with self.__lock:
+            self.__pending.append((sensor, reading.value / 100))
+
+    def update(self):
+        """
+        Integrates the queued readings, and marks the tiles found to be occupied as furniture.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__stop_event.is_set():
+            return
+        with self.__lock:
+            pending, self.__pending = self.__pending, []
+        if not pending:
+            return
+        poses, ranges = zip(*pending)
+        self.map.update(poses, ranges)
+        self.__mark_furniture()
+
+    def __mark_furniture(self):
+        grid = self.navigation.search_array
+        length = self.localiser.tile_length
+        row_origin, col_origin = self.localiser.origin
+        half = (0.5 - self.TILE_MARGIN) * length
+        for row, col in grid.find(Cell.UNSEARCHED):
+            x, y = (row_origin - row) * length, (col_origin - col) * length
+            occupied = self.map.count_occupied(x - half, y - half, x + half, y + half, self.OCCUPIED_THRESHOLD)
+            if occupied >= self.MIN_OCCUPIED_CELLS:
+                self.navigation.set_cell(row, col, Cell.FURNITURE)
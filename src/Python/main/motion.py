@@ -0,0 +1,183 @@
+import math
+from collections import namedtuple
+
+from motor import MotorController
+from project.utils import clock
+from scheduler import AsyncRate, Rate
+
+Move = namedtuple("Move", ["kind", "amount", "speed"])
+Move.__doc__ = """A motion primitive: a straight move of `amount` metres, or a rotation by
+`amount` degrees as in MotorController.rotate, at `speed` degrees per second."""
+
+Segment = namedtuple("Segment", ["left", "right", "speed"])
+Segment.__doc__ = """Absolute encoder targets of both wheels at the end of one or more merged moves."""
+
+STRAIGHT = "straight"
+ROTATE = "rotate"
+
+
+class MotionQueue:
+    """
+    Drives a sequence of moves, handing over from one to the next without
+    stopping in between.
+
+    MotorController.move_distance_forward and rotate each wait until the
+    wheel has come to a complete stop before returning, so a route of tiles
+    and turns stops dead between every pair of moves. The queue instead
+    works out the encoder targets of every move up front, as absolute
+    positions from where the wheels were when it started, so rounding never
+    accumulates. Consecutive moves the wheels can run through in one go (two
+    straight moves, or two rotations the same way, at the same speed) are
+    merged into a single target, so the robot does not slow down between
+    them at all. Elsewhere, the next target is commanded as soon as both
+    wheels are within HANDOVER degrees of the current one, rather than once
+    they have stopped. Only the last move is waited on until the wheels stop.
+
+    Each merged move is given the time its travel takes at its speed, plus
+    TIMEOUT. A wheel stalled against furniture never reaches its target, so
+    once that time is up the motors are stopped and the rest of the moves
+    abandoned, rather than waiting forever.
+
+    :ivar motor_controller: Gives the drive motors and the robot's dimensions.
+    :type motor_controller: MotorController
+    :ivar moves: The moves still to drive.
+    :type moves: list[Move]
+    Author: Jack McDonald
+    """
+    HANDOVER = 15  # (degrees) Distance of a wheel from its target at which the next move is commanded
+    TIMEOUT = 2  # (seconds) Longest a move may run over the time its travel takes, in case a wheel is stalled
+
+    def __init__(self, motor_controller: MotorController):
+        self.motor_controller = motor_controller
+        self.moves = []
+        self.__targets = None
+        self.__directions = None
+
+    def straight(self, distance: float, speed: float = MotorController.FWD_SPEED):
+        """Queues a straight move of `distance` metres, backwards if negative."""
+        self.moves.append(Move(STRAIGHT, distance, speed))
+
+    def rotate(self, angle: float, speed: float = MotorController.TRN_SPEED):
+        """Queues a rotation by `angle` degrees, with the same sign convention as MotorController.rotate."""
+        self.moves.append(Move(ROTATE, angle, speed))
+
+    def plan(self, left: float, right: float) -> list:
+        """
+        Works out the encoder targets of the queued moves, merging those the
+        wheels can run through without slowing down.
+
+        :param left: Current encoder position of the left wheel, in degrees.
+        :type left: float
+        :param right: Current encoder position of the right wheel, in degrees.
+        :type right: float
+        :return: The segments to drive, in order.
+        :rtype: list[Segment]
+        Author: Jack McDonald
+        """
+        controller = self.motor_controller
+        segments = []
+        previous = None
+        for move in self.moves:
+            if move.kind == STRAIGHT:
+                left_step = right_step = move.amount * controller.DISTANCE_TO_DEGREES
+            else:
+                right_step = move.amount * controller.ORIENTATION_TO_DEGREES
+                left_step = -right_step
+            left, right = left + left_step, right + right_step
+            direction = (move.kind, move.amount > 0, move.speed)
+            if segments and direction == previous:
+                segments[-1] = Segment(left, right, move.speed)
+            else:
+                segments.append(Segment(left, right, move.speed))
+            previous = direction
+        return segments
+
+    def run(self) -> bool:
+        """
+        Drives the queued moves, blocking until the last one is complete, and empties the queue.
+
+        :return: True once every move is complete, False if a wheel stalled or could not be commanded.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        controller = self.motor_controller
+        try:
+            segments = self.__start()
+            rate = Rate(1 / controller.MOTOR_POLL_DELAY)
+            for index, segment in enumerate(segments):
+                deadline = self.__command(segment)
+                last = index == len(segments) - 1
+                while not self.__reached(last):
+                    if clock.monotonic() > deadline:
+                        return self.__stalled()
+                    controller.check_halted()
+                    rate.sleep()
+            return True
+        except IOError as error:
+            print(error)
+            return False
+
+    async def run_async(self) -> bool:
+        """
+        Drives the queued moves without blocking the event loop. See `run`.
+
+        :return: True once every move is complete, False if a wheel stalled or could not be commanded.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        controller = self.motor_controller
+        try:
+            segments = self.__start()
+            rate = AsyncRate(1 / controller.MOTOR_POLL_DELAY)
+            for index, segment in enumerate(segments):
+                deadline = self.__command(segment)
+                last = index == len(segments) - 1
+                while not self.__reached(last):
+                    if clock.monotonic() > deadline:
+                        return self.__stalled()
+                    controller.check_halted()
+                    await rate.sleep()
+            return True
+        except IOError as error:
+            print(error)
+            return False
+
+    def __start(self) -> list:
+        controller = self.motor_controller
+        self.__targets = (controller.motor_left.get_encoder(), controller.motor_right.get_encoder())
+        segments = self.plan(*self.__targets)
+        self.moves = []
+        return segments
+
+    def __command(self, segment: Segment) -> float:
+        # Commands the segment, and returns the time by which it must be reached
+        controller = self.motor_controller
+        targets = (segment.left, segment.right)
+        travel = max(abs(target - previous) for target, previous in zip(targets, self.__targets))
+        self.__directions = tuple(1 if target >= previous else -1
+                                  for target, previous in zip(targets, self.__targets))
+        self.__targets = targets
+        controller.set_wheel_targets(segment.left, segment.right, segment.speed)
+        return clock.monotonic() + travel / segment.speed + self.TIMEOUT
+
+    def __reached(self, last: bool) -> bool:
+        # The last segment is only complete once the wheels have stopped on it
+        if not self.__near():
+            return False
+        if not last:
+            return True
+        controller = self.motor_controller
+        return math.isclose(controller.motor_left.get_speed(), 0) and math.isclose(controller.motor_right.get_speed(), 0)
+
+    def __stalled(self) -> bool:
+        self.motor_controller.stop()
+        print(f"Motion stalled short of its targets {self.__targets}")
+        return False
+
+    def __near(self) -> bool:
+        # Remaining travel of each wheel in the direction it is moving, which
+        # goes negative if the wheel overshoots between two polls
+        controller = self.motor_controller
+        encoders = (controller.motor_left.get_encoder(), controller.motor_right.get_encoder())
+        return all((target - encoder) * direction <= self.HANDOVER
+                   for target, encoder, direction in zip(self.__targets, encoders, self.__directions))
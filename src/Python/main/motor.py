@@ -1,9 +1,16 @@
-import time
-
 import math
+from contextlib import contextmanager
 from math import pi
+from threading import RLock
 
+from project.utils import clock
 from project.utils.brick import Motor
+from scheduler import AsyncRate, Rate
+from velocity_profile import VelocityProfile
+
+
+class MotorsHalted(Exception):
+    """Raised by the commands and waits of a MotorController latched by `halt`, until `release`."""
 
 
 class MotorController:
@@ -16,6 +23,12 @@ class MotorController:
     It handles speed and power limits for the motors and converts distances and
     angles into appropriate motor movements.
 
+    Once `halt` is called, by the emergency stop, the motors are latched
+    stopped: every command and motor wait raises MotorsHalted instead, so a
+    control loop still running cannot drive the wheels again, until
+    `release`. Commands hold a lock while checking the latch, so none can
+    land between a halt and the motors stopping.
+
     :ivar motor_left: The motor controlling the left wheel.
     :type motor_left: Motor
     :ivar motor_right: The motor controlling the right wheel.
@@ -24,7 +37,7 @@ class MotorController:
     :type motor_dispenser: Motor
     Author: Jack McDonald
     """
-    MOTOR_POLL_DELAY = 0.05
+    MOTOR_POLL_DELAY = 0.02  # (seconds) Period of the 50 Hz motor supervision loop
     SQUARE_LENGTH = 0.5
 
     WHEEL_RADIUS = 0.0206  # (meters) Radius of one wheel
@@ -43,6 +56,18 @@ class MotorController:
 
     MOVEMENT_CORRECTION_FACTOR = 1
 
+    PROFILE_RATE = 50  # (Hz) Rate at which the speed setpoints of a profiled move are streamed
+    ACCELERATION = 600  # (deg per sec^2) Largest wheel acceleration of a profiled move
+    JERK = 3000  # (deg per sec^3) Largest rate of change of the wheel acceleration of a profiled move
+    # Turning on the spot spins the robot about its centre rather than pushing all of it along, so the
+    # wheels need less force for the same acceleration and can take higher limits before slipping
+    TURN_ACCELERATION = 1200  # (deg per sec^2) Largest wheel acceleration of a profiled turn
+    TURN_JERK = 8000  # (deg per sec^3) Largest rate of change of the wheel acceleration of a profiled turn
+    PROFILED_FWD_SPEED = 250  # (deg per sec) Peak moving forward speed of a profiled move
+    PROFILED_TRN_SPEED = 300  # (deg per sec) Peak turning speed of a profiled move
+    SETTLE_TOLERANCE = 2  # (degrees) Distance of a wheel from its target at which a profiled move is complete
+    SETTLE_TIMEOUT = 1  # (seconds) Longest a profiled move may take to settle, in case a wheel is stalled
+
     def __init__(self):
         """
         Represents a robotic system utilizing three motors: left, right,
@@ -64,6 +89,48 @@ class MotorController:
         self.motor_left = Motor("C")
         self.motor_right = Motor("B")
         self.motor_dispenser = Motor("A")
+        self.__command_lock = RLock()
+        self.__halted = False
+
+    def halt(self):
+        """
+        Stops every motor and latches them stopped until `release`. Safe to
+        call from any thread.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__command_lock:
+            self.__halted = True
+            for motor in (self.motor_left, self.motor_right, self.motor_dispenser):
+                try:
+                    motor.set_power(0)
+                except IOError as error:
+                    print(error)
+
+    def release(self):
+        """
+        Clears the latch of `halt`, so the motors can be commanded again.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__command_lock:
+            self.__halted = False
+
+    def is_halted(self) -> bool:
+        return self.__halted
+
+    def check_halted(self):
+        """
+        Raises MotorsHalted if the motors are latched stopped. Called by
+        control loops which poll without commanding the motors.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__halted:
+            raise MotorsHalted()
 
     def wait_for_motor(self, motor: Motor):
         """
@@ -72,16 +139,37 @@ class MotorController:
         This function continuously checks the current speed of the motor. It first ensures
         that the motor is not already stationary, and if not, it pauses until the motor
         reaches a speed of zero. Afterward, it waits until the motor fully halts to avoid
-        any residual motion.
+        any residual motion. Polling is paced by a fixed-rate Rate so the loop
+        does not drift with the time spent reading the motor status.
+
+        :param motor: The motor object whose speed will be monitored.
+        :type motor: Motor
+        Author: Jack McDonald
+        """
+        rate = Rate(1 / self.MOTOR_POLL_DELAY)
+        while math.isclose(motor.get_speed(), 0):
+            self.check_halted()
+            rate.sleep()
+        while not math.isclose(motor.get_speed(), 0):
+            self.check_halted()
+            rate.sleep()
+
+    async def wait_for_motor_async(self, motor: Motor):
+        """
+        Waits for a motor to completely stop moving without blocking the event
+        loop. See `wait_for_motor`.
 
         :param motor: The motor object whose speed will be monitored.
         :type motor: Motor
         Author: Jack McDonald
         """
+        rate = AsyncRate(1 / self.MOTOR_POLL_DELAY)
         while math.isclose(motor.get_speed(), 0):
-            time.sleep(self.MOTOR_POLL_DELAY)
+            self.check_halted()
+            await rate.sleep()
         while not math.isclose(motor.get_speed(), 0):
-            time.sleep(self.MOTOR_POLL_DELAY)
+            self.check_halted()
+            await rate.sleep()
 
     def init_motor(self, motor: Motor):
         """
@@ -121,23 +209,37 @@ class MotorController:
         Author: Jack McDonald
         """
         try:
-            self.motor_left.set_dps(speed)
-            self.motor_right.set_dps(speed)
-            self.motor_left.set_limits(self.POWER_LIMIT, speed)
-            self.motor_right.set_limits(self.POWER_LIMIT, speed)
-            self.motor_left.set_position_relative(int(distance * self.DISTANCE_TO_DEGREES))
-            self.motor_right.set_position_relative(int(distance * self.DISTANCE_TO_DEGREES))
-
+            self.__command_distance(distance, speed)
             self.wait_for_motor(self.motor_right)
         except IOError as error:
             print(error)
 
+    async def move_distance_forward_async(self, distance, speed):
+        """
+        Moves a robot forward for a specified distance at a given speed, awaiting
+        the end of the movement instead of blocking. See `move_distance_forward`.
+
+        :param distance: The distance in units to move forward.
+        :type distance: float
+        :param speed: The speed in degrees per second for the motors.
+        :type speed: int
+        :return: None
+        Author: Jack McDonald
+        """
+        try:
+            self.__command_distance(distance, speed)
+            await self.wait_for_motor_async(self.motor_right)
+        except IOError as error:
+            print(error)
+
     def rotate(self, angle, speed):
         """
         Performs a rotation by controlling two motors according to the specified angle
         and speed. The method calculates the necessary motor positions based on the
         angle and sets their speeds accordingly. After setting the motor parameters
         and starting the motion, it waits for one motor to complete the rotation.
+        Positive angles turn the robot counter-clockwise, to its left, with the
+        right wheel driving forwards and the left wheel backwards.
 
         :param angle: The rotation angle in degrees, used to determine the relative
                       position change for each motor.
@@ -149,17 +251,117 @@ class MotorController:
         Author: Jack McDonald
         """
         try:
-            self.motor_left.set_dps(speed)
-            self.motor_right.set_dps(speed)
-            self.motor_left.set_limits(self.POWER_LIMIT, speed)
-            self.motor_right.set_limits(self.POWER_LIMIT, speed)
-            self.motor_left.set_position_relative(int(angle * self.ORIENTATION_TO_DEGREES))
-            self.motor_right.set_position_relative(int(-angle * self.ORIENTATION_TO_DEGREES))
-
+            self.__command_rotation(angle, speed)
             self.wait_for_motor(self.motor_right)
         except IOError as error:
             print(error)
 
+    async def rotate_async(self, angle, speed):
+        """
+        Performs a rotation, awaiting its end instead of blocking. See `rotate`.
+
+        :param angle: The rotation angle in degrees.
+        :type angle: float
+        :param speed: The rotational speed in degrees per second.
+        :type speed: int
+        :return: None
+        Author: Jack McDonald
+        """
+        try:
+            self.__command_rotation(angle, speed)
+            await self.wait_for_motor_async(self.motor_right)
+        except IOError as error:
+            print(error)
+
+    def profile(self, degrees: float, speed: float, turn: bool = False) -> VelocityProfile:
+        """
+        The S-curve profile a profiled move uses to turn the wheels by `degrees`, at a peak of `speed`.
+
+        :param degrees: Wheel rotation of the move, whose sign is ignored.
+        :type degrees: float
+        :param speed: Peak speed in degrees per second.
+        :type speed: float
+        :param turn: Whether the move turns on the spot, which uses the turn acceleration and jerk limits.
+        :type turn: bool
+        :return: The profile, in degrees of wheel rotation.
+        :rtype: VelocityProfile
+        Author: Jack McDonald
+        """
+        if turn:
+            return VelocityProfile.s_curve(abs(degrees), speed, self.TURN_ACCELERATION, self.TURN_JERK,
+                                           self.PROFILE_RATE)
+        return VelocityProfile.s_curve(abs(degrees), speed, self.ACCELERATION, self.JERK, self.PROFILE_RATE)
+
+    def move_distance_profiled(self, distance, speed=PROFILED_FWD_SPEED):
+        """
+        Moves the robot forward for a specified distance, ramping the speed up
+        and down smoothly rather than switching straight to it.
+
+        Instead of a single position target at a constant speed, the speed
+        setpoints of an S-curve profile are streamed to both motors at
+        PROFILE_RATE, so the wheels never slip from a step in torque and the
+        robot does not overshoot. The motors are then given the final
+        position, which takes up whatever the wheels lagged behind the
+        profile. As the acceleration stays bounded, the peak speed can be much
+        higher than FWD_SPEED. If the wheels have not settled SETTLE_TIMEOUT
+        after the profile ends, as when one is stalled, the motors are stopped.
+
+        :param distance: The distance in meters to move forward, backwards if negative.
+        :type distance: float
+        :param speed: The peak speed in degrees per second for the motors.
+        :type speed: float
+        :return: None
+        Author: Jack McDonald
+        """
+        degrees = distance * self.DISTANCE_TO_DEGREES
+        self.__run_profile(degrees, degrees, speed)
+
+    async def move_distance_profiled_async(self, distance, speed=PROFILED_FWD_SPEED):
+        """
+        Moves the robot forward along a velocity profile, awaiting the end of
+        the movement instead of blocking. See `move_distance_profiled`.
+
+        :param distance: The distance in meters to move forward, backwards if negative.
+        :type distance: float
+        :param speed: The peak speed in degrees per second for the motors.
+        :type speed: float
+        :return: None
+        Author: Jack McDonald
+        """
+        degrees = distance * self.DISTANCE_TO_DEGREES
+        await self.__run_profile_async(degrees, degrees, speed)
+
+    def rotate_profiled(self, angle, speed=PROFILED_TRN_SPEED):
+        """
+        Performs a rotation along a velocity profile. See `rotate` for the
+        angle and `move_distance_profiled` for the profile, which ramps at
+        TURN_ACCELERATION and TURN_JERK.
+
+        :param angle: The rotation angle in degrees.
+        :type angle: float
+        :param speed: The peak speed in degrees per second for the motors.
+        :type speed: float
+        :return: None
+        Author: Jack McDonald
+        """
+        degrees = angle * self.ORIENTATION_TO_DEGREES
+        self.__run_profile(-degrees, degrees, speed, turn=True)
+
+    async def rotate_profiled_async(self, angle, speed=PROFILED_TRN_SPEED):
+        """
+        Performs a rotation along a velocity profile, awaiting its end instead
+        of blocking. See `rotate_profiled`.
+
+        :param angle: The rotation angle in degrees.
+        :type angle: float
+        :param speed: The peak speed in degrees per second for the motors.
+        :type speed: float
+        :return: None
+        Author: Jack McDonald
+        """
+        degrees = angle * self.ORIENTATION_TO_DEGREES
+        await self.__run_profile_async(-degrees, degrees, speed, turn=True)
+
     def dispense(self):
         """
         Controls the operation of dispensing through a motor mechanism.
@@ -174,14 +376,25 @@ class MotorController:
         Author: Jack McDonald
         """
         try:
-            self.motor_dispenser.set_dps(self.DSP_SPEED)
-            self.motor_dispenser.set_limits(self.POWER_LIMIT, self.DSP_SPEED)
-            self.motor_dispenser.set_position_relative(self.DISPENSER_TURN_ANGLE)
-
+            self.__command_dispense()
             self.wait_for_motor(self.motor_dispenser)
         except IOError as error:
             print(error)
 
+    async def dispense_async(self):
+        """
+        Dispenses, awaiting the end of the dispenser movement instead of
+        blocking. Because the drive motors are not involved, this can run
+        concurrently with a drive coroutine. See `dispense`.
+
+        Author: Jack McDonald
+        """
+        try:
+            self.__command_dispense()
+            await self.wait_for_motor_async(self.motor_dispenser)
+        except IOError as error:
+            print(error)
+
     def reset_dispenser(self):
         """
         Resets the dispenser's motor to its initial state by setting its speed,
@@ -192,22 +405,128 @@ class MotorController:
         Author: Jack McDonald
         """
         try:
-            self.motor_dispenser.set_dps(self.DSP_SPEED)
-            self.motor_dispenser.set_limits(self.POWER_LIMIT, self.DSP_SPEED)
-            self.motor_dispenser.set_position(0)
+            with self.__commanding():
+                self.motor_dispenser.set_dps(self.DSP_SPEED)
+                self.motor_dispenser.set_limits(self.POWER_LIMIT, self.DSP_SPEED)
+                self.motor_dispenser.set_position(0)
 
             self.wait_for_motor(self.motor_dispenser)
         except IOError as error:
             print(error)
 
     def move_forward(self):
-        self.motor_left.set_dps(self.FWD_SPEED)
-        self.motor_right.set_dps(self.FWD_SPEED)
-        self.motor_left.set_limits(self.POWER_LIMIT, self.FWD_SPEED)
-        self.motor_right.set_limits(self.POWER_LIMIT, self.FWD_SPEED)
-        self.motor_left.set_power(self.FWD_SPEED)
-        self.motor_right.set_power(self.FWD_SPEED)
+        with self.__commanding():
+            self.motor_left.set_dps(self.FWD_SPEED)
+            self.motor_right.set_dps(self.FWD_SPEED)
+            self.motor_left.set_limits(self.POWER_LIMIT, self.FWD_SPEED)
+            self.motor_right.set_limits(self.POWER_LIMIT, self.FWD_SPEED)
+            self.motor_left.set_power(self.FWD_SPEED)
+            self.motor_right.set_power(self.FWD_SPEED)
+
+    def set_forward_speed(self, speed):
+        """Drives both wheels forward at `speed` degrees per second, until told otherwise."""
+        self.set_wheel_speeds(speed, speed)
+
+    def set_wheel_speeds(self, left, right):
+        """Drives the wheels at `left` and `right` degrees per second, until told otherwise."""
+        with self.__commanding():
+            self.motor_left.set_dps(left)
+            self.motor_right.set_dps(right)
+
+    def set_wheel_targets(self, left, right, speed):
+        """Sends the wheels to the absolute encoder positions `left` and `right`, at `speed` degrees per second."""
+        with self.__commanding():
+            for motor, target in zip((self.motor_left, self.motor_right), (left, right)):
+                motor.set_dps(speed)
+                motor.set_limits(self.POWER_LIMIT, speed)
+                motor.set_position(int(round(target)))
 
     def stop(self):
         self.motor_left.set_power(0)
         self.motor_right.set_power(0)
+
+    @contextmanager
+    def __commanding(self):
+        # Held through a whole command, so `halt` either waits for it or the command sees the latch
+        with self.__command_lock:
+            self.check_halted()
+            yield
+
+    def __command_distance(self, distance, speed):
+        with self.__commanding():
+            self.motor_left.set_dps(speed)
+            self.motor_right.set_dps(speed)
+            self.motor_left.set_limits(self.POWER_LIMIT, speed)
+            self.motor_right.set_limits(self.POWER_LIMIT, speed)
+            self.motor_left.set_position_relative(int(distance * self.DISTANCE_TO_DEGREES))
+            self.motor_right.set_position_relative(int(distance * self.DISTANCE_TO_DEGREES))
+
+    def __command_rotation(self, angle, speed):
+        with self.__commanding():
+            self.motor_left.set_dps(speed)
+            self.motor_right.set_dps(speed)
+            self.motor_left.set_limits(self.POWER_LIMIT, speed)
+            self.motor_right.set_limits(self.POWER_LIMIT, speed)
+            self.motor_left.set_position_relative(int(-angle * self.ORIENTATION_TO_DEGREES))
+            self.motor_right.set_position_relative(int(angle * self.ORIENTATION_TO_DEGREES))
+
+    def __command_dispense(self):
+        with self.__commanding():
+            self.motor_dispenser.set_dps(self.DSP_SPEED)
+            self.motor_dispenser.set_limits(self.POWER_LIMIT, self.DSP_SPEED)
+            self.motor_dispenser.set_position_relative(self.DISPENSER_TURN_ANGLE)
+
+    def __run_profile(self, left_degrees, right_degrees, speed, turn=False):
+        try:
+            targets = (self.motor_left.get_encoder() + left_degrees, self.motor_right.get_encoder() + right_degrees)
+            rate = Rate(self.PROFILE_RATE)
+            for setpoint in self.profile(left_degrees, speed, turn).speeds:
+                self.__command_speeds(setpoint, left_degrees, right_degrees)
+                rate.sleep()
+            self.__command_targets(targets, speed)
+            deadline = clock.monotonic() + self.SETTLE_TIMEOUT
+            rate = Rate(1 / self.MOTOR_POLL_DELAY)
+            while not self.__settled(targets):
+                if clock.monotonic() > deadline:
+                    self.__unsettled(targets)
+                    return
+                self.check_halted()
+                rate.sleep()
+        except IOError as error:
+            print(error)
+
+    async def __run_profile_async(self, left_degrees, right_degrees, speed, turn=False):
+        try:
+            targets = (self.motor_left.get_encoder() + left_degrees, self.motor_right.get_encoder() + right_degrees)
+            rate = AsyncRate(self.PROFILE_RATE)
+            for setpoint in self.profile(left_degrees, speed, turn).speeds:
+                self.__command_speeds(setpoint, left_degrees, right_degrees)
+                await rate.sleep()
+            self.__command_targets(targets, speed)
+            deadline = clock.monotonic() + self.SETTLE_TIMEOUT
+            rate = AsyncRate(1 / self.MOTOR_POLL_DELAY)
+            while not self.__settled(targets):
+                if clock.monotonic() > deadline:
+                    self.__unsettled(targets)
+                    return
+                self.check_halted()
+                await rate.sleep()
+        except IOError as error:
+            print(error)
+
+    def __command_speeds(self, setpoint, left_degrees, right_degrees):
+        self.set_wheel_speeds(math.copysign(setpoint, left_degrees), math.copysign(setpoint, right_degrees))
+
+    def __command_targets(self, targets, speed):
+        with self.__commanding():
+            for motor, target in zip((self.motor_left, self.motor_right), targets):
+                motor.set_limits(self.POWER_LIMIT, speed)
+                motor.set_position(int(round(target)))
+
+    def __unsettled(self, targets):
+        self.stop()
+        print(f"Profiled move stalled short of its targets {targets}")
+
+    def __settled(self, targets) -> bool:
+        return all(abs(motor.get_encoder() - target) <= self.SETTLE_TOLERANCE
+                   for motor, target in zip((self.motor_left, self.motor_right), targets))
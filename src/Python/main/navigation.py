@@ -1,3 +1,22 @@
+from collections import deque
+from heapq import heappop, heappush
+from itertools import permutations
+
+from dstar_lite import DStarLite
+from grid import OBSTACLES, STEPS, Cell, Grid
+from motor import MotorController
+
+# Route primitives, each carried out by the Chassis method of the same name
+FORWARD = "move_one_tile"
+TURN_LEFT = "turn_left"
+TURN_RIGHT = "turn_right"
+TURN_AROUND = "turn_around"
+
+# Headings, clockwise from north, i.e. towards row 0, indexing grid.STEPS
+NORTH, EAST, SOUTH, WEST = range(4)
+TURNS = {0: (), 1: (TURN_RIGHT,), 2: (TURN_AROUND,), 3: (TURN_LEFT,)}  # Turns by number of clockwise quarter turns
+
+
 class Navigation:
     """
     Represents a navigation system for searching a 2D grid with different 
@@ -9,17 +28,32 @@ class Navigation:
     route. It maintains a queue for search operations and tracks the 
     number of found fires.
 
-    :ivar search_array: A 2D list representing the search grid. Each cell 
-        can contain values ('u' for unsearched, 'w' for wall, 'f' for 
-        furniture, 'c' for current position, 's' for searched).
-    :type search_array: list[list[str]]
+    :ivar search_array: The search grid. Each cell can contain values
+        ('u' for unsearched, 'w' for wall, 'f' for furniture, 'c' for
+        current position, 's' for searched), indexed as search_array[row, col].
+    :type search_array: Grid
     :ivar search_queue: A list representing the queue used to store 
         search operations.
     :type search_queue: list
     :ivar found: The count of fires found during the search.
     :type found: int
+    :ivar position: The (row, column) of the robot in the search grid.
+    :type position: tuple[int, int]
+    :ivar heading: The direction the robot faces, one of NORTH, EAST, SOUTH or WEST.
+    :type heading: int
+    :ivar costs: Time in seconds each route primitive takes, used to plan the quickest routes.
+    :type costs: dict[str, float]
     Author: Jack McDonald
     """
+    OBSTACLES = OBSTACLES
+    # Estimated from the motor speeds; replace with measured times through set_costs
+    SETTLE_TIME = 0.15  # (seconds) Time for the motors to come to rest at the end of a move
+    FORWARD_TIME = (MotorController.SQUARE_LENGTH * MotorController.DISTANCE_TO_DEGREES
+                    / MotorController.FWD_SPEED + SETTLE_TIME)  # (seconds)
+    TURN_TIME = 90 * MotorController.ORIENTATION_TO_DEGREES / MotorController.TRN_SPEED + SETTLE_TIME  # (seconds)
+    AROUND_TIME = 180 * MotorController.ORIENTATION_TO_DEGREES / MotorController.TRN_SPEED + SETTLE_TIME  # (seconds)
+    EXACT_TOUR_LIMIT = 7  # Most unsearched tiles for which every visiting order is tried
+
     def __init__(self):
         """
         Class responsible for managing a search operation in a grid-like structure. The 
@@ -28,7 +62,7 @@ class Navigation:
         search using predefined symbols.
 
         :Attributes:
-            search_array: list of list of str
+            search_array: Grid
                 A 2D grid representing the search area. Each cell in the grid can take 
                 values such as 'u' (unsearched), 'w' (wall), 'f' (furniture), 'c' 
                 (current position), or 's' (searched) to depict the current state of 
@@ -44,13 +78,24 @@ class Navigation:
         # f = furniture
         # c = current pos.
         # s = searched
-        self.search_array = [
+        self.search_array = Grid.from_rows([
             ['u', 'u', 'u'],
             ['u', 'u', 'u'],
             ['w', 'c', 'w']
-        ]
+        ])
         self.search_queue = []
         self.found = 0
+        self.position = (2, 1)
+        self.heading = NORTH
+        self.costs = None
+        self.__distances = None
+        self.__times = None
+        self.__previous = None
+        self.__layout = None
+        self.__planner = None
+        self.__planner_layout = None
+        self.__subscribers = []
+        self.set_costs(self.FORWARD_TIME, self.TURN_TIME, self.AROUND_TIME)
 
     def __queue_search(self):
         """
@@ -59,35 +104,335 @@ class Navigation:
         
         This function iterates through the search grid and identifies 
         all tiles marked as 'u' (unsearched). Each identified tile's 
-        position is added to the search queue for further processing.
+        position is added to the search queue for further processing,
+        in the order that visits them all in the least time. Tiles that
+        cannot be reached are left out.
         
         :return: None
         :rtype: None
         Author: Jack McDonald
         """
-        pass
+        self.search_queue = self.plan_search()
 
     def get_next_route(self):
         """
         Handles the computation and retrieval of the next route in a series of routes.
-        This method is intended to provide navigation functionality by determining
-        and returning the next logical route from a defined set or sequence.
+        The next route leads from the current position to the first tile of the
+        quickest tour of the unsearched tiles, as a sequence of Chassis
+        primitives: FORWARD, TURN_LEFT, TURN_RIGHT and TURN_AROUND.
+
+        :return: The next route, or None once every reachable tile is searched.
+        :rtype: list[str]
+        Author: Jack McDonald
+        """
+        self.__queue_search()
+        if not self.search_queue:
+            return None
+        return self.route_to(self.search_queue.pop(0))
+
+    def set_costs(self, forward_time: float, turn_time: float, around_time: float):
+        """
+        Sets the time each route primitive takes, e.g. as measured on the robot
+        by benchmarks/calibrate_route_costs.py.
+
+        :param forward_time: Seconds to move one tile forward.
+        :type forward_time: float
+        :param turn_time: Seconds to turn left or right by 90 degrees.
+        :type turn_time: float
+        :param around_time: Seconds to turn around.
+        :type around_time: float
+        :return: None
+        Author: Jack McDonald
+        """
+        self.costs = {FORWARD: forward_time, TURN_LEFT: turn_time, TURN_RIGHT: turn_time, TURN_AROUND: around_time}
+        self.__layout = None
+
+    def distance(self, start: tuple, goal: tuple):
+        """
+        Returns the number of tiles on a shortest path between two tiles, from
+        the precomputed tables.
+
+        :param start: (row, column) of the first tile.
+        :type start: tuple[int, int]
+        :param goal: (row, column) of the second tile.
+        :type goal: tuple[int, int]
+        :return: The distance in tiles, or None if there is no path.
+        :rtype: int
+        Author: Jack McDonald
+        """
+        return self.__tables()[0].get(start, {}).get(goal)
+
+    def travel_time(self, goal: tuple, start: tuple = None, heading: int = None):
+        """
+        Returns the time of the quickest route to a tile, turns included, from
+        the precomputed tables.
+
+        :param goal: (row, column) of the tile to reach.
+        :type goal: tuple[int, int]
+        :param start: (row, column) to start from, by default the current position.
+        :type start: tuple[int, int]
+        :param heading: Heading to start with, by default the current heading.
+        :type heading: int
+        :return: The time in seconds, or None if the tile cannot be reached.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        state = (self.position if start is None else start, self.heading if heading is None else heading)
+        arrival = self.__tables()[1].get(state, {}).get(goal)
+        return None if arrival is None else arrival[0]
+
+    def route_to(self, goal: tuple, start: tuple = None, heading: int = None):
+        """
+        Plans the quickest route to a tile, around walls and furniture. As a
+        turn takes longer than a tile forward, this is the route with the least
+        turns among the short ones, not merely one with the least tiles.
+
+        :param goal: (row, column) of the tile to reach.
+        :type goal: tuple[int, int]
+        :param start: (row, column) to start from, by default the current position.
+        :type start: tuple[int, int]
+        :param heading: Heading to start with, by default the current heading.
+        :type heading: int
+        :return: The Chassis primitives leading to the goal, or None if it cannot be reached.
+        :rtype: list[str]
+        Author: Jack McDonald
+        """
+        source = (self.position if start is None else start, self.heading if heading is None else heading)
+        _, times, previous = self.__tables()
+        arrival = times.get(source, {}).get(goal)
+        if arrival is None:
+            return None
+        route = []
+        state = (goal, arrival[1])
+        while state != source:
+            state, primitive = previous[source][state]
+            route.append(primitive)
+        route.reverse()
+        return route
+
+    def replan_route(self, goal: tuple):
+        """
+        Plans a shortest route to a tile like `route_to`, but incrementally:
+        while the goal stays the same, the plan of the previous call is kept
+        and only repaired around the tiles that changed since, instead of
+        being searched again from scratch. Use this to replan mid-route when
+        furniture or a wall is discovered.
+
+        Unlike `route_to`, the route has the least tiles rather than the
+        least time, as turns do not enter the incremental search.
 
-        :return: The next route determined by the calculation or retrieval.
-        :rtype: str
+        :param goal: (row, column) of the tile to reach.
+        :type goal: tuple[int, int]
+        :return: The Chassis primitives leading to the goal, or None if it cannot be reached.
+        :rtype: list[str]
         Author: Jack McDonald
         """
-        pass
+        grid = self.search_array
+        if (self.__planner is None or self.__planner.goal != goal
+                or self.__planner_layout != (id(grid), grid.layout_version)):
+            self.__planner = DStarLite(grid.rows, grid.cols, grid.is_free, self.position, goal)
+            self.__planner_layout = (id(grid), grid.layout_version)
+        else:
+            self.__planner.move_to(self.position)
+        path = self.__planner.path()
+        if path is None:
+            return None
+        route = []
+        heading = self.heading
+        for cell, following in zip(path, path[1:]):
+            step = STEPS.index((following[0] - cell[0], following[1] - cell[1]))
+            route += TURNS[(step - heading) % 4]
+            route.append(FORWARD)
+            heading = step
+        return route
+
+    def plan_search(self) -> list:
+        """
+        Orders the visits to every reachable unsearched tile so that the tour,
+        starting from the current position and heading, takes the least time.
+
+        This is a small asymmetric travelling salesman problem, as the time
+        between two tiles depends on the heading the robot arrives with. Up to
+        EXACT_TOUR_LIMIT tiles, every order is tried. Beyond that, the tour is
+        built by always going to the quickest tile to reach next, then improved
+        by reversing sections of it (2-opt) or moving single tiles (or-opt)
+        for as long as that helps.
+
+        :return: The (row, column) of the tiles, in the order to visit them.
+        :rtype: list[tuple[int, int]]
+        Author: Jack McDonald
+        """
+        times = self.__tables()[1]
+        reachable = times.get((self.position, self.heading), {})
+        targets = [tile for tile in self.search_array.find(Cell.UNSEARCHED) if tile in reachable]
+        if len(targets) <= self.EXACT_TOUR_LIMIT:
+            return list(min(permutations(targets), key=self.tour_time, default=()))
+
+        tour = []
+        state = (self.position, self.heading)
+        remaining = set(targets)
+        while remaining:
+            goal = min(remaining, key=lambda cell: times[state][cell][0])
+            state = (goal, times[state][goal][1])
+            tour.append(goal)
+            remaining.remove(goal)
+
+        best = self.tour_time(tour)
+        improved = True
+        while improved:
+            improved = False
+            for candidate in self.__neighbouring_tours(tour):
+                time = self.tour_time(candidate)
+                if time < best - 1e-9:
+                    tour, best, improved = candidate, time, True
+                    break
+        return tour
+
+    def set_cell(self, row: int, col: int, value: str):
+        """
+        Sets one cell of the search grid. The distance tables are rebuilt on the
+        next query if an obstacle appeared or disappeared, and the incremental
+        plan of `replan_route` is repaired rather than started again, so the
+        grid should be changed through this method rather than by writing to
+        `search_array` directly.
+
+        :param row: Row of the cell.
+        :type row: int
+        :param col: Column of the cell.
+        :type col: int
+        :param value: The new state of the cell, one of 'u', 'w', 'f', 'c' or 's'.
+        :type value: str
+        :return: None
+        Author: Jack McDonald
+        """
+        grid = self.search_array
+        in_step = self.__planner_layout == (id(grid), grid.layout_version)
+        grid[row, col] = value
+        if in_step and self.__planner is not None:
+            self.__planner.update_tile((row, col))
+            self.__planner_layout = (id(grid), grid.layout_version)
+        for callback in self.__subscribers:
+            callback((row, col))
+
+    def subscribe(self, callback):
+        """
+        Registers a callback to run after every change made through `set_cell`.
+
+        :param callback: A callable receiving the (row, column) of the changed tile.
+        :type callback: Callable[[tuple[int, int]], None]
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__subscribers.append(callback)
+
+    def turned(self, primitive: str):
+        """
+        Updates the heading once a route primitive has been carried out.
+
+        :param primitive: The primitive the chassis has completed.
+        :type primitive: str
+        :return: None
+        Author: Jack McDonald
+        """
+        for quarters, turns in TURNS.items():
+            if turns == (primitive,):
+                self.heading = (self.heading + quarters) % 4
+
+    @staticmethod
+    def __neighbouring_tours(tour: list):
+        # Reversing a section (2-opt) and moving one tile elsewhere (or-opt)
+        for i in range(len(tour) - 1):
+            for j in range(i + 2, len(tour) + 1):
+                yield tour[:i] + tour[i:j][::-1] + tour[j:]
+        for i in range(len(tour)):
+            rest = tour[:i] + tour[i + 1:]
+            for j in range(len(tour)):
+                if j != i:
+                    yield rest[:j] + [tour[i]] + rest[j:]
+
+    def tour_time(self, tour) -> float:
+        """Time in seconds to visit the tiles in the given order, from the current position and heading."""
+        times = self.__tables()[1]
+        state = (self.position, self.heading)
+        total = 0.0
+        for goal in tour:
+            time, heading = times[state][goal]
+            total += time
+            state = (goal, heading)
+        return total
+
+    def __tables(self):
+        # A breadth-first search from every free tile gives the distance between
+        # every pair of tiles. A Dijkstra search from every (tile, heading) gives
+        # the quickest time to every tile, with the heading it is reached with,
+        # and the previous state and primitive of each state to retrace the route.
+        grid = self.search_array
+        if self.__layout != (id(grid), grid.layout_version):
+            free = grid.free_tiles()
+            self.__distances = {start: self.__breadth_first(start) for start in free}
+            self.__times, self.__previous = {}, {}
+            for start in free:
+                for heading in range(4):
+                    source = (start, heading)
+                    self.__times[source], self.__previous[source] = self.__quickest(source)
+            self.__layout = (id(grid), grid.layout_version)
+        return self.__distances, self.__times, self.__previous
+
+    def __breadth_first(self, start: tuple) -> dict:
+        distances = {start: 0}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for neighbour in self.search_array.neighbours(cell):
+                if neighbour not in distances:
+                    distances[neighbour] = distances[cell] + 1
+                    queue.append(neighbour)
+        return distances
+
+    def __quickest(self, source: tuple):
+        times = {source: 0.0}
+        previous = {}
+        queue = [(0.0, source)]
+        while queue:
+            time, state = heappop(queue)
+            if time > times[state]:
+                continue
+            cell, heading = state
+            moves = [((cell, (heading + quarters) % 4), turns[0]) for quarters, turns in TURNS.items() if turns]
+            step = (cell[0] + STEPS[heading][0], cell[1] + STEPS[heading][1])
+            if self.search_array.is_free(step):
+                moves.append(((step, heading), FORWARD))
+            for following, primitive in moves:
+                arrival = time + self.costs[primitive]
+                if arrival < times.get(following, float("inf")):
+                    times[following] = arrival
+                    previous[following] = (state, primitive)
+                    heappush(queue, (arrival, following))
+
+        arrivals = {}
+        for (cell, heading), time in times.items():
+            if cell not in arrivals or time < arrivals[cell][0]:
+                arrivals[cell] = (time, heading)
+        return arrivals, previous
 
-    def update_position(self):
+    def update_position(self, row: int, col: int):
         """
-        Updates the position of the robot. This method should calculate and set the
-        new position based on the relevant properties or parameters of the object.
-        It is designed to handle any internal logic needed to properly update the
-        position attribute or state.
+        Updates the position of the robot to the given cell of the search grid.
+        The cell the robot leaves is marked as searched, and the new cell as the
+        current position, unless it is a wall or furniture, which the robot can
+        only have been pushed into by an error in its pose estimate.
 
+        :param row: Row of the new cell.
+        :type row: int
+        :param col: Column of the new cell.
+        :type col: int
         :return: None
         :rtype: NoneType
         Author: Jack McDonald
         """
-        pass
\ No newline at end of file
+        if not self.search_array.is_free((row, col)):
+            return
+        old_row, old_col = self.position
+        self.set_cell(old_row, old_col, Cell.SEARCHED)
+        self.set_cell(row, col, Cell.CURRENT)
+        self.position = (row, col)
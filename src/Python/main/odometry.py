@@ -0,0 +1,207 @@
+import math
+from collections import namedtuple
+from threading import Event, Lock
+
+from motor import MotorController
+from project.utils import clock
+from scheduler import AsyncRate, Scheduler
+
+Pose = namedtuple("Pose", ["x", "y", "theta", "covariance", "timestamp"])
+Pose.__doc__ = """Position (m) and heading (rad, counter-clockwise) of the robot, with the
+3x3 covariance of (x, y, theta) as a tuple of rows, and the time of the estimate."""
+
+ZERO_COVARIANCE = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+
+
+class Odometry:
+    """
+    Estimates the pose of the robot from the encoders of the two drive motors.
+
+    The encoders are sampled at a fixed rate by a Scheduler task, and each
+    step integrates the differential-drive kinematics at the midpoint
+    heading. The uncertainty of each wheel's travel grows with the distance
+    it covers, and is propagated into the covariance of the pose.
+
+    Every step publishes a new immutable Pose by replacing a single
+    reference, so any number of consumers can read `pose` from any thread
+    without locking and never see a half-updated estimate. Only writers
+    (the integration step and `set_pose`) take a lock.
+
+    AXLE_LENGTH is the distance from the centre of the robot to each wheel,
+    as used by MotorController.rotate. Headings are counter-clockwise, as the
+    angles of MotorController.rotate: the right wheel outrunning the left
+    turns the robot to its left.
+
+    :ivar rate: Integration rate in hertz.
+    :type rate: float
+    Author: Jack McDonald
+    """
+    RATE = 100  # (Hz)
+    WHEEL_NOISE = 0.0005  # (m^2 per m travelled) Variance added to the travel of a wheel
+
+    def __init__(self, motor_controller: MotorController, rate: float = RATE, scheduler: Scheduler = None):
+        """
+        Creates an odometry starting at the origin, facing along x. Sampling
+        does not begin until `start` is called.
+
+        :param motor_controller: Gives the drive motors and the robot's dimensions.
+        :type motor_controller: MotorController
+        :param rate: Integration rate in hertz.
+        :type rate: float
+        :param scheduler: Scheduler to run the integration task on. If None, the
+            odometry creates and owns a scheduler of its own.
+        :type scheduler: Scheduler
+        Author: Jack McDonald
+        """
+        self.rate = rate
+        self.__left = motor_controller.motor_left
+        self.__right = motor_controller.motor_right
+        self.__radians_to_metres = motor_controller.WHEEL_RADIUS * math.pi / 180
+        self.__track = 2 * motor_controller.AXLE_LENGTH
+        self.__lock = Lock()
+        self.__stop_event = Event()
+        self.__encoders = None
+        self.__pose = Pose(0.0, 0.0, 0.0, ZERO_COVARIANCE, clock.monotonic())
+        self.__owns_scheduler = scheduler is None
+        self.scheduler = Scheduler("odometry") if scheduler is None else scheduler
+        self.scheduler.add_task("odometry", self.update, rate)
+
+    @property
+    def pose(self) -> Pose:
+        """The latest pose estimate. Safe to read from any thread without locking."""
+        return self.__pose
+
+    def start(self):
+        """
+        Starts integrating. A shared scheduler passed to the constructor must
+        be started by its owner.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        if self.__owns_scheduler:
+            self.scheduler.start()
+
+    def stop(self):
+        self.__stop_event.set()
+        if self.__owns_scheduler:
+            self.scheduler.stop()
+
+    async def run_async(self):
+        """
+        Integrates at `rate` from a coroutine on the running event loop,
+        instead of on the scheduler thread. Runs until `stop` is called or
+        the task is cancelled.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        rate = AsyncRate(self.rate)
+        while not self.__stop_event.is_set():
+            self.update()
+            await rate.sleep()
+
+    def set_pose(self, x: float, y: float, theta: float, covariance: tuple = ZERO_COVARIANCE):
+        """
+        Replaces the estimate, e.g. with a position known from a landmark.
+
+        :param x: Position along x, in metres.
+        :type x: float
+        :param y: Position along y, in metres.
+        :type y: float
+        :param theta: Heading in radians, counter-clockwise from the x axis.
+        :type theta: float
+        :param covariance: Covariance of the new estimate, as a tuple of 3 rows.
+        :type covariance: tuple
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            self.__pose = Pose(x, y, theta, covariance, clock.monotonic())
+
+    def correct(self, axis: int, measurement: float, variance: float):
+        """
+        Fuses a direct measurement of one pose component into the estimate
+        with a Kalman update, which also corrects the components correlated
+        with it.
+
+        :param axis: 0 for x, 1 for y, 2 for theta.
+        :type axis: int
+        :param measurement: The measured value, in metres or radians.
+        :type measurement: float
+        :param variance: The variance of the measurement.
+        :type variance: float
+        :return: The innovation, i.e. the measurement minus the prior estimate.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            pose = self.__pose
+            state = [pose.x, pose.y, pose.theta]
+            p = pose.covariance
+            innovation = measurement - state[axis]
+            if axis == 2:
+                innovation = math.remainder(innovation, math.tau)
+            gain = [p[i][axis] / (p[axis][axis] + variance) for i in range(3)]
+            state = [state[i] + gain[i] * innovation for i in range(3)]
+            covariance = tuple(tuple(p[i][j] - gain[i] * p[axis][j] for j in range(3)) for i in range(3))
+            self.__pose = Pose(state[0], state[1], math.remainder(state[2], math.tau), covariance, clock.monotonic())
+        return innovation
+
+    def update(self):
+        """
+        Reads both encoders and integrates the motion since the previous call.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__stop_event.is_set():
+            return
+        try:
+            encoders = (self.__left.get_encoder(), self.__right.get_encoder())
+        except IOError as error:
+            print(error)
+            return
+        with self.__lock:
+            previous, self.__encoders = self.__encoders, encoders
+            if previous is None:
+                return
+            left = (encoders[0] - previous[0]) * self.__radians_to_metres
+            right = (encoders[1] - previous[1]) * self.__radians_to_metres
+            self.__pose = self.__integrate(self.__pose, left, right)
+
+    def __integrate(self, pose: Pose, left: float, right: float) -> Pose:
+        track = self.__track
+        distance = (left + right) / 2
+        turn = (right - left) / track
+        heading = pose.theta + turn / 2
+        cos, sin = math.cos(heading), math.sin(heading)
+        x = pose.x + distance * cos
+        y = pose.y + distance * sin
+        theta = math.remainder(pose.theta + turn, math.tau)
+
+        # P' = F P F^T + G Q G^T, with F the Jacobian with respect to the pose,
+        # G the Jacobian with respect to the wheel travels, and Q their variance.
+        # F only differs from the identity by (a, b) in its theta column, so
+        # F P F^T is expanded by hand rather than multiplied out.
+        a, b = -distance * sin, distance * cos
+        (pxx, pxy, pxt), (_, pyy, pyt), (_, _, ptt) = pose.covariance
+        pxx, pxy, pyy = pxx + 2 * a * pxt + a * a * ptt, pxy + a * pyt + b * pxt + a * b * ptt, pyy + 2 * b * pyt + b * b * ptt
+        pxt, pyt = pxt + a * ptt, pyt + b * ptt
+
+        shift = distance / (2 * track)
+        gx = (cos / 2 + shift * sin, cos / 2 - shift * sin)
+        gy = (sin / 2 - shift * cos, sin / 2 + shift * cos)
+        gt = (-1 / track, 1 / track)
+        ql, qr = self.WHEEL_NOISE * abs(left), self.WHEEL_NOISE * abs(right)
+        pxx += gx[0] * gx[0] * ql + gx[1] * gx[1] * qr
+        pxy += gx[0] * gy[0] * ql + gx[1] * gy[1] * qr
+        pxt += gx[0] * gt[0] * ql + gx[1] * gt[1] * qr
+        pyy += gy[0] * gy[0] * ql + gy[1] * gy[1] * qr
+        pyt += gy[0] * gt[0] * ql + gy[1] * gt[1] * qr
+        ptt += gt[0] * gt[0] * ql + gt[1] * gt[1] * qr
+
+        covariance = ((pxx, pxy, pxt), (pxy, pyy, pyt), (pxt, pyt, ptt))
+        return Pose(x, y, theta, covariance, clock.monotonic())
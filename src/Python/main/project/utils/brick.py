@@ -11,23 +11,31 @@ from typing import Literal, Type
 import math
 import atexit
 import os
-import time
 import sys
 
+from project.utils import clock, instrumentation
+
 def busy_sleep(seconds: float):
     """A different form of time.sleep, which uses a while loop that 
     constantly checks the time, to see if the duration has elapsed."""
-    start = time.time()
-    while (time.time() - start) < seconds:
-        time.sleep(0.005)
+    start = clock.monotonic()
+    while (clock.monotonic() - start) < seconds:
+        clock.sleep(0.005)
 
 
 class IOError(OSError):
     pass
 
 
-# Save process ID of this program so we can force stop it later if needed
-os.system(f"echo {os.getpid()} > ~/brickpi3_pid")
+def save_pid(path: str = "~/brickpi3_pid"):
+    "Save process ID of this program so we can force stop it later if needed."
+    try:
+        with open(os.path.expanduser(path), "w") as file:
+            file.write(f"{os.getpid()}\n")
+    except OSError as err:
+        print(f"Could not save process ID: {err}", file=sys.stderr)
+
+
 BP = None
 try:
     from brickpi3 import Enumeration, FirmwareVersionError, SensorError, BrickPi3
@@ -378,6 +386,7 @@ class Sensor:
         except SensorError as error:
             return error
 
+    @instrumentation.timed("{cls}.get_value")
     def get_value(self):
         "Get the raw sensor value. May return a float, int, list or None if error."
         try:
@@ -392,7 +401,7 @@ class Sensor:
     def wait_ready(self):
         "Wait (pause program) until the sensor is initialized."
         while self.get_status() != Sensor.Status.VALID_DATA:
-            time.sleep(WAIT_READY_INTERVAL)
+            clock.sleep(WAIT_READY_INTERVAL)
 
 
 def wait_ready_sensors(debug=False):
@@ -673,6 +682,7 @@ class Motor:
         elif isinstance(port, int) or isinstance(port, str):
             self.port = PORTS[str(port).upper()]
 
+    @instrumentation.counted("Motor.set_power")
     def set_power(self, power):
         """
         Commands the motor to rotate continuously. Will rotate at the given power percentage.
@@ -693,6 +703,7 @@ class Motor:
         """
         self.brick.set_motor_power(self.port, power)
 
+    @instrumentation.counted("Motor.float_motor")
     def float_motor(self):
         """(Float the motor), which unlocks the motor, and allows outside forces to rotate it.
 
@@ -709,6 +720,7 @@ class Motor:
         """
         self.brick.set_motor_power(self.port, -128)
 
+    @instrumentation.counted("Motor.set_position")
     def set_position(self, position):
         """
         Command the motor rotate a given number of degrees away from its origin 0.
@@ -734,6 +746,7 @@ class Motor:
         """
         self.brick.set_motor_position(self.port, position)
 
+    @instrumentation.counted("Motor.set_position_relative")
     def set_position_relative(self, degrees):
         """
         Command the motor rotate a given number of degrees away from its current position.
@@ -787,6 +800,7 @@ class Motor:
         """
         self.brick.set_motor_position_kd(self.port, kd)
 
+    @instrumentation.counted("Motor.set_dps")
     def set_dps(self, dps):
         """
         Commands the motor to rotate continuously. Will rotate at the given speed (deg/sec).
@@ -805,8 +819,10 @@ class Motor:
         dps - The target speed in degrees per second
         """
         self.brick.set_motor_dps(self.port, dps)
-        self.set_limits(dps=dps)
+        # Not through set_limits, so "Motor.set_limits" only counts the limits the control code sets
+        self.brick.set_motor_limits(self.port, 0, dps)
 
+    @instrumentation.counted("Motor.set_limits")
     def set_limits(self, power=0, dps=0):
         """
         Set the motor speed limit. The speed is limited to whichever value is 
@@ -825,6 +841,7 @@ class Motor:
         """
         self.brick.set_motor_limits(self.port, power, dps)
 
+    @instrumentation.timed("Motor.get_status")
     def get_status(self):
         """
         Read a motor status.
@@ -940,13 +957,13 @@ class Motor:
         if sleep_interval is None:
             sleep_interval = WAIT_READY_INTERVAL
         while not self.is_moving():
-            time.sleep(sleep_interval)
+            clock.sleep(sleep_interval)
 
     def wait_is_stopped(self, sleep_interval: float = None):
         if sleep_interval is None:
             sleep_interval = WAIT_READY_INTERVAL
         while self.is_moving():
-            time.sleep(sleep_interval)
+            clock.sleep(sleep_interval)
 
 
 def create_motors(motor_ports: list[Literal["A", "B", "C", "D"]] | str):
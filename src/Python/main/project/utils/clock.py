@@ -0,0 +1,183 @@
+"""
+Module that provides the time source used by the brick, the dummy brick and
+the robot's control code, so that a simulated mission can run on virtual
+time instead of the wall clock.
+
+Code should call the functions of this module (monotonic, sleep,
+sleep_until, wait) instead of the time module. By default they use the real
+clock. Use set_clock(VirtualClock()) to run on virtual time, and
+restore_default_clock() to go back.
+
+Author: Jack McDonald
+"""
+
+import heapq
+import itertools
+import time
+from threading import Event, Lock, current_thread
+
+
+class Clock:
+    """The real clock. Sleeps for most of a wait, then spins for the last
+    spin_threshold seconds to wake close to the deadline."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(max(0.0, seconds))
+
+    def sleep_until(self, deadline: float, event=None, spin_threshold: float = 0.0):
+        """Sleep until monotonic() reaches the deadline, or the event is set."""
+        remaining = deadline - time.monotonic()
+        if remaining > spin_threshold:
+            if event is not None:
+                if event.wait(remaining - spin_threshold):
+                    return
+            else:
+                time.sleep(remaining - spin_threshold)
+        while time.monotonic() < deadline:
+            if event is not None and event.is_set():
+                return
+            time.sleep(0)  # Yield the GIL to the other threads while spinning
+
+    def wait(self, event, timeout: float = None) -> bool:
+        """Wait until the event is set or the timeout expires. Returns whether it is set."""
+        return event.wait(timeout)
+
+    def attach(self, thread=None):
+        """Declare a thread that takes part in the simulation. Does nothing on the real clock."""
+
+
+class VirtualClock(Clock):
+    """
+    A clock whose time only moves forward when every attached thread is
+    waiting on it, and then jumps straight to the next deadline. A mission
+    therefore runs as fast as the code can execute, and its timings do not
+    depend on how fast or loaded the host is.
+
+    Threads are attached when they first wait on the clock, or beforehand
+    with attach(), which the code starting a thread should call so the clock
+    does not move on before the thread gets to run. The thread creating the
+    clock is attached automatically.
+
+    Waiters are released one at a time, threads waiting on an event that
+    was set first, then in deadline order, and each released thread runs
+    alone until it waits again. Waiters also check every POLL_INTERVAL of
+    real time whether their event was set or an attached thread has ended,
+    so a thread joining another, or exiting without waiting on the clock,
+    cannot stall it.
+    """
+    POLL_INTERVAL = 0.005  # (seconds, real time) Between two checks by a waiting thread
+
+    def __init__(self, start: float = 0.0):
+        self.__now = start
+        self.__lock = Lock()
+        self.__threads = set()
+        self.__waiting = {}  # thread -> waiter
+        self.__deadlines = []  # heap of (deadline, sequence, waiter)
+        self.__sequence = itertools.count()
+        self.attach()
+
+    def monotonic(self) -> float:
+        return self.__now
+
+    def attach(self, thread=None):
+        with self.__lock:
+            self.__threads.add(current_thread() if thread is None else thread)
+
+    def sleep(self, seconds: float):
+        self.__wait_until(self.__now + max(0.0, seconds), None)
+
+    def sleep_until(self, deadline: float, event=None, spin_threshold: float = 0.0):
+        self.__wait_until(deadline, event)
+
+    def wait(self, event, timeout: float = None) -> bool:
+        if event.is_set():
+            return True
+        self.__wait_until(None if timeout is None else self.__now + timeout, event)
+        return event.is_set()
+
+    def __wait_until(self, deadline, event):
+        if (deadline is not None and deadline <= self.__now) or (event is not None and event.is_set()):
+            return
+        thread = current_thread()
+        waiter = _Waiter(deadline, event)
+        with self.__lock:
+            self.__threads.add(thread)
+            waiter.sequence = next(self.__sequence)
+            self.__waiting[thread] = waiter
+            if deadline is not None:
+                heapq.heappush(self.__deadlines, (deadline, waiter.sequence, waiter))
+            self.__advance()
+        try:
+            while not waiter.released.wait(self.POLL_INTERVAL):
+                if event is not None and event.is_set():
+                    break
+                with self.__lock:
+                    self.__advance()
+        finally:
+            with self.__lock:
+                waiter.released.set()
+                del self.__waiting[thread]
+
+    def __advance(self):
+        """Release the next waiter if every attached thread is waiting. Call with the lock held."""
+        self.__threads = {thread for thread in self.__threads if thread.ident is None or thread.is_alive()}
+        if any(thread not in self.__waiting for thread in self.__threads):
+            return
+        if any(waiter.released.is_set() for waiter in self.__waiting.values()):
+            return  # A released waiter has not left yet
+        ready = [waiter for waiter in self.__waiting.values() if waiter.event is not None and waiter.event.is_set()]
+        if ready:
+            min(ready, key=lambda waiter: waiter.sequence).released.set()
+            return
+        while self.__deadlines:
+            deadline, _, waiter = heapq.heappop(self.__deadlines)
+            if waiter.released.is_set():
+                continue  # Already left through its event
+            self.__now = max(self.__now, deadline)
+            waiter.released.set()
+            return
+
+
+class _Waiter:
+    def __init__(self, deadline, event):
+        self.deadline = deadline
+        self.event = event
+        self.sequence = 0
+        self.released = Event()
+
+
+CLOCK = Clock()
+_DEFAULT_CLOCK = CLOCK
+
+
+def set_clock(clock: Clock):
+    global CLOCK
+    CLOCK = clock
+
+
+def restore_default_clock():
+    global CLOCK
+    CLOCK = _DEFAULT_CLOCK
+
+
+def monotonic() -> float:
+    return CLOCK.monotonic()
+
+
+def sleep(seconds: float):
+    CLOCK.sleep(seconds)
+
+
+def sleep_until(deadline: float, event=None, spin_threshold: float = 0.0):
+    CLOCK.sleep_until(deadline, event, spin_threshold)
+
+
+def wait(event, timeout: float = None) -> bool:
+    return CLOCK.wait(event, timeout)
+
+
+def attach(thread=None):
+    CLOCK.attach(thread)
@@ -1,7 +1,14 @@
-from project.utils.brick import EV3ColorSensor, wait_ready_sensors
+from project.utils.brick import EV3ColorSensor
+from project.utils.devices import DEVICES
 
-COLOUR_SENSOR = EV3ColorSensor(2)
-wait_ready_sensors()
+DEVICES.register("colour", lambda: EV3ColorSensor(2))
+
+
+def __getattr__(name):
+    # COLOUR_SENSOR is created on first use rather than on import
+    if name == "COLOUR_SENSOR":
+        return DEVICES.get("colour")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_raw_rgb() -> list[float]:
@@ -16,7 +23,7 @@ def get_raw_rgb() -> list[float]:
     :rtype: list[float]
     Author: Jack McDonald
     """
-    return COLOUR_SENSOR.get_rgb()
+    return DEVICES.get("colour").get_rgb()
 
 
 def get_normalized_rgb() -> list[float]:
@@ -34,7 +41,19 @@ def get_normalized_rgb() -> list[float]:
     :rtype: list[float]
     Author: Jack McDonald
     """
-    raw_rgb = get_raw_rgb()
+    return normalize_rgb(get_raw_rgb())
+
+
+def normalize_rgb(raw_rgb: list[float]) -> list[float]:
+    """
+    Normalizes raw RGB values read from the colour sensor. See `get_normalized_rgb`.
+
+    :param raw_rgb: Raw values as returned by `get_raw_rgb`.
+    :type raw_rgb: list[float]
+    :return: A list of three floats representing the normalized RGB values.
+    :rtype: list[float]
+    Author: Jack McDonald
+    """
     total = sum(raw_rgb[:3])
     if total == 0:
         return [0, 0, 0]
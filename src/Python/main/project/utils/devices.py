@@ -0,0 +1,126 @@
+"""
+Module that keeps a registry of the robot's devices, so they are created
+when first used instead of when their module is imported, and so several
+sensors can be brought up together.
+
+Each device module registers a factory under a name, e.g.
+DEVICES.register("colour", lambda: EV3ColorSensor(2)). DEVICES.get(name)
+creates the device on first use, and DEVICES.initialize() configures every
+registered port at once, then waits for all the sensors to report valid data
+together, rather than one after the other.
+
+Author: Jack McDonald
+"""
+
+import sys
+from threading import RLock
+
+from project.utils import clock
+from project.utils.brick import WAIT_READY_INTERVAL, Sensor
+
+READY_TIMEOUT = 5  # (seconds) Longest time to wait for the sensors to become ready
+
+
+def wait_ready(sensors, timeout: float = READY_TIMEOUT, interval: float = WAIT_READY_INTERVAL):
+    """
+    Waits until every sensor reports valid data. The sensors configure
+    themselves in parallel, so they are polled together in a single loop.
+
+    :param sensors: The sensors to wait for.
+    :type sensors: Iterable[Sensor]
+    :param timeout: The longest time to wait in seconds, or None to wait forever.
+    :type timeout: float
+    :param interval: The time between two polls of the pending sensors, in seconds.
+    :type interval: float
+    :return: None
+    :raises TimeoutError: If a sensor is still not ready after the timeout.
+    Author: Jack McDonald
+    """
+    pending = list(sensors)
+    deadline = None if timeout is None else clock.monotonic() + timeout
+    while True:
+        pending = [sensor for sensor in pending if sensor.get_status() != Sensor.Status.VALID_DATA]
+        if not pending:
+            return
+        if deadline is not None and clock.monotonic() >= deadline:
+            names = ", ".join(f"{type(sensor).__name__} on port {sensor.port}" for sensor in pending)
+            raise TimeoutError(f"sensors not ready after {timeout} s: {names}")
+        clock.sleep(interval)
+
+
+class DeviceRegistry:
+    """
+    Creates the robot's sensors and motors on demand.
+
+    :ivar timeout: Longest time to wait for sensors to become ready, in seconds.
+    :type timeout: float
+    Author: Jack McDonald
+    """
+
+    def __init__(self, timeout: float = READY_TIMEOUT):
+        self.timeout = timeout
+        self.__factories = {}
+        self.__devices = {}
+        self.__lock = RLock()
+
+    def register(self, name: str, factory):
+        """
+        Registers a device without creating it.
+
+        :param name: The name the device is looked up by.
+        :type name: str
+        :param factory: A callable taking no arguments which creates the device.
+        :type factory: Callable[[], Sensor | Motor]
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            self.__factories[name] = factory
+
+    def get(self, name: str):
+        """
+        Returns the named device, creating it and waiting until it is ready on first use.
+
+        :param name: The name the device was registered under.
+        :type name: str
+        :return: The device.
+        :rtype: Sensor | Motor
+        Author: Jack McDonald
+        """
+        device = self.__devices.get(name)
+        if device is not None:
+            return device
+        return self.initialize([name])[name]
+
+    def initialize(self, names=None) -> dict:
+        """
+        Creates the named devices, or every registered one, configuring all
+        their ports first and then waiting for the sensors together.
+
+        :param names: The devices to bring up, or None for all of them.
+        :type names: Iterable[str]
+        :return: The devices by name.
+        :rtype: dict[str, Sensor | Motor]
+        :raises TimeoutError: If a sensor is not ready within `timeout`.
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            names = list(self.__factories if names is None else names)
+            created = {name: self.__factories[name]() for name in names if name not in self.__devices}
+            sensors = [device for device in created.values() if isinstance(device, Sensor)]
+            try:
+                wait_ready(sensors, self.timeout)
+            except TimeoutError as error:
+                print(error, file=sys.stderr)
+                raise
+            self.__devices.update(created)
+            return {name: self.__devices[name] for name in names}
+
+    def is_created(self, name: str) -> bool:
+        return name in self.__devices
+
+    def names(self) -> list:
+        return list(self.__factories)
+
+
+DEVICES = DeviceRegistry()
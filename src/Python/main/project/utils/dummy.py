@@ -1,7 +1,8 @@
 from math import inf
 import threading
 from typing import Literal
-import time
+
+from project.utils import clock
 
 
 class Enumeration(object):
@@ -57,6 +58,7 @@ class _FakeMotor:
 
     def start(self):
         self.event.set()
+        clock.attach(self.thread)
         self.thread.start()
 
     @staticmethod
@@ -88,7 +90,7 @@ class _FakeMotor:
                 self.state = 0
             delta_pos = self.speed * self.THREAD_INTERVAL
             self.set_position(self.position + delta_pos)
-            time.sleep(self.THREAD_INTERVAL)
+            clock.sleep(self.THREAD_INTERVAL)
 
     def go_position(self, goal):
         self.stop()
@@ -142,6 +144,7 @@ class _FakeMotor:
 
 
 class BrickPi3():
+    CONFIGURE_TIME = 0  # (seconds) Time a newly configured sensor takes before reporting valid data
     PORT_1 = 0x01
     PORT_2 = 0x02
     PORT_3 = 0x04
@@ -357,6 +360,7 @@ class BrickPi3():
     def __init__(self, addr=1, detect=True):
         self.SPI_Address = 1
         self.SensorType = [None for i in range(4)]
+        self.ConfiguredAt = [None for i in range(4)]
         self.Motors = [_FakeMotor() for i in range(4)]
         self.SPI_Messages = {self._convert_port(2**i)[1]: i for i in range(4)}
         for mot in self.Motors:
@@ -408,6 +412,9 @@ class BrickPi3():
             return BAD_REPLY
 
         i = self.SPI_Messages.get(data[1], -1)
+        configured_at = self.ConfiguredAt[i]
+        if configured_at is not None and clock.monotonic() - configured_at < self.CONFIGURE_TIME:
+            SENSOR_STATUS = 2  # Configuring
         GOOD_REPLY = [0, 0, 0, 0xA5, self.SensorType[i], SENSOR_STATUS]
 
         return GOOD_REPLY
@@ -463,6 +470,7 @@ class BrickPi3():
     def set_sensor_type(self, port, type, params=0):
         i, _ = self._convert_port(port)
         self.SensorType[i] = type
+        self.ConfiguredAt[i] = clock.monotonic()
 
     def transact_i2c(self, port, Address, OutArray, InBytes):
         pass
@@ -0,0 +1,12 @@
+from project.utils.brick import EV3GyroSensor
+from project.utils.devices import DEVICES
+
+# Only registered once this module is imported, as the gyro is optional
+DEVICES.register("gyro", lambda: EV3GyroSensor(4))
+
+
+def __getattr__(name):
+    # GYRO_SENSOR is created on first use rather than on import
+    if name == "GYRO_SENSOR":
+        return DEVICES.get("gyro")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
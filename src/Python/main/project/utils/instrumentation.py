@@ -0,0 +1,266 @@
+"""
+Module that collects runtime statistics from every part of the robot: loop
+rates of the background threads, latency histograms of sensor and motor
+reads, motor command counts and the CPU time used by each thread.
+
+Threads report with tick(), record_latency() and count(), or by decorating
+a function with timed() or counted(). The numbers can be queried at any
+time with stats() or report(), and written out periodically with
+start_dump().
+
+Author: Jack McDonald
+"""
+
+import bisect
+import json
+import time
+from collections import Counter
+from functools import wraps
+from threading import Event, Lock, Thread, enumerate as enumerate_threads
+
+from project.utils import clock
+
+
+class Histogram:
+    """Latency histogram with logarithmic buckets, from 1 us to about 1 s."""
+    BUCKETS = tuple(1e-6 * 2 ** i for i in range(21))  # (seconds) Upper bound of each bucket
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.__lock = Lock()
+
+    def record(self, seconds: float):
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self.__lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket holding the given percentile, or the maximum for the last bucket."""
+        if self.count == 0:
+            return 0.0
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.BUCKETS[index], self.max) if index < len(self.BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": {f"{bound * 1e6:g}us": count for bound, count in zip(self.BUCKETS, self.counts) if count},
+        }
+
+    def __repr__(self):
+        return (f"{self.count} calls, mean {self.mean * 1000:.3f} ms, p50 {self.percentile(50) * 1000:.3f} ms, "
+                f"p99 {self.percentile(99) * 1000:.3f} ms, max {self.max * 1000:.3f} ms")
+
+
+class LoopCounter:
+    """Counts the iterations of a loop."""
+
+    def __init__(self):
+        self.iterations = 0
+        self.started_at = clock.monotonic()
+
+    def tick(self):
+        self.iterations += 1
+
+    def as_dict(self, now: float, since: float = None, iterations: int = 0) -> dict:
+        """The counts at `now`. The recent rate covers the time since `since`, when the
+        loop had made `iterations`, or the whole loop by default."""
+        since = self.started_at if since is None else max(since, self.started_at)
+        return {
+            "iterations": self.iterations,
+            "rate": self.iterations / (now - self.started_at) if now > self.started_at else 0.0,
+            "recent_rate": (self.iterations - iterations) / (now - since) if now > since else 0.0,
+        }
+
+
+class Instrumentation:
+    """
+    Registry of the statistics reported by the robot's threads. Reporting
+    is cheap enough to leave on during missions, and is skipped entirely
+    once `enabled` is set to False.
+
+    :ivar enabled: Whether reports are recorded.
+    :type enabled: bool
+    Author: Jack McDonald
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.loops = {}
+        self.latencies = {}
+        self.counts = Counter()
+        self.__lock = Lock()
+        self.__dump_thread = None
+        self.__dump_stop = Event()
+
+    def tick(self, name: str):
+        """Counts one iteration of the named loop."""
+        if not self.enabled:
+            return
+        loop = self.loops.get(name)
+        if loop is None:
+            with self.__lock:
+                loop = self.loops.setdefault(name, LoopCounter())
+        loop.tick()
+
+    def record_latency(self, name: str, seconds: float):
+        """Adds one call duration to the named histogram."""
+        if not self.enabled:
+            return
+        histogram = self.latencies.get(name)
+        if histogram is None:
+            with self.__lock:
+                histogram = self.latencies.setdefault(name, Histogram())
+        histogram.record(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.counts[name] += amount
+
+    def timed(self, name: str = None):
+        """Decorator recording the duration of every call. A name containing
+        {cls} is completed with the class of the instance the method is called on."""
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    duration = time.perf_counter() - started
+                    self.record_latency(label.format(cls=type(args[0]).__name__) if "{cls}" in label else label,
+                                        duration)
+            return wrapper
+        return decorator
+
+    def counted(self, name: str = None):
+        """Decorator counting the calls of a function."""
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                self.count(label)
+                return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def thread_cpu_times() -> dict:
+        """CPU time used by each live thread so far, in seconds, or None where the OS cannot tell.
+        Keyed by name and ident, as several threads may share a name."""
+        times = {}
+        for thread in enumerate_threads():
+            key = f"{thread.name}-{thread.ident}"
+            try:
+                times[key] = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except (AttributeError, OSError, TypeError):
+                times[key] = None
+        return times
+
+    def stats(self, previous: dict = None) -> dict:
+        """All statistics gathered so far, as plain data. The recent rate of
+        each loop covers the time since `previous`, an earlier result of
+        stats(), or the whole loop by default."""
+        with self.__lock:
+            loops = dict(self.loops)
+            latencies = dict(self.latencies)
+            counts = dict(self.counts)
+        now = clock.monotonic()
+        since = None if previous is None else previous["time"]
+        before = {} if previous is None else previous["loops"]
+        return {
+            "time": now,
+            "loops": {name: loop.as_dict(now, since, before.get(name, {}).get("iterations", 0))
+                      for name, loop in loops.items()},
+            "latencies": {name: histogram.as_dict() for name, histogram in latencies.items()},
+            "counts": counts,
+            "process_cpu": time.process_time(),
+            "thread_cpu": self.thread_cpu_times(),
+        }
+
+    def report(self, previous: dict = None) -> str:
+        """Human-readable summary of stats(previous)."""
+        stats = self.stats(previous)
+        lines = ["Loops:"]
+        lines += [f"  {name}: {loop['iterations']} iterations, {loop['rate']:.1f}/s overall, "
+                  f"{loop['recent_rate']:.1f}/s recently" for name, loop in sorted(stats["loops"].items())]
+        lines.append("Latencies:")
+        with self.__lock:
+            latencies = sorted(self.latencies.items())
+        lines += [f"  {name}: {histogram}" for name, histogram in latencies]
+        lines.append("Counts:")
+        lines += [f"  {name}: {count}" for name, count in sorted(stats["counts"].items())]
+        lines.append(f"CPU: {stats['process_cpu']:.2f} s in total")
+        lines += [f"  {name}: {'unknown' if cpu is None else f'{cpu:.2f} s'}"
+                  for name, cpu in sorted(stats["thread_cpu"].items())]
+        return "\n".join(lines)
+
+    def reset(self):
+        with self.__lock:
+            self.loops.clear()
+            self.latencies.clear()
+            self.counts.clear()
+
+    def start_dump(self, path: str, period: float = 1.0):
+        """Appends stats() to the file as one JSON line every period seconds, until stop_dump().
+        The recent rates of each line cover the period since the line before."""
+        self.stop_dump()
+        self.__dump_stop.clear()
+        self.__dump_thread = Thread(target=self.__dump, args=(path, period), daemon=True, name="instrumentation")
+        clock.attach(self.__dump_thread)
+        self.__dump_thread.start()
+
+    def stop_dump(self):
+        self.__dump_stop.set()
+        if self.__dump_thread is not None:
+            self.__dump_thread.join()
+            self.__dump_thread = None
+
+    def __dump(self, path: str, period: float):
+        with open(path, "a") as file:
+            last = None
+            while not clock.wait(self.__dump_stop, period):
+                last = self.stats(last)
+                file.write(json.dumps(last) + "\n")
+                file.flush()
+            file.write(json.dumps(self.stats(last)) + "\n")
+
+
+INSTRUMENTS = Instrumentation()
+
+tick = INSTRUMENTS.tick
+record_latency = INSTRUMENTS.record_latency
+count = INSTRUMENTS.count
+timed = INSTRUMENTS.timed
+counted = INSTRUMENTS.counted
+stats = INSTRUMENTS.stats
+report = INSTRUMENTS.report
+reset = INSTRUMENTS.reset
+start_dump = INSTRUMENTS.start_dump
+stop_dump = INSTRUMENTS.stop_dump
@@ -1,7 +1,14 @@
-from project.utils.brick import TouchSensor, wait_ready_sensors
+from project.utils.brick import TouchSensor
+from project.utils.devices import DEVICES
 
-TOUCH_SENSOR = TouchSensor(1)
-wait_ready_sensors()
+DEVICES.register("touch", lambda: TouchSensor(1))
+
+
+def __getattr__(name):
+    # TOUCH_SENSOR is created on first use rather than on import
+    if name == "TOUCH_SENSOR":
+        return DEVICES.get("touch")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def is_pressed() -> bool:
@@ -17,4 +24,4 @@ def is_pressed() -> bool:
     :rtype: bool
     Author: Jack McDonald
     """
-    return TOUCH_SENSOR.is_pressed()
\ No newline at end of file
+    return DEVICES.get("touch").is_pressed()
\ No newline at end of file
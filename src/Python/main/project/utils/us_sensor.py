@@ -1,7 +1,14 @@
-from project.utils.brick import EV3UltrasonicSensor, wait_ready_sensors
+from project.utils.brick import EV3UltrasonicSensor
+from project.utils.devices import DEVICES
 
-us_sensor = EV3UltrasonicSensor(3)
-wait_ready_sensors()
+DEVICES.register("ultrasonic", lambda: EV3UltrasonicSensor(3))
+
+
+def __getattr__(name):
+    # us_sensor is created on first use rather than on import
+    if name == "us_sensor":
+        return DEVICES.get("ultrasonic")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_distance() -> int:
@@ -11,8 +18,10 @@ def get_distance() -> int:
     This function retrieves the current value from the ultrasonic sensor in 
     centimeters and returns it as an integer, representing the distance.
     
-    :return: Distance measured by the ultrasonic sensor in centimeters.
+    :return: Distance measured by the ultrasonic sensor in centimeters, or
+        None when the sensor gives no reading.
     :rtype: int
     Author: Jack McDonald
     """
-    return int(us_sensor.get_value())
+    distance = DEVICES.get("ultrasonic").get_value()
+    return None if distance is None else int(distance)
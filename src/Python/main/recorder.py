@@ -0,0 +1,269 @@
+import atexit
+import math
+import mmap
+import struct
+from collections import namedtuple
+from threading import Lock, Thread, local
+
+from project.utils import brick, clock
+from scheduler import sleep_until
+
+MAGIC = b"DPMREC1\0"
+HEADER = struct.Struct("<8sI4x")
+# timestamp, kind, operation, port, number of values, values
+RECORD = struct.Struct("<dBBBB4x4d")
+MAX_VALUES = 4
+
+READ = 0
+COMMAND = 1
+
+# Brick methods captured by the recorder, by operation code. Reads return a value,
+# commands take their values as arguments after the port.
+READ_OPERATIONS = ("get_sensor", "get_motor_status", "get_motor_encoder")
+COMMAND_OPERATIONS = ("set_sensor_type", "set_motor_power", "set_motor_position", "set_motor_position_relative",
+                      "set_motor_dps", "set_motor_limits", "offset_motor_encoder", "reset_motor_encoder")
+OPERATIONS = READ_OPERATIONS + COMMAND_OPERATIONS
+
+Record = namedtuple("Record", ["timestamp", "kind", "operation", "port", "values"])
+
+
+def _encode_values(value) -> tuple:
+    if value is None:
+        return 0, (math.nan,) * MAX_VALUES
+    if not isinstance(value, (list, tuple)):
+        value = (value,)
+    value = [math.nan if v is None else float(v) for v in value[:MAX_VALUES]]
+    return len(value), tuple(value) + (math.nan,) * (MAX_VALUES - len(value))
+
+
+def _decode_values(count: int, values: tuple):
+    values = tuple(None if math.isnan(v) else v for v in values[:count])
+    if count == 0:
+        return None
+    return values
+
+
+def read_log(path: str):
+    """
+    Reads a mission log written by MissionRecorder, memory-mapping the file
+    rather than loading it. A partially written last record is ignored.
+
+    :param path: Path of the log file.
+    :type path: str
+    :return: The records in the order they were written.
+    :rtype: Iterator[Record]
+    Author: Jack McDonald
+    """
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, record_size = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or record_size != RECORD.size:
+                raise IOError(f"{path} is not a mission log")
+            end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+            view = memoryview(data)[HEADER.size:end]
+            try:
+                for timestamp, kind, operation, port, count, *values in RECORD.iter_unpack(view):
+                    yield Record(timestamp, kind, OPERATIONS[operation], port, _decode_values(count, values))
+            finally:
+                view.release()
+
+
+class MissionRecorder:
+    """
+    Records every sensor read and motor command issued through
+    `project.utils.brick` to a compact binary log. Starting a recording
+    truncates any file already at the path; records are then only ever
+    appended to it.
+
+    Sensors and motors copy the brick's state into their own Brick wrapper
+    rather than calling the shared brick, so the recorder hooks the
+    methods of the BrickPi3 class itself: this captures every device, as
+    well as direct calls on `brick.BP`. Calls made by a brick method on its
+    own behalf are not recorded twice.
+
+    Each record is a fixed-size struct holding a monotonic timestamp
+    relative to the start of the recording, the operation, the port and up
+    to four values, so the log can be read back with `read_log` through
+    mmap without parsing. Records are buffered, and written out every
+    FLUSH_EVERY records or FLUSH_INTERVAL seconds, whichever comes first,
+    as well as on `stop` and when the interpreter exits, so a crash loses
+    at most the last fraction of a second.
+
+    Example:
+    with MissionRecorder("mission.log"):
+        robot.run()
+
+    :ivar path: Path of the log file.
+    :type path: str
+    :ivar records: Number of records written so far.
+    :type records: int
+    Author: Jack McDonald
+    """
+    FLUSH_EVERY = 256  # Records buffered before writing them out
+    FLUSH_INTERVAL = 0.5  # (seconds) Longest time a record stays in the buffer while calls are recorded
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self.__file = None
+        self.__buffer = bytearray()
+        self.__lock = Lock()
+        self.__local = local()
+        self.__originals = {}
+        self.__started_at = None
+        self.__flushed_at = None
+
+    def start(self):
+        """
+        Opens the log, truncating it, and starts capturing brick calls.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__originals:
+            return
+        self.__file = open(self.path, "wb")
+        self.__file.write(HEADER.pack(MAGIC, RECORD.size))
+        self.__file.flush()
+        self.__started_at = self.__flushed_at = clock.monotonic()
+        atexit.register(self.stop)
+        for code, name in enumerate(OPERATIONS):
+            original = getattr(brick.BrickPi3, name, None)
+            if original is None:
+                continue
+            self.__originals[name] = original
+            setattr(brick.BrickPi3, name, self.__wrap(original, code))
+
+    def stop(self):
+        """
+        Stops capturing, restoring the original brick methods, and closes the log.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        atexit.unregister(self.stop)
+        for name, original in self.__originals.items():
+            setattr(brick.BrickPi3, name, original)
+        self.__originals.clear()
+        with self.__lock:
+            if self.__file is not None:
+                self.__flush()
+                self.__file.close()
+                self.__file = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __wrap(self, method, code: int):
+        recorder = self
+        kind = READ if code < len(READ_OPERATIONS) else COMMAND
+
+        def recorded(bp, port, *args, **kwargs):
+            if getattr(recorder.__local, "busy", False):
+                return method(bp, port, *args, **kwargs)
+            recorder.__local.busy = True
+            try:
+                result = method(bp, port, *args, **kwargs)
+            finally:
+                recorder.__local.busy = False
+            recorder.__write(kind, code, port, result if kind == READ else args + tuple(kwargs.values()))
+            return result
+
+        recorded.__name__ = method.__name__
+        recorded.__doc__ = method.__doc__
+        return recorded
+
+    def __write(self, kind: int, code: int, port: int, value):
+        count, values = _encode_values(value)
+        now = clock.monotonic()
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__buffer += RECORD.pack(now - self.__started_at, kind, code, port & 0xFF, count, *values)
+            self.records += 1
+            if self.records % self.FLUSH_EVERY == 0 or now - self.__flushed_at >= self.FLUSH_INTERVAL:
+                self.__flush()
+
+    def __flush(self):
+        self.__file.write(self.__buffer)
+        self.__file.flush()
+        self.__buffer.clear()
+        self.__flushed_at = clock.monotonic()
+
+
+class MissionReplay:
+    """
+    Replays the sensor readings of a mission log through the dummy brick, so
+    the control code sees the same sensor values at the same moments as
+    during the recorded run, without the robot.
+
+    Readings are fed through `dummy.BrickPi3.set_sensor` at their recorded
+    time divided by `speed`, so speed=1 replays in real time, speed=10 ten
+    times faster, and speed=None as fast as possible. Motor commands in the
+    log are not replayed; record the replayed run with a MissionRecorder to
+    compare the commands issued by changed control logic.
+
+    :ivar path: Path of the log file.
+    :type path: str
+    :ivar speed: Replay speed relative to real time, or None for no pacing.
+    :type speed: float
+    Author: Jack McDonald
+    """
+
+    def __init__(self, path: str, bp=None, speed: float = 1.0):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive, or None to replay as fast as possible")
+        self.path = path
+        self.speed = speed
+        self.bp = brick.BP if bp is None else bp
+        if not hasattr(self.bp, "set_sensor"):
+            raise TypeError("replay needs a dummy brick, which supports set_sensor")
+        self.__thread = None
+        self.__stopped = False
+
+    def run(self):
+        """
+        Replays the whole log on the calling thread.
+
+        :return: The number of sensor readings fed to the brick.
+        :rtype: int
+        Author: Jack McDonald
+        """
+        started_at = clock.monotonic()
+        fed = 0
+        for record in read_log(self.path):
+            if self.__stopped:
+                break
+            if record.kind != READ or record.operation != "get_sensor" or record.values is None:
+                continue
+            if self.speed is not None:
+                sleep_until(started_at + record.timestamp / self.speed)
+            values = record.values
+            self.bp.set_sensor(record.port, values if len(values) > 1 else values[0])
+            fed += 1
+        return fed
+
+    def start(self):
+        """
+        Replays the log on a background thread, alongside the control code.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stopped = False
+        self.__thread = Thread(target=self.run, daemon=True, name="replay")
+        clock.attach(self.__thread)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped = True
+        if self.__thread is not None and self.__thread.is_alive():
+            self.__thread.join()
+
+    def join(self, timeout: float = None):
+        if self.__thread is not None:
+            self.__thread.join(timeout)
@@ -1,9 +1,20 @@
-import sys
-from threading import *
-from chassis import Chassis
+import asyncio
+from chassis import DRIVE_RATE, Chassis
+from emergency_stop import EmergencyStop
+from gyro_turning import GyroTurner
+from localisation import Localiser
+from mapping import Mapper
+from motor import MotorsHalted
 from navigation import Navigation
+from odometry import Odometry
+from project.utils.devices import DEVICES
+from scheduler import Scheduler
+from sensor_hub import SensorHub
+from sensor_process import SensorProcess
 from sensors import SensorController
 from siren import Siren
+from speed_governor import SpeedGovernor
+from state_machine import ANY, StateMachine
 
 
 class Robot:
@@ -15,18 +26,39 @@ class Robot:
 
     :ivar state: Current operational state of the robot.
     :type state: str
+    :ivar state_machine: Sequences the phases of the mission and times them.
+    :type state_machine: StateMachine
     :ivar chassis: Handles the physical movement and drive mechanisms.
     :type chassis: Chassis
     :ivar navigation: Manages navigation and pathfinding routines.
     :type navigation: Navigation
     :ivar sensors: Controls and processes data from sensing hardware.
     :type sensors: SensorController
+    :ivar sensor_process: Worker process sampling the sensors, if enabled.
+    :type sensor_process: Optional[SensorProcess]
+    :ivar gyro_turner: Turns the chassis on the heading measured by the gyro, if enabled.
+    :type gyro_turner: Optional[GyroTurner]
+    :ivar scheduler: Runs the robot's periodic control tasks at fixed rates.
+    :type scheduler: Scheduler
+    :ivar sensor_hub: Samples the sensors in the background and publishes readings.
+    :type sensor_hub: SensorHub
+    :ivar odometry: Tracks the pose of the robot from the drive motor encoders.
+    :type odometry: Odometry
+    :ivar localiser: Corrects the odometry on line crossings and tracks the current tile.
+    :type localiser: Localiser
+    :ivar mapper: Finds furniture from the ultrasonic sensor as the robot drives.
+    :type mapper: Mapper
+    :ivar speed_governor: Caps the speed of governed moves to the measured colour sample rate.
+    :type speed_governor: SpeedGovernor
     :ivar siren: Controls the siren functionality for signaling or warnings.
     :type siren: Siren
+    :ivar emergency_stop: Stops the motors as soon as the touch sensor is pressed.
+    :type emergency_stop: EmergencyStop
     Author: Jack McDonald
     """
+    SENSOR_RATES = {"colour": 200, "distance": 25, "touch": 100}  # (Hz)
 
-    def __init__(self):
+    def __init__(self, sensor_process: bool = False, gyro: bool = False, profiled: bool = False):
         """
         Represents the main controller for a robotic system, initializing key components
         and managing the overall state. This class is responsible for orchestrating
@@ -35,8 +67,9 @@ class Robot:
 
         Attributes
         ----------
-        state : str
-            The current state of the robotic system, initially set to "idle".
+        state_machine : StateMachine
+            Declares the phases of the mission and their sub-states, and records
+            how long each of them takes. The robot is "idle" until it is started.
         chassis : Chassis
             The subsystem responsible for managing the robot's movement and driving.
         navigation : Navigation
@@ -45,128 +78,270 @@ class Robot:
         sensors : SensorController
             Manages the robot's sensor modules for detecting environmental data and
             obstacles.
+        sensor_process : SensorProcess
+            When `sensor_process` is True, samples the sensors in a separate process
+            so control work cannot disturb sample timing. None otherwise.
+        gyro_turner : GyroTurner
+            When `gyro` is True, the chassis turns on the heading measured by an
+            EV3 gyro sensor on port 4, rather than on the wheel encoders. None otherwise.
+        profiled : bool
+            When True, the chassis makes its encoder turns and fixed distance moves
+            along a velocity profile, at higher peak speeds. It is stored on the
+            chassis as `chassis.profiled`.
+        scheduler : Scheduler
+            Runs sensor sampling at fixed rates and records its timing.
+        sensor_hub : SensorHub
+            Samples the sensors at a fixed rate each and lets the other subsystems
+            wait on sensor conditions.
+        odometry : Odometry
+            Integrates the drive motor encoders into a pose estimate, on the same
+            scheduler as the sensors.
+        localiser : Localiser
+            Corrects the odometry whenever the colour sensor crosses a black line
+            between tiles, and keeps the navigation's current tile up to date.
+        mapper : Mapper
+            Builds an occupancy map from the ultrasonic readings and marks the
+            tiles found to hold furniture in the navigation grid.
+        speed_governor : SpeedGovernor
+            Measures the rate colour readings actually arrive at, and caps the
+            speed of the chassis' governed moves so they still catch thin lines.
         siren : Siren
             Controls the siren mechanism of the robot.
+        emergency_stop : EmergencyStop
+            Watches the touch sensor on its own thread and stops the motors
+            directly when it is pressed.
         """
-        self.state = "idle"
+        if gyro:
+            # Registers the gyro, so it is brought up with the other sensors
+            from project.utils import gyro_sensor
+        # Bring the sensors up at once rather than one at a time on first use. With a sensor
+        # process, the colour and ultrasonic sensors belong to it, and the control process only
+        # brings up those it reads itself: the touch sensor of the emergency stop, and the gyro
+        if sensor_process:
+            DEVICES.initialize(("touch", "gyro") if gyro else ("touch",))
+        else:
+            DEVICES.initialize()
         self.chassis = Chassis(self)
+        self.gyro_turner = GyroTurner(self.chassis.MotorController, DEVICES.get("gyro")) if gyro else None
+        self.chassis.gyro_turner = self.gyro_turner
+        self.chassis.profiled = profiled
         self.navigation = Navigation()
-        self.sensors = SensorController()
+        self.sensor_process = SensorProcess() if sensor_process else None
+        self.sensors = SensorController(self.sensor_process)
+        self.scheduler = Scheduler("control")
+        self.sensor_hub = SensorHub(self.sensors, rates=self.SENSOR_RATES, scheduler=self.scheduler)
+        self.odometry = Odometry(self.chassis.MotorController, scheduler=self.scheduler)
+        self.localiser = Localiser(self.odometry, self.navigation, self.sensor_hub)
+        self.mapper = Mapper(self.odometry, self.localiser, self.sensor_hub)
+        self.speed_governor = SpeedGovernor(self.sensor_hub, loop_rate=DRIVE_RATE)
+        self.chassis.speed_governor = self.speed_governor
         self.siren = Siren()
+        self.emergency_stop = EmergencyStop(DEVICES.get("touch"), on_stop=self.__on_emergency_stop)
+        self.state_machine = self.__build_state_machine()
 
-        self.sensor_thread = None
-        self.emergency_stop_thread = None
-
-        self.colour_reading = ""
-        self.distance_reading = -1
-        self.touch_reading = False
-
-        self.__create_threads()
+        # Blocking activity of each state, run by the state machine until it completes
+        self.__activities = {
+            "initializing": self.__start_subsystems,
+            "NavigationA.MoveToLine": lambda: self.chassis.move_until_colour("yellow"),
+            "NavigationA.TurnToWall": self.chassis.turn_right,
+            "NavigationA.MoveToWall": lambda: self.chassis.move_until_distance(25),
+            "NavigationA.TurnToRoom": self.chassis.turn_left,
+            "Search": self.__search_for_fire,
+            "NavigationB.MoveToLine": lambda: self.chassis.move_until_colour("yellow"),
+            "NavigationB.TurnToWall": self.chassis.turn_right,
+            "NavigationB.MoveToWall": lambda: self.chassis.move_until_distance(3),
+            "NavigationB.TurnToExit": self.chassis.turn_left,
+            "NavigationB.MoveToExit": lambda: self.chassis.move_until_distance(3),
+        }
+        self.__activities_async = {
+            "NavigationA.MoveToLine": lambda: self.chassis.move_until_colour_async("yellow"),
+            "NavigationA.TurnToWall": self.chassis.turn_right_async,
+            "NavigationA.MoveToWall": lambda: self.chassis.move_until_distance_async(25),
+            "NavigationA.TurnToRoom": self.chassis.turn_left_async,
+            "Search": self.__search_for_fire_async,
+            "NavigationB.MoveToLine": lambda: self.chassis.move_until_colour_async("yellow"),
+            "NavigationB.TurnToWall": self.chassis.turn_right_async,
+            "NavigationB.MoveToWall": lambda: self.chassis.move_until_distance_async(3),
+            "NavigationB.TurnToExit": self.chassis.turn_left_async,
+            "NavigationB.MoveToExit": lambda: self.chassis.move_until_distance_async(3),
+        }
 
     def run(self):
         """
-        Transitions through a sequence of states and invokes corresponding entry methods.
+        Runs the mission through the robot's state machine.
 
         The `run` function interacts with the user via an `input` prompt to signal the
-        beginning of the operation and manages transitions between states within the system.
-        It sequentially enters the `NavigationA`, `Search`, and `NavigationB` phases,
-        invoking private methods associated with each state transition for handling specific
-        behaviors in those states. Errors related to input/output operations are caught
-        and displayed to the user.
+        beginning of the operation, then lets the state machine step through the
+        `NavigationA`, `Search`, and `NavigationB` phases and their sub-states,
+        running the activity of each state in turn. Once the mission completes, the
+        time spent in each phase is printed. Errors related to input/output operations
+        are caught and displayed to the user.
 
         Author: Jack McDonald
         """
         input("Press Enter to begin...")
         try:
-            self.__transition_to("initializing")
-            self.sensor_thread.start()
-            self.emergency_stop_thread.start()
+            self.state_machine.start("initializing")
+            self.state_machine.run(self.__activities)
+            print(self.state_machine.report())
+        except MotorsHalted:
+            # Raised by the next motor command or wait once the emergency stop has latched the motors
+            print("Emergency stop pressed")
+            self.stop()
+        except KeyboardInterrupt:
+            self.chassis.MotorController.stop()
+            self.stop()
+        except IOError as error:
+            print(error)
 
-            self.__transition_to("NavigationA")
-            self.__enter_navigation_a()
+    async def run_async(self):
+        """
+        Asyncio flavour of `run`, to be started with `asyncio.run(robot.run_async())`.
+
+        Instead of a scheduler thread, sensor sampling, motor-completion waits and
+        the emergency stop monitor all run as coroutines on a single event loop,
+        so nothing busy-spins and no threads compete for the GIL. Only the
+        emergency stop keeps its dedicated thread; pressing the touch sensor
+        stops the motors and cancels the mission coroutine.
+
+        Author: Jack McDonald
+        """
+        input("Press Enter to begin...")
+        loop = asyncio.get_running_loop()
+        if self.sensor_process is not None:
+            self.sensor_process.start()
+        sampler = asyncio.create_task(self.sensor_hub.run_async())
+        integrator = asyncio.create_task(self.odometry.run_async())
+        localiser = asyncio.create_task(self.localiser.run_async())
+        mapper = asyncio.create_task(self.mapper.run_async())
+        self.state_machine.start("initializing")
+        mission = asyncio.create_task(self.state_machine.run_async(self.__activities_async))
 
-            self.__transition_to("Search")
-            self.__enter_search()
+        def on_stop():
+            self.__on_emergency_stop()
+            loop.call_soon_threadsafe(mission.cancel)
 
-            self.__transition_to("NavigationB")
-            self.__enter_navigation_b()
+        self.emergency_stop.on_stop = on_stop
+        self.emergency_stop.start()
+        try:
+            await mission
+            print(self.state_machine.report())
+        except (asyncio.CancelledError, MotorsHalted):
+            print("Emergency stop pressed")
+            self.stop()
         except IOError as error:
             print(error)
-
+        finally:
+            sampler.cancel()
+            integrator.cancel()
+            localiser.cancel()
+            mapper.cancel()
 
     def stop(self):
         """
         Stops the current process or operation and transitions the state of the object
         to "idle". This method attempts to change the state regardless of the current
-        state, handling potential input/output errors during the process.
+        state, handling potential input/output errors during the process. Once idle,
+        the motors are released from the emergency stop, if it was pressed.
 
         Author: Jack McDonald
         """
         try:
-            self.__transition_to("idle")
-
             # Wait for threads to terminate
-            if self.sensor_thread and self.sensor_thread.is_alive():
-                self.sensor_thread.join()
-            if self.emergency_stop_thread and self.emergency_stop_thread.is_alive():
-                self.emergency_stop_thread.join()
+            self.emergency_stop.stop()
+            self.sensor_hub.stop()
+            self.odometry.stop()
+            self.localiser.stop()
+            self.mapper.stop()
+            self.scheduler.stop()
+            if self.sensor_process is not None:
+                self.sensor_process.stop()
 
             print("Robot stopped, threads terminated")
+            print(self.scheduler.report())
+
+            self.state_machine.dispatch("stop")
+            print(self.state_machine.report())
+            # The robot is idle, so clear the latch of the emergency stop
+            self.chassis.MotorController.release()
         except IOError as error:
             print(error)
 
+    @property
+    def state(self) -> str:
+        """Path of the active state of the mission, e.g. "NavigationA.MoveToLine"."""
+        return self.state_machine.state or "idle"
 
-    def __transition_to(self, new_state: str) -> None:
-        self.__exit_state()
-        self.state = new_state
-        self.__enter_state()
+    def __build_state_machine(self) -> StateMachine:
+        machine = StateMachine("mission")
+        machine.add_state("idle", final=True)
+        machine.add_state("initializing")
+        machine.add_state("NavigationA", initial="MoveToLine",
+                          on_enter=self.siren.play_siren, on_exit=self.siren.stop_siren)
+        machine.add_state("NavigationA.MoveToLine")
+        machine.add_state("NavigationA.TurnToWall")
+        machine.add_state("NavigationA.MoveToWall")
+        machine.add_state("NavigationA.TurnToRoom")
+        machine.add_state("Search")
+        machine.add_state("NavigationB", initial="MoveToLine")
+        machine.add_state("NavigationB.MoveToLine")
+        machine.add_state("NavigationB.TurnToWall")
+        machine.add_state("NavigationB.MoveToWall")
+        machine.add_state("NavigationB.TurnToExit")
+        machine.add_state("NavigationB.MoveToExit")
 
-    def __exit_state(self) -> None:
-        if self.state == "NavigationA":
-            self.siren.stop_siren()
+        # Source, event, target, guard
+        transitions = [
+            ("initializing", "done", "NavigationA", None),
+            ("NavigationA.MoveToLine", "done", "NavigationA.TurnToWall", None),
+            ("NavigationA.TurnToWall", "done", "NavigationA.MoveToWall", None),
+            ("NavigationA.MoveToWall", "done", "NavigationA.TurnToRoom", None),
+            ("NavigationA.TurnToRoom", "done", "Search", None),
+            ("Search", "done", "NavigationB", lambda: self.navigation.found >= 2),
+            ("Search", "done", "Search", None),
+            ("NavigationB.MoveToLine", "done", "NavigationB.TurnToWall", None),
+            ("NavigationB.TurnToWall", "done", "NavigationB.MoveToWall", None),
+            ("NavigationB.MoveToWall", "done", "NavigationB.TurnToExit", None),
+            ("NavigationB.TurnToExit", "done", "NavigationB.MoveToExit", None),
+            ("NavigationB.MoveToExit", "done", "idle", None),
+            (ANY, "stop", "idle", None),
+        ]
+        for source, event, target, guard in transitions:
+            machine.add_transition(source, event, target, guard)
+        return machine
 
-    def __enter_state(self) -> None:
-        if self.state == "NavigationA":
-            self.siren.play_siren()
-        if self.state == "idle":
-            sys.exit() # TODO find better solution
-            pass
+    def __start_subsystems(self):
+        self.emergency_stop.start()
+        if self.sensor_process is not None:
+            self.sensor_process.start()
+        self.sensor_hub.start()
+        self.odometry.start()
+        self.scheduler.start()
 
-    def __create_threads(self):
-        self.sensor_thread = Thread(target=self.__update_sensor_data, daemon=True, name="sensors")
-        self.emergency_stop_thread = Thread(target=self.__emergency_stop_check, daemon=True, name="em._stop")
-
-    def __enter_navigation_a(self):
-        self.chassis.move_until_colour("yellow")
-        self.chassis.turn_right()
-        self.chassis.move_until_distance(25)
-        self.chassis.turn_left()
+    def __search_for_fire(self):
+        # TODO temp code
+        if self.sensor_hub.wait_for("colour", lambda colour: colour == "red", timeout=1):
+            self.chassis.extinguish_fire()
+            self.chassis.move_distance(0.2)
+            self.navigation.found += 1
 
-    def __enter_search(self):
+    async def __search_for_fire_async(self):
         # TODO temp code
-        while self.navigation.found < 2:
-            if self.colour_reading == "red":
-                self.chassis.extinguish_fire()
-                self.chassis.MotorController.move_distance_forward(20, 100)
-                self.navigation.found += 1
-
-    def __enter_navigation_b(self):
-        self.chassis.move_until_colour("yellow")
-        self.chassis.turn_right()
-        self.chassis.move_until_distance(3)
-        self.chassis.turn_left()
-        self.chassis.move_until_distance(3)
-
-    def __update_sensor_data(self):
-        while self.state != "idle":
-            self.colour_reading = self.sensors.get_colour_name()
-            self.distance_reading = self.sensors.get_us_sensor_distance()
-            self.touch_reading = self.sensors.get_touch_sensor_state()
-
-    def __emergency_stop_check(self):
-        while self.state != "idle":
-            if self.touch_reading:
-                self.stop()
+        if await self.sensor_hub.wait_for_async("colour", lambda colour: colour == "red", timeout=1):
+            await self.chassis.extinguish_fire_async()
+            await self.chassis.move_distance_async(0.2)
+            self.navigation.found += 1
+
+    def __on_emergency_stop(self):
+        # The motors are already stopped. Latch them stopped, so the control
+        # loops still running cannot drive them again, and wake anything
+        # waiting on a sensor. The main thread then unwinds with MotorsHalted
+        # from its next motor command or wait, rather than exiting from here.
+        self.chassis.MotorController.halt()
+        self.sensor_hub.stop()
+
+    def get_colour(self):
+        return self.sensor_hub.get_value("colour")
 
     def get_distance(self):
-        return self.distance_reading
\ No newline at end of file
+        return self.sensor_hub.get_value("distance")
@@ -0,0 +1,369 @@
+import asyncio
+import math
+import sys
+import time
+import traceback
+from threading import Event, Lock, Thread, current_thread
+
+from project.utils import clock, instrumentation
+
+SPIN_THRESHOLD = 0.0005  # (seconds) Time before a deadline spent spinning instead of sleeping
+
+
+def sleep_until(deadline: float, stop_event: Event = None, spin_threshold: float = SPIN_THRESHOLD) -> None:
+    """
+    Pauses the calling thread until the monotonic clock reaches the deadline.
+
+    The thread sleeps for most of the wait and only spins for the last
+    `spin_threshold` seconds, which absorbs the wake-up latency of the OS
+    sleep without burning a whole core. The spin yields the GIL on every
+    iteration so other threads keep running. On a virtual clock the thread
+    simply waits for the clock to reach the deadline.
+
+    :param deadline: The clock.monotonic() value to wait for.
+    :type deadline: float
+    :param stop_event: Optional event which cuts the wait short when set.
+    :type stop_event: Event
+    :param spin_threshold: Seconds before the deadline at which to stop sleeping and start spinning.
+    :type spin_threshold: float
+    :return: None
+    Author: Jack McDonald
+    """
+    clock.sleep_until(deadline, stop_event, spin_threshold)
+
+
+class TaskStats:
+    """
+    Timing statistics of a periodic loop.
+
+    Jitter is the lateness of each iteration relative to its deadline. An
+    overrun is an iteration whose body took longer than one period, and a
+    missed deadline is a whole period that was skipped because the loop fell
+    that far behind.
+
+    :ivar iterations: Number of completed iterations.
+    :type iterations: int
+    :ivar overruns: Number of iterations that took longer than the period.
+    :type overruns: int
+    :ivar missed_deadlines: Number of periods skipped because the loop was late.
+    :type missed_deadlines: int
+    :ivar max_jitter: Largest lateness observed, in seconds.
+    :type max_jitter: float
+    :ivar max_duration: Longest iteration observed, in seconds.
+    :type max_duration: float
+    :ivar errors: Number of iterations which raised an exception.
+    :type errors: int
+    Author: Jack McDonald
+    """
+
+    def __init__(self, period: float):
+        self.period = period
+        self.iterations = 0
+        self.overruns = 0
+        self.missed_deadlines = 0
+        self.max_jitter = 0.0
+        self.max_duration = 0.0
+        self.errors = 0
+        self.__mean_jitter = 0.0
+        self.__jitter_m2 = 0.0
+        self.__total_duration = 0.0
+
+    def record(self, jitter: float, duration: float) -> None:
+        """
+        Adds one iteration to the statistics.
+
+        :param jitter: How late the iteration started, in seconds.
+        :type jitter: float
+        :param duration: How long the iteration body ran, in seconds.
+        :type duration: float
+        :return: None
+        """
+        self.iterations += 1
+        # Welford's online algorithm, so no samples need to be kept around
+        delta = jitter - self.__mean_jitter
+        self.__mean_jitter += delta / self.iterations
+        self.__jitter_m2 += delta * (jitter - self.__mean_jitter)
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.max_duration = max(self.max_duration, duration)
+        self.__total_duration += duration
+        if duration > self.period:
+            self.overruns += 1
+
+    @property
+    def mean_jitter(self) -> float:
+        return self.__mean_jitter
+
+    @property
+    def jitter_stdev(self) -> float:
+        if self.iterations < 2:
+            return 0.0
+        return math.sqrt(self.__jitter_m2 / (self.iterations - 1))
+
+    @property
+    def mean_duration(self) -> float:
+        if self.iterations == 0:
+            return 0.0
+        return self.__total_duration / self.iterations
+
+    def as_dict(self) -> dict:
+        return {
+            "frequency": 1 / self.period,
+            "iterations": self.iterations,
+            "overruns": self.overruns,
+            "missed_deadlines": self.missed_deadlines,
+            "mean_jitter": self.mean_jitter,
+            "jitter_stdev": self.jitter_stdev,
+            "max_jitter": self.max_jitter,
+            "mean_duration": self.mean_duration,
+            "max_duration": self.max_duration,
+            "errors": self.errors,
+        }
+
+    def __repr__(self):
+        return (f"{1 / self.period:.0f} Hz, {self.iterations} runs, "
+                f"jitter {self.mean_jitter * 1000:.3f}/{self.max_jitter * 1000:.3f} ms (mean/max), "
+                f"{self.overruns} overruns, {self.missed_deadlines} missed, {self.errors} errors")
+
+
+class Rate:
+    """
+    Paces an inline loop at a fixed frequency.
+
+    Each call to `sleep` waits until the next period boundary measured from
+    when the Rate was created, so time spent in the loop body does not make
+    the loop drift. If the loop falls a whole period behind, the missed
+    periods are skipped and counted rather than run back to back.
+
+    Example:
+    rate = Rate(50)
+    while not done():
+        do_work()
+        rate.sleep()
+
+    :ivar stats: Timing statistics of the paced loop.
+    :type stats: TaskStats
+    Author: Jack McDonald
+    """
+
+    def __init__(self, frequency: float):
+        if frequency <= 0:
+            raise ValueError("frequency must be a positive number of hertz")
+        self.period = 1 / frequency
+        self.stats = TaskStats(self.period)
+        self.__deadline = clock.monotonic() + self.period
+        self.__started = clock.monotonic()
+
+    def sleep(self) -> None:
+        now = clock.monotonic()
+        duration = now - self.__started
+        if now > self.__deadline + self.period:
+            missed = int((now - self.__deadline) / self.period)
+            self.stats.missed_deadlines += missed
+            self.__deadline += missed * self.period
+        sleep_until(self.__deadline)
+        self.__started = clock.monotonic()
+        self.stats.record(self.__started - self.__deadline, duration)
+        self.__deadline += self.period
+
+
+class PeriodicTask:
+    """
+    A function run by a Scheduler at a fixed frequency.
+
+    :ivar name: Name of the task, used in reports.
+    :type name: str
+    :ivar func: The function to run, called without arguments.
+    :type func: Callable[[], None]
+    :ivar period: Time between two runs, in seconds.
+    :type period: float
+    :ivar stats: Timing statistics of the task.
+    :type stats: TaskStats
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str, func, frequency: float):
+        if frequency <= 0:
+            raise ValueError("frequency must be a positive number of hertz")
+        self.name = name
+        self.func = func
+        self.period = 1 / frequency
+        self.stats = TaskStats(self.period)
+        self.deadline = 0.0
+
+
+class Scheduler:
+    """
+    Runs registered periodic tasks at fixed frequencies on a single thread.
+
+    Deadlines are computed from the monotonic clock as multiples of each
+    task's period, so tasks do not drift the way `time.sleep` polling loops
+    do. Between deadlines the thread sleeps, then spins for the last
+    fraction of a millisecond to hit the deadline accurately. Jitter,
+    overruns and missed deadlines are recorded for every task. A task which
+    raises is reported and counted in its errors, and keeps its schedule.
+
+    Example:
+    scheduler = Scheduler("control")
+    scheduler.add_task("sensors.touch", read_touch, 500)
+    scheduler.add_task("motors", supervise_motors, 50)
+    scheduler.start()
+
+    :ivar name: Name of the scheduler thread.
+    :type name: str
+    :ivar tasks: The registered tasks by name.
+    :type tasks: dict[str, PeriodicTask]
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str = "scheduler", spin_threshold: float = SPIN_THRESHOLD):
+        self.name = name
+        self.spin_threshold = spin_threshold
+        self.tasks = {}
+        self.__lock = Lock()
+        self.__stop_event = Event()
+        self.__thread = None
+
+    def add_task(self, name: str, func, frequency: float) -> PeriodicTask:
+        """
+        Registers a task. Tasks may be added while the scheduler is running.
+
+        :param name: Unique name of the task.
+        :type name: str
+        :param func: The function to run, called without arguments.
+        :type func: Callable[[], None]
+        :param frequency: How often to run the task, in hertz.
+        :type frequency: float
+        :return: The registered task.
+        :rtype: PeriodicTask
+        Author: Jack McDonald
+        """
+        task = PeriodicTask(name, func, frequency)
+        task.deadline = clock.monotonic()
+        with self.__lock:
+            if name in self.tasks:
+                raise ValueError(f"a task named {name} is already registered")
+            self.tasks[name] = task
+        return task
+
+    def remove_task(self, name: str) -> None:
+        with self.__lock:
+            self.tasks.pop(name, None)
+
+    def start(self) -> None:
+        """
+        Starts running the tasks on a background thread.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.is_running():
+            return
+        self.__stop_event.clear()
+        with self.__lock:
+            now = clock.monotonic()
+            for task in self.tasks.values():
+                task.deadline = now
+        self.__thread = Thread(target=self.__run, daemon=True, name=self.name)
+        clock.attach(self.__thread)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the scheduler thread. Can safely be called from within a task.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.set()
+        if self.__thread is not None and self.__thread is not current_thread() and self.__thread.is_alive():
+            self.__thread.join()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive() and not self.__stop_event.is_set()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the timing statistics of every task.
+
+        :return: The statistics of each task, by task name.
+        :rtype: dict[str, TaskStats]
+        """
+        with self.__lock:
+            return {name: task.stats for name, task in self.tasks.items()}
+
+    def report(self) -> str:
+        return "\n".join(f"{name}: {stats}" for name, stats in self.get_stats().items())
+
+    def __next_task(self):
+        with self.__lock:
+            if not self.tasks:
+                return None
+            return min(self.tasks.values(), key=lambda task: task.deadline)
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            task = self.__next_task()
+            if task is None:
+                self.__stop_event.wait(self.spin_threshold)
+                continue
+            sleep_until(task.deadline, self.__stop_event, self.spin_threshold)
+            if self.__stop_event.is_set():
+                break
+
+            start = clock.monotonic()
+            try:
+                task.func()
+            except IOError as error:
+                print(error)
+                task.stats.errors += 1
+            except Exception:
+                # One failing task must not stop the others sharing this thread
+                print(f"Task {task.name} of {self.name} failed:", file=sys.stderr)
+                traceback.print_exc()
+                task.stats.errors += 1
+            end = clock.monotonic()
+            instrumentation.tick(self.name)
+            instrumentation.tick(task.name)
+
+            task.stats.record(start - task.deadline, end - start)
+            task.deadline += task.period
+            if end > task.deadline + task.period:
+                # Skip the periods we can no longer meet instead of running them back to back
+                missed = int((end - task.deadline) / task.period)
+                task.stats.missed_deadlines += missed
+                task.deadline += missed * task.period
+
+
+class AsyncRate:
+    """
+    Paces a coroutine loop at a fixed frequency on the running event loop.
+
+    The asyncio counterpart of Rate: it keeps the same fixed deadlines and
+    statistics, but awaits instead of blocking the thread, so many paced
+    loops can share one event loop. It follows the event loop's time, so it
+    is not sped up by a virtual clock.
+
+    :ivar stats: Timing statistics of the paced loop.
+    :type stats: TaskStats
+    Author: Jack McDonald
+    """
+
+    def __init__(self, frequency: float):
+        if frequency <= 0:
+            raise ValueError("frequency must be a positive number of hertz")
+        self.period = 1 / frequency
+        self.stats = TaskStats(self.period)
+        self.__deadline = time.monotonic() + self.period
+        self.__started = time.monotonic()
+
+    async def sleep(self) -> None:
+        now = time.monotonic()
+        duration = now - self.__started
+        if now > self.__deadline + self.period:
+            missed = int((now - self.__deadline) / self.period)
+            self.stats.missed_deadlines += missed
+            self.__deadline += missed * self.period
+        await asyncio.sleep(max(0.0, self.__deadline - now))
+        self.__started = time.monotonic()
+        self.stats.record(max(0.0, self.__started - self.__deadline), duration)
+        self.__deadline += self.period
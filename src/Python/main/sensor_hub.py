@@ -0,0 +1,287 @@
+import asyncio
+from collections import namedtuple
+from threading import Event, Lock
+
+from project.utils import clock
+from scheduler import AsyncRate, Scheduler
+from sensors import SensorController
+
+Reading = namedtuple("Reading", ["value", "timestamp"])
+
+
+class SensorHub:
+    """
+    Samples the robot's sensors in the background and publishes timestamped
+    readings to any number of consumers.
+
+    Every sensor is sampled by a fixed-rate Scheduler task at its own rate,
+    so a slow ultrasonic read no longer holds back the colour or touch
+    sensors, and the sampling thread sleeps between samples instead of
+    spinning. Consumers either read the
+    latest value with `get` or block on a condition with `wait_for`, which
+    costs no CPU until a matching reading arrives. Predicates are evaluated
+    by the sampler, and a waiting consumer is only woken once one holds.
+
+    Under asyncio the hub can instead be sampled by coroutines with
+    `run_async`, and coroutines wait on conditions with `wait_for_async`.
+
+    When the SensorController reads a SensorProcess, readings carry the time
+    the worker took the sample rather than the time the hub polled it, and a
+    sensor the worker has not sampled yet is not published at all.
+
+    :ivar rates: Sample rate of each sensor, in hertz.
+    :type rates: dict[str, float]
+    Author: Jack McDonald
+    """
+    DEFAULT_RATES = {
+        "colour": 100,
+        "distance": 25,
+        "touch": 200,
+    }
+
+    def __init__(self, sensors: SensorController, rates: dict = None, scheduler: Scheduler = None):
+        """
+        Creates a hub sampling the colour, distance and touch sensors of the
+        given SensorController. Sampling does not begin until `start` is called.
+
+        :param sensors: The controller used to read the physical sensors.
+        :type sensors: SensorController
+        :param rates: Optional sample rates in hertz, overriding DEFAULT_RATES
+            for the named sensors.
+        :type rates: dict[str, float]
+        :param scheduler: Scheduler to run the sampling tasks on. If None, the
+            hub creates and owns a scheduler of its own.
+        :type scheduler: Scheduler
+        Author: Jack McDonald
+        """
+        self.rates = {}
+        self.__sources = {}
+        self.__timestamps = {}
+        self.__readings = {}
+        self.__lock = Lock()
+        self.__waiters = []
+        self.__async_waiters = []
+        self.__subscribers = {}
+        self.__stop_event = Event()
+        self.__owns_scheduler = scheduler is None
+        self.scheduler = Scheduler("sensors") if scheduler is None else scheduler
+
+        rates = dict(self.DEFAULT_RATES, **(rates or {}))
+        process = sensors.sensor_process
+        self.add_sensor("colour", sensors.get_colour_name, rates["colour"],
+                        None if process is None else lambda: process.sample_time("rgb"))
+        self.add_sensor("distance", sensors.get_us_sensor_distance, rates["distance"],
+                        None if process is None else lambda: process.sample_time("distance"))
+        self.add_sensor("touch", sensors.get_touch_sensor_state, rates["touch"],
+                        None if process is None else lambda: process.sample_time("touch"))
+
+    def add_sensor(self, name: str, source, rate: float, timestamp=None):
+        """
+        Registers a sensor with the hub.
+
+        :param name: The name consumers use to refer to the sensor.
+        :type name: str
+        :param source: A callable taking no arguments which returns a new sample.
+        :type source: Callable[[], Any]
+        :param rate: The sample rate in hertz.
+        :type rate: float
+        :param timestamp: For a source which only returns samples taken
+            elsewhere, a callable taking no arguments which returns when its
+            latest sample was taken, or None if there is none yet. By default,
+            readings are stamped with the time the source is read.
+        :type timestamp: Callable[[], Optional[float]]
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            self.rates[name] = rate
+            self.__sources[name] = source
+            self.__timestamps[name] = timestamp
+            self.__readings[name] = Reading(None, 0.0)
+        self.scheduler.add_task(f"sensors.{name}", lambda: self.__sample(name), rate)
+
+    def start(self):
+        """
+        Starts sampling. A shared scheduler passed to the constructor must
+        be started by its owner.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        if self.__owns_scheduler:
+            self.scheduler.start()
+
+    def stop(self):
+        """
+        Stops the sampling thread and wakes up every consumer blocked in `wait_for`.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.set()
+        with self.__lock:
+            for waiter in self.__waiters:
+                waiter[2].set()
+            for _, _, future in self.__async_waiters:
+                future.get_loop().call_soon_threadsafe(self.__resolve, future, None)
+        if self.__owns_scheduler:
+            self.scheduler.stop()
+
+    def is_running(self) -> bool:
+        return not self.__stop_event.is_set() and self.scheduler.is_running()
+
+    def get(self, name: str) -> Reading:
+        """
+        Returns the latest reading of a sensor.
+
+        :param name: The name of the sensor.
+        :type name: str
+        :return: The latest reading. Its value is None and its timestamp 0 if
+            the sensor has not been sampled yet.
+        :rtype: Reading
+        Author: Jack McDonald
+        """
+        return self.__readings[name]
+
+    def get_value(self, name: str):
+        return self.__readings[name].value
+
+    def subscribe(self, name: str, callback):
+        """
+        Calls the callback with every new reading of the named sensor, on the
+        thread or coroutine that sampled it. Callbacks must return quickly.
+
+        :param name: The name of the sensor.
+        :type name: str
+        :param callback: A callable receiving each new Reading.
+        :type callback: Callable[[Reading], None]
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            self.__subscribers.setdefault(name, []).append(callback)
+
+    def unsubscribe(self, name: str, callback):
+        with self.__lock:
+            self.__subscribers.get(name, []).remove(callback)
+
+    def wait_for(self, name: str, predicate, timeout: float = None):
+        """
+        Blocks until a reading of the named sensor satisfies the predicate.
+
+        The calling thread sleeps on an event which the sampler sets once a
+        new sample satisfies the predicate, so waiting costs close to no CPU.
+
+        Example:
+        hub.wait_for("colour", lambda colour: colour == "yellow")
+        hub.wait_for("distance", lambda distance: distance <= 25)
+
+        :param name: The name of the sensor.
+        :type name: str
+        :param predicate: A callable receiving the sensor value and returning
+            True when the wait should end.
+        :type predicate: Callable[[Any], bool]
+        :param timeout: The maximum time to wait in seconds, or None to wait forever.
+        :type timeout: float
+        :return: The reading satisfying the predicate, or None if the timeout
+            expired or the hub was stopped first.
+        :rtype: Reading
+        Author: Jack McDonald
+        """
+        waiter = [name, predicate, Event(), None]
+        with self.__lock:
+            reading = self.__readings[name]
+            if reading.value is not None and predicate(reading.value):
+                return reading
+            if self.__stop_event.is_set():
+                return None
+            self.__waiters.append(waiter)
+        try:
+            clock.wait(waiter[2], timeout)
+        finally:
+            with self.__lock:
+                self.__waiters.remove(waiter)
+        return waiter[3]
+
+    async def run_async(self):
+        """
+        Samples every sensor at its rate from coroutines on the running event
+        loop, instead of on the scheduler thread. Runs until `stop` is called
+        or the task is cancelled.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.clear()
+        await asyncio.gather(*(self.__sample_loop_async(name) for name in list(self.__sources)))
+
+    async def wait_for_async(self, name: str, predicate, timeout: float = None):
+        """
+        Waits until a reading of the named sensor satisfies the predicate,
+        without blocking the event loop. See `wait_for`.
+
+        :param name: The name of the sensor.
+        :type name: str
+        :param predicate: A callable receiving the sensor value and returning
+            True when the wait should end.
+        :type predicate: Callable[[Any], bool]
+        :param timeout: The maximum time to wait in seconds, or None to wait forever.
+        :type timeout: float
+        :return: The reading satisfying the predicate, or None if the timeout
+            expired or the hub was stopped first.
+        :rtype: Reading
+        Author: Jack McDonald
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = (name, predicate, future)
+        with self.__lock:
+            reading = self.__readings[name]
+            if reading.value is not None and predicate(reading.value):
+                return reading
+            if self.__stop_event.is_set():
+                return None
+            self.__async_waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self.__lock:
+                self.__async_waiters.remove(waiter)
+
+    @staticmethod
+    def __resolve(future, reading):
+        if not future.done():
+            future.set_result(reading)
+
+    async def __sample_loop_async(self, name: str):
+        rate = AsyncRate(self.rates[name])
+        while not self.__stop_event.is_set():
+            self.__sample(name)
+            await rate.sleep()
+
+    def __sample(self, name: str):
+        if self.__stop_event.is_set():
+            return
+        try:
+            value = self.__sources[name]()
+        except IOError as error:
+            print(error)
+            return
+        timestamp = clock.monotonic() if self.__timestamps[name] is None else self.__timestamps[name]()
+        if timestamp is None:
+            return
+        reading = Reading(value, timestamp)
+        with self.__lock:
+            self.__readings[name] = reading
+            for waiter in self.__waiters:
+                if waiter[0] == name and waiter[3] is None and value is not None and waiter[1](value):
+                    waiter[3] = reading
+                    waiter[2].set()
+            for waiter_name, predicate, future in self.__async_waiters:
+                if waiter_name == name and value is not None and predicate(value):
+                    future.get_loop().call_soon_threadsafe(self.__resolve, future, reading)
+            subscribers = list(self.__subscribers.get(name, ()))
+        for callback in subscribers:
+            callback(reading)
@@ -0,0 +1,302 @@
+import math
+import multiprocessing
+import os
+import struct
+import sys
+from multiprocessing import shared_memory
+
+from project.utils import clock
+from scheduler import Scheduler
+from sensor_hub import Reading
+
+# Number of samples written so far, then the slots
+RING_HEADER = struct.Struct("<Q")
+# Sequence number, timestamp, number of values, values
+SLOT = struct.Struct("<QdB7x4d")
+MAX_VALUES = 4
+# The worker is spawned rather than forked: by the time it starts the control
+# process runs several threads, whose locks a fork would copy mid-use, and the
+# worker must configure the sensors itself rather than inherit a copy of them.
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class SampleRing:
+    """
+    A single-writer ring buffer of timestamped samples in shared memory.
+
+    The writer fills a slot, then publishes it by bumping the sample count
+    in the header. Readers unpack straight out of the shared buffer, with no
+    pipe or pickling in between, and check the slot's sequence number on
+    both sides of the read so a slot overwritten mid-read is detected and
+    read again.
+
+    :ivar name: Name of the shared memory block, used to attach to it from
+        another process.
+    :type name: str
+    :ivar slots: Number of samples the ring holds before overwriting the oldest.
+    :type slots: int
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str = None, slots: int = 64, create: bool = True):
+        if create:
+            self.__memory = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + slots * SLOT.size)
+            RING_HEADER.pack_into(self.__memory.buf, 0, 0)
+        else:
+            self.__memory = shared_memory.SharedMemory(name=name)
+            slots = (self.__memory.size - RING_HEADER.size) // SLOT.size
+        self.name = self.__memory.name
+        self.slots = slots
+        self.__owner = create
+
+    def write(self, timestamp: float, value) -> None:
+        """
+        Appends a sample. Must only be called from a single process.
+
+        :param timestamp: Monotonic time at which the sample was taken.
+        :type timestamp: float
+        :param value: A number, a sequence of up to four numbers, or None.
+        :return: None
+        Author: Jack McDonald
+        """
+        buffer = self.__memory.buf
+        sequence = RING_HEADER.unpack_from(buffer, 0)[0] + 1
+        if value is None:
+            values = ()
+        elif isinstance(value, (list, tuple)):
+            values = tuple(math.nan if v is None else float(v) for v in value[:MAX_VALUES])
+        else:
+            values = (float(value),)
+        SLOT.pack_into(buffer, self.__offset(sequence), sequence, timestamp, len(values),
+                       *(values + (math.nan,) * (MAX_VALUES - len(values))))
+        RING_HEADER.pack_into(buffer, 0, sequence)
+
+    def count(self) -> int:
+        return RING_HEADER.unpack_from(self.__memory.buf, 0)[0]
+
+    def latest(self):
+        """
+        Returns the most recent sample.
+
+        :return: The latest sample, with a tuple of values, or None if nothing
+            was written yet.
+        :rtype: Reading
+        Author: Jack McDonald
+        """
+        while True:
+            sequence = self.count()
+            if sequence == 0:
+                return None
+            reading = self.__read(sequence)
+            if reading is not None:
+                return reading
+
+    def read_since(self, sequence: int) -> list:
+        """
+        Returns the samples written after the given sequence number, oldest
+        first. Samples already overwritten are skipped.
+
+        :param sequence: Sequence number of the last sample already read, or 0.
+        :type sequence: int
+        :return: Pairs of sequence number and sample.
+        :rtype: list[tuple[int, Reading]]
+        Author: Jack McDonald
+        """
+        latest = self.count()
+        samples = []
+        for current in range(max(sequence + 1, latest - self.slots + 1), latest + 1):
+            reading = self.__read(current)
+            if reading is not None:
+                samples.append((current, reading))
+        return samples
+
+    def close(self) -> None:
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+
+    def __offset(self, sequence: int) -> int:
+        return RING_HEADER.size + (sequence % self.slots) * SLOT.size
+
+    def __read(self, sequence: int):
+        buffer = self.__memory.buf
+        offset = self.__offset(sequence)
+        written, timestamp, count, *values = SLOT.unpack_from(buffer, offset)
+        if written != sequence or SLOT.unpack_from(buffer, offset)[0] != sequence:
+            return None  # Overwritten by the writer
+        value = None if count == 0 else tuple(None if math.isnan(v) else v for v in values[:count])
+        return Reading(value, timestamp)
+
+
+def _acquire(rings: dict, rates: dict, stop_event, core, replay):
+    """Entry point of the acquisition process."""
+    if core is not None:
+        try:
+            os.sched_setaffinity(0, {core})
+        except (AttributeError, OSError) as error:
+            print(f"Sensor process not pinned to core {core}: {error}", file=sys.stderr)
+
+    # Imported here so only the worker registers and configures the sensors
+    from project.utils.colour_sensor import get_raw_rgb
+    from project.utils.devices import DEVICES
+    from project.utils.touch_sensor import is_pressed
+    from project.utils.us_sensor import get_distance
+    sources = {"rgb": get_raw_rgb, "distance": get_distance, "touch": is_pressed}
+    DEVICES.initialize(("colour", "ultrasonic", "touch"))
+    if replay is not None:
+        # The worker has a dummy brick of its own, which the control process' replay does not reach
+        from recorder import MissionReplay
+        path, speed = replay
+        MissionReplay(path, speed=speed).start()
+
+    rings = {name: SampleRing(ring_name, create=False) for name, ring_name in rings.items()}
+    scheduler = Scheduler("acquisition")
+    for name, ring in rings.items():
+        scheduler.add_task(name, lambda source=sources[name], ring=ring: _write_sample(source, ring), rates[name])
+    scheduler.start()
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        for ring in rings.values():
+            ring.close()
+
+
+def _write_sample(source, ring: SampleRing):
+    try:
+        value = source()
+    except (IOError, TypeError, ValueError) as error:
+        # A reading the driver could not decode is skipped, rather than left to the scheduler to report
+        print(error)
+        return
+    ring.write(clock.monotonic(), value)
+
+
+class SensorProcess:
+    """
+    Samples the colour, ultrasonic and touch sensors in a worker process of
+    their own, and publishes the samples through shared-memory ring buffers.
+
+    On a single interpreter the GIL makes sensor sampling jitter whenever
+    the control thread does work. The worker process has its own
+    interpreter, and is pinned to a core of its own when the machine has
+    more than one, so sample timing stays steady. The control process
+    reads samples straight from shared memory with `get`, which never
+    touches the sensors or blocks on the worker.
+
+    The raw colour sensor RGB values are published as "rgb"; classifying
+    them is left to the readers.
+
+    Example:
+    process = SensorProcess()
+    process.start()
+    rgb = process.get_value("rgb")
+
+    The worker is a spawned process, so it shares nothing with the control
+    process but the rings: on the dummy brick, sensor values set in the
+    control process are not seen by the worker. Set `replay` to feed it a
+    mission log instead.
+
+    :ivar rates: Sample rate of each sensor, in hertz.
+    :type rates: dict[str, float]
+    :ivar replay: Path and speed of a mission log the worker replays through
+        its dummy brick once started, or None.
+    :type replay: tuple[str, float]
+    Author: Jack McDonald
+    """
+    DEFAULT_RATES = {
+        "rgb": 200,
+        "distance": 25,
+        "touch": 100,
+    }
+    RING_SLOTS = 64
+
+    def __init__(self, rates: dict = None, core: int = None):
+        """
+        Creates the ring buffers. The worker is not started until `start` is called.
+
+        :param rates: Optional sample rates in hertz, overriding DEFAULT_RATES.
+        :type rates: dict[str, float]
+        :param core: CPU core to pin the worker to. By default the last core,
+            if there is more than one.
+        :type core: int
+        Author: Jack McDonald
+        """
+        self.rates = dict(self.DEFAULT_RATES, **(rates or {}))
+        cores = os.cpu_count() or 1
+        self.core = core if core is not None else (cores - 1 if cores > 1 else None)
+        self.rings = {name: SampleRing(slots=self.RING_SLOTS) for name in self.rates}
+        self.replay = None
+        self.__stop_event = _CONTEXT.Event()
+        self.__process = None
+
+    def start(self):
+        """
+        Starts the worker process.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.is_running():
+            return
+        self.__stop_event.clear()
+        ring_names = {name: ring.name for name, ring in self.rings.items()}
+        self.__process = _CONTEXT.Process(target=_acquire, daemon=True, name="sensors",
+                                          args=(ring_names, self.rates, self.__stop_event, self.core, self.replay))
+        self.__process.start()
+
+    def stop(self):
+        """
+        Stops the worker process and frees the shared memory.
+
+        :return: None
+        Author: Jack McDonald
+        """
+        self.__stop_event.set()
+        if self.__process is not None:
+            self.__process.join()
+            self.__process = None
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+    def is_running(self) -> bool:
+        return self.__process is not None and self.__process.is_alive()
+
+    def get(self, name: str):
+        """
+        Returns the latest sample of a sensor.
+
+        :param name: "rgb", "distance" or "touch".
+        :type name: str
+        :return: The latest sample, or a sample with value None and timestamp 0
+            if the sensor has not been sampled yet.
+        :rtype: Reading
+        Author: Jack McDonald
+        """
+        reading = self.rings[name].latest()
+        if reading is None:
+            return Reading(None, 0.0)
+        value = reading.value
+        if value is not None and name != "rgb":
+            value = value[0]
+        return Reading(value, reading.timestamp)
+
+    def get_value(self, name: str):
+        return self.get(name).value
+
+    def sample_time(self, name: str):
+        """
+        Returns when the latest sample of a sensor was taken.
+
+        :param name: "rgb", "distance" or "touch".
+        :type name: str
+        :return: The monotonic time of the sample, or None if the sensor has
+            not been sampled yet.
+        :rtype: Optional[float]
+        Author: Jack McDonald
+        """
+        reading = self.rings[name].latest()
+        return None if reading is None else reading.timestamp
@@ -1,7 +1,7 @@
 import colour_processing
 from project.utils.touch_sensor import is_pressed
 from project.utils.us_sensor import get_distance
-from project.utils.colour_sensor import get_normalized_rgb, get_raw_rgb
+from project.utils.colour_sensor import get_raw_rgb, normalize_rgb
 
 class SensorController:
     """
@@ -18,9 +18,18 @@ class SensorController:
     :type colour_sensor: Optional[Any]
     :ivar us_sensor: Represents the ultrasonic sensor connected to the system.
     :type us_sensor: Optional[Any]
+    :ivar sensor_process: If set, sensor values are taken from the samples
+        this worker process publishes instead of being read from the sensors.
+    :type sensor_process: Optional[SensorProcess]
     Author: Jack McDonald
     """
-    def __init__(self):
+    # Estimates used until `calibrate_reflectance` measures the arena, which Chassis.follow_line
+    # does by sweeping the colour sensor across the line before it first follows one
+    BLACK_INTENSITY = 100  # Sum of the raw RGB values over a black line
+    WHITE_INTENSITY = 1000  # Sum of the raw RGB values over the white floor
+    MIN_CONTRAST = 200  # Smallest spread of intensities accepted as having seen both the line and the floor
+
+    def __init__(self, sensor_process=None):
         """
         Represents an initialization of sensor attributes for an object.
 
@@ -35,11 +44,17 @@ class SensorController:
                 A placeholder for the colour sensor associated with the object.
             us_sensor:
                 A placeholder for the ultrasonic sensor associated with the object.
+            sensor_process:
+                Optional SensorProcess whose published samples replace direct sensor reads.
         Author: Jack McDonald
         """
         self.touch_sensor = None
         self.colour_sensor = None
         self.us_sensor = None
+        self.sensor_process = sensor_process
+        self.black_intensity = self.BLACK_INTENSITY
+        self.white_intensity = self.WHITE_INTENSITY
+        self.reflectance_calibrated = False
 
     def get_colour_name(self):
         """
@@ -51,15 +66,75 @@ class SensorController:
         aims to provide a human-readable or standard representation of the
         associated color.
 
-        :return: The name of the color as a string.
+        :return: The name of the color as a string, "unknown" when no sample is available.
         :rtype: str
         Author: Jack McDonald
         """
-        normalized_rgb = get_normalized_rgb()
+        raw_rgb = self.__get_colour_raw()
+        normalized_rgb = None if self.__is_missing(raw_rgb) else normalize_rgb(raw_rgb)
         processor = colour_processing.ColourProcessing()
         return processor.identify_colour(normalized_rgb)
         #RALPH
 
+    def get_reflectance(self):
+        """
+        Returns how much light the surface under the colour sensor reflects,
+        from the total of its raw RGB values, scaled from 0 over a black line
+        to 1 over the white floor. Unlike the normalised RGB, which the
+        colour names come from, this keeps the intensity, so black and white
+        are far apart.
+
+        :return: The normalised reflectance, clamped to [0, 1], or None when
+            no sample is available.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        intensity = self.get_intensity()
+        if intensity is None:
+            return None
+        reflectance = (intensity - self.black_intensity) / (self.white_intensity - self.black_intensity)
+        return max(0.0, min(1.0, reflectance))
+
+    def get_intensity(self):
+        """
+        Returns the total of the raw RGB values of the colour sensor.
+
+        :return: The intensity, or None when no sample is available.
+        :rtype: float
+        Author: Jack McDonald
+        """
+        raw_rgb = self.__get_colour_raw()
+        if self.__is_missing(raw_rgb):
+            return None
+        return sum(raw_rgb[:3])
+
+    def calibrate_reflectance(self, intensities) -> bool:
+        """
+        Sets the intensities `get_reflectance` scales between from readings
+        taken while the colour sensor was swept across a line: the darkest
+        becomes black, and the brightest white. Readings too close together
+        to have seen both are rejected, and the previous intensities kept.
+
+        :param intensities: Readings of `get_intensity`, None for a missing sample.
+        :type intensities: Iterable[Optional[float]]
+        :return: Whether the readings were used.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        intensities = [intensity for intensity in intensities if intensity is not None]
+        if not intensities or max(intensities) - min(intensities) < self.MIN_CONTRAST:
+            print(f"Reflectance not calibrated, the readings do not cover both a line and the floor: "
+                  f"{min(intensities, default=None)} to {max(intensities, default=None)}")
+            return False
+        self.black_intensity, self.white_intensity = min(intensities), max(intensities)
+        self.reflectance_calibrated = True
+        return True
+
+    @staticmethod
+    def __is_missing(raw_rgb) -> bool:
+        # The sensor gives [None, None, None] rather than None when it has no sample
+        return raw_rgb is None or any(value is None for value in raw_rgb[:3])
+
     def __get_colour_raw(self):
         """
         Fetches and returns the raw color data in its original form without
@@ -69,6 +144,8 @@ class SensorController:
         :rtype: Any
         Author: Jack McDonald
         """
+        if self.sensor_process is not None:
+            return self.sensor_process.get_value("rgb")
         raw_rgb = get_raw_rgb()
         return raw_rgb
         #RALPH
@@ -85,8 +162,10 @@ class SensorController:
         :rtype: bool
         Author: Jack McDonald
         """
-        is_pressed = is_pressed()
-        return is_pressed
+        if self.sensor_process is not None:
+            return self.sensor_process.get_value("touch") == 1
+        pressed = is_pressed()
+        return pressed
         #RALPH
 
     def get_us_sensor_distance(self):
@@ -100,6 +179,9 @@ class SensorController:
         :rtype: float
         Author: Jack McDonald
         """
+        if self.sensor_process is not None:
+            distance = self.sensor_process.get_value("distance")
+            return None if distance is None else int(distance)
         distance = get_distance()
         return distance
         #RALPH
@@ -0,0 +1,97 @@
+from motor import MotorController
+from sensor_hub import Reading, SensorHub
+from stop_conditions import SensorSnapshot
+
+
+class SpeedGovernor:
+    """
+    Caps the driving speed to what the colour sensing can keep up with.
+
+    A line is only caught if enough colour samples land on it while the
+    sensor passes over, so the fastest safe speed is the width of the line
+    times the rate of fresh colour samples, over the number of samples
+    wanted on it. Rather than assuming the configured rate, the governor
+    measures the rate the readings actually arrive at, from the timestamps
+    of the SensorHub, smoothed over the last few dozen samples. A slow read,
+    an overloaded scheduler or a faster sampling path all show up in it, so
+    the speed follows the sensing rather than a hand-tuned constant. With a
+    SensorProcess, the timestamps are those of the worker's samples, so a
+    hub polling faster than the worker samples does not count the same
+    sample twice.
+
+    A drive checks the colour from its own loop, so the rate is also capped
+    at the rate of that loop. An instance can be passed as the governor of
+    Chassis.drive_until.
+
+    :ivar sample_rate: Measured rate of the colour readings, in hertz, or None before two have arrived.
+    :type sample_rate: float
+    Author: Jack McDonald
+    """
+    LINE_WIDTH = 0.015  # (metres) Width of the narrowest line which must be caught
+    SAMPLES_PER_LINE = 3  # Colour samples which must land on a line for it to be caught
+    SMOOTHING = 0.05  # Weight of each new sample interval in the measured rate
+    MIN_SPEED = 30  # (deg per sec)
+
+    def __init__(self, sensor_hub: SensorHub, max_speed: float = MotorController.SPEED_LIMIT,
+                 loop_rate: float = None, line_width: float = LINE_WIDTH,
+                 samples_per_line: int = SAMPLES_PER_LINE,
+                 distance_to_degrees: float = MotorController.DISTANCE_TO_DEGREES):
+        """
+        Creates a governor and subscribes it to the colour readings of the hub.
+
+        :param sensor_hub: Publishes the colour readings.
+        :type sensor_hub: SensorHub
+        :param max_speed: Speed never to exceed, however fast the sampling, in degrees per second.
+        :type max_speed: float
+        :param loop_rate: Rate in hertz of the loop checking the colour, if lower than the sampling can be.
+        :type loop_rate: float
+        :param line_width: Width of the narrowest line which must be caught, in metres.
+        :type line_width: float
+        :param samples_per_line: Colour samples which must land on a line.
+        :type samples_per_line: int
+        :param distance_to_degrees: Degrees of wheel rotation per metre travelled.
+        :type distance_to_degrees: float
+        Author: Jack McDonald
+        """
+        self.max_speed = max_speed
+        self.loop_rate = loop_rate
+        self.line_width = line_width
+        self.samples_per_line = samples_per_line
+        self.distance_to_degrees = distance_to_degrees
+        self.sample_rate = None
+        self.__interval = None
+        self.__last = None
+        sensor_hub.subscribe("colour", self.on_colour)
+
+    def on_colour(self, reading: Reading):
+        """
+        Updates the measured sample rate with a new colour reading.
+
+        :param reading: The new colour reading.
+        :type reading: Reading
+        :return: None
+        Author: Jack McDonald
+        """
+        if self.__last is not None and reading.timestamp > self.__last:
+            interval = reading.timestamp - self.__last
+            if self.__interval is None:
+                self.__interval = interval
+            else:
+                self.__interval += self.SMOOTHING * (interval - self.__interval)
+            self.sample_rate = 1 / self.__interval
+        self.__last = reading.timestamp
+
+    def speed_limit(self) -> float:
+        """
+        The fastest speed, in degrees per second, at which SAMPLES_PER_LINE
+        samples still land on a line at the measured sample rate. Until a rate
+        has been measured, only MIN_SPEED is allowed.
+        """
+        if self.sample_rate is None:
+            return self.MIN_SPEED
+        rate = self.sample_rate if self.loop_rate is None else min(self.sample_rate, self.loop_rate)
+        speed = self.line_width * rate / self.samples_per_line * self.distance_to_degrees
+        return max(self.MIN_SPEED, min(self.max_speed, speed))
+
+    def __call__(self, snapshot: SensorSnapshot, speed: float) -> float:
+        return self.speed_limit()
@@ -0,0 +1,437 @@
+from collections import deque, namedtuple
+from threading import RLock
+
+from project.utils import clock
+
+ANY = "*"  # Transition source matching every state
+
+TransitionRecord = namedtuple("TransitionRecord", ["timestamp", "source", "event", "target", "duration"])
+
+
+class State:
+    """
+    A state of a StateMachine.
+
+    States can be nested: a state with a parent is a sub-state, and a state
+    with children must name the child entered by default through `initial`.
+    States are referred to by their dotted path, e.g. "NavigationA.MoveToLine".
+
+    :ivar name: Name of the state, unique among its siblings.
+    :type name: str
+    :ivar parent: The enclosing state, or None for a top-level state.
+    :type parent: State
+    :ivar initial: Name of the child entered when this state is entered.
+    :type initial: str
+    :ivar on_enter: Called without arguments whenever the state is entered.
+    :type on_enter: Callable[[], None]
+    :ivar on_exit: Called without arguments whenever the state is exited.
+    :type on_exit: Callable[[], None]
+    :ivar final: Whether reaching this state ends `StateMachine.run`.
+    :type final: bool
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str, parent: "State" = None, initial: str = None,
+                 on_enter=None, on_exit=None, final: bool = False):
+        if "." in name or name == ANY:
+            raise ValueError(f"invalid state name {name}")
+        self.name = name
+        self.parent = parent
+        self.initial = initial
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.final = final
+        self.children = {}
+        if parent is not None:
+            parent.children[name] = self
+
+    @property
+    def path(self) -> str:
+        if self.parent is None:
+            return self.name
+        return f"{self.parent.path}.{self.name}"
+
+    @property
+    def depth(self) -> int:
+        return 0 if self.parent is None else self.parent.depth + 1
+
+    def ancestors(self) -> list:
+        """Returns this state and its ancestors, innermost first."""
+        states = []
+        state = self
+        while state is not None:
+            states.append(state)
+            state = state.parent
+        return states
+
+    def __repr__(self):
+        return f"State({self.path})"
+
+
+class Transition:
+    """
+    A transition of a StateMachine, taken when `event` is dispatched while
+    `source` (or one of its sub-states) is active and `guard` allows it.
+
+    :ivar source: Path of the source state, or ANY to match every state.
+    :type source: str
+    :ivar event: Name of the triggering event.
+    :type event: str
+    :ivar target: Path of the state to enter.
+    :type target: str
+    :ivar guard: Optional callable returning False to block the transition.
+    :type guard: Callable[[], bool]
+    :ivar action: Optional callable run between exiting and entering states.
+    :type action: Callable[[], None]
+    Author: Jack McDonald
+    """
+
+    def __init__(self, source: str, event: str, target: str, guard=None, action=None):
+        self.source = source
+        self.event = event
+        self.target = target
+        self.guard = guard
+        self.action = action
+
+    def __repr__(self):
+        return f"Transition({self.source} --{self.event}--> {self.target})"
+
+
+class StateMachine:
+    """
+    Table-driven hierarchical state machine with per-state timing.
+
+    States and transitions are declared up front; dispatching an event looks
+    up a matching transition from the active leaf state outwards, so a
+    transition declared on a parent state applies to all of its sub-states.
+    Taking a transition exits states up to the common ancestor of source and
+    target, runs the transition action, then enters states down to the
+    target and its initial sub-states, calling exit and entry actions in
+    order. Events dispatched from within an action are queued and handled
+    once the current transition completes, even if it failed, so a "stop"
+    dispatched from an action that then raises is not lost.
+
+    Every entry and exit is timestamped, so `report` can break down where the
+    time of a mission went, per state and sub-state.
+
+    Example:
+    machine = StateMachine("mission")
+    machine.add_state("Search")
+    machine.add_state("Done", final=True)
+    machine.add_transition("Search", "done", "Done", guard=lambda: found >= 2)
+    machine.start("Search")
+
+    :ivar name: Name of the machine, used in reports.
+    :type name: str
+    :ivar states: Every state by path.
+    :type states: dict[str, State]
+    :ivar history: Every transition taken, oldest first.
+    :type history: list[TransitionRecord]
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str = "state machine"):
+        self.name = name
+        self.states = {}
+        self.history = []
+        self.__transitions = {}
+        self.__leaf = None
+        self.__lock = RLock()
+        self.__queue = deque()
+        self.__dispatching = False
+        self.__entered_at = {}
+        self.__total_time = {}
+        self.__visits = {}
+        self.__started_at = None
+        self.__finished_at = None
+
+    def add_state(self, path: str, initial: str = None, on_enter=None, on_exit=None, final: bool = False) -> State:
+        """
+        Declares a state. The parent of a nested state must be declared first.
+
+        :param path: Dotted path of the state, e.g. "NavigationA.MoveToLine".
+        :type path: str
+        :param initial: Name of the child entered by default, for states with children.
+        :type initial: str
+        :param on_enter: Called whenever the state is entered.
+        :type on_enter: Callable[[], None]
+        :param on_exit: Called whenever the state is exited.
+        :type on_exit: Callable[[], None]
+        :param final: Whether reaching this state ends `run`.
+        :type final: bool
+        :return: The declared state.
+        :rtype: State
+        Author: Jack McDonald
+        """
+        parent_path, _, name = path.rpartition(".")
+        parent = self.states[parent_path] if parent_path else None
+        state = State(name, parent, initial, on_enter, on_exit, final)
+        self.states[state.path] = state
+        return state
+
+    def add_transition(self, source: str, event: str, target: str, guard=None, action=None) -> Transition:
+        """
+        Declares a transition. Transitions sharing a source and event are
+        tried in declaration order, and the first whose guard passes is taken.
+
+        :param source: Path of the source state, or ANY.
+        :type source: str
+        :param event: Name of the triggering event.
+        :type event: str
+        :param target: Path of the target state.
+        :type target: str
+        :param guard: Optional callable returning False to block the transition.
+        :type guard: Callable[[], bool]
+        :param action: Optional callable run during the transition.
+        :type action: Callable[[], None]
+        :return: The declared transition.
+        :rtype: Transition
+        Author: Jack McDonald
+        """
+        if source != ANY and source not in self.states:
+            raise KeyError(f"unknown source state {source}")
+        if target not in self.states:
+            raise KeyError(f"unknown target state {target}")
+        transition = Transition(source, event, target, guard, action)
+        self.__transitions.setdefault((source, event), []).append(transition)
+        return transition
+
+    @property
+    def state(self) -> str:
+        """Path of the active leaf state, or None before `start`."""
+        leaf = self.__leaf
+        return None if leaf is None else leaf.path
+
+    def is_in(self, path: str) -> bool:
+        """Returns True if the named state, or one of its sub-states, is active."""
+        leaf = self.__leaf
+        return leaf is not None and any(state.path == path for state in leaf.ancestors())
+
+    def is_finished(self) -> bool:
+        leaf = self.__leaf
+        return leaf is not None and leaf.final
+
+    def start(self, initial: str) -> None:
+        """
+        Enters the initial state, and its initial sub-states, and starts timing.
+
+        :param initial: Path of the state to start in.
+        :type initial: str
+        :return: None
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            self.__started_at = clock.monotonic()
+            self.__finished_at = None
+            self.__dispatching = True
+            try:
+                self.__enter_down_to(None, self.states[initial])
+            finally:
+                self.__drain_queue()
+
+    def dispatch(self, event: str) -> bool:
+        """
+        Handles an event, taking the first matching transition whose guard passes.
+
+        :param event: Name of the event.
+        :type event: str
+        :return: True if the event was handled now or queued behind the
+            current transition, False if no transition matched.
+        :rtype: bool
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            if self.__dispatching:
+                self.__queue.append(event)
+                return True
+            self.__dispatching = True
+            try:
+                return self.__handle(event)
+            finally:
+                self.__drain_queue()
+
+    def run(self, activities: dict, event: str = "done") -> None:
+        """
+        Drives the machine until a final state is reached. While a leaf state
+        is active, its activity (a blocking callable) is run, and `event` is
+        dispatched when it returns.
+
+        :param activities: Blocking callables by leaf state path. Leaf states
+            without an activity complete immediately.
+        :type activities: dict[str, Callable[[], None]]
+        :param event: The event dispatched when an activity completes.
+        :type event: str
+        :return: None
+        Author: Jack McDonald
+        """
+        while not self.is_finished():
+            state = self.state
+            activity = activities.get(state)
+            if activity is not None:
+                activity()
+            if self.state == state and not self.dispatch(event):
+                raise RuntimeError(f"state {state} has no transition for event {event}")
+
+    async def run_async(self, activities: dict, event: str = "done") -> None:
+        """
+        Asyncio flavour of `run`, where activities are coroutine functions.
+
+        :param activities: Coroutine functions by leaf state path.
+        :type activities: dict[str, Callable[[], Awaitable[None]]]
+        :param event: The event dispatched when an activity completes.
+        :type event: str
+        :return: None
+        Author: Jack McDonald
+        """
+        while not self.is_finished():
+            state = self.state
+            activity = activities.get(state)
+            if activity is not None:
+                await activity()
+            if self.state == state and not self.dispatch(event):
+                raise RuntimeError(f"state {state} has no transition for event {event}")
+
+    def get_timings(self) -> dict:
+        """
+        Returns the total time spent in each state, including time in its
+        sub-states. A state which is still active counts up to now.
+
+        :return: Seconds spent in each state, by path.
+        :rtype: dict[str, float]
+        Author: Jack McDonald
+        """
+        with self.__lock:
+            now = clock.monotonic()
+            timings = dict(self.__total_time)
+            for path, entered_at in self.__entered_at.items():
+                timings[path] = timings.get(path, 0.0) + now - entered_at
+            return timings
+
+    def get_visits(self) -> dict:
+        with self.__lock:
+            return dict(self.__visits)
+
+    def get_duration(self) -> float:
+        """Time since `start`, up to reaching a final state."""
+        if self.__started_at is None:
+            return 0.0
+        end = self.__finished_at if self.__finished_at is not None else clock.monotonic()
+        return end - self.__started_at
+
+    def slowest(self, leaves_only: bool = True) -> str:
+        """
+        Returns the path of the state in which the most time was spent.
+
+        :param leaves_only: If True, only states without sub-states are considered.
+        :type leaves_only: bool
+        :return: The path of the slowest state, or None if nothing was timed.
+        :rtype: str
+        """
+        timings = self.get_timings()
+        candidates = {path: seconds for path, seconds in timings.items()
+                      if not (leaves_only and self.states[path].children)}
+        if not candidates:
+            return None
+        return max(candidates, key=candidates.get)
+
+    def report(self) -> str:
+        """
+        Returns a per-state breakdown of the mission time, with sub-states
+        indented under their parent, in the order states were declared.
+
+        :return: The human-readable timing report.
+        :rtype: str
+        Author: Jack McDonald
+        """
+        timings = self.get_timings()
+        visits = self.get_visits()
+        total = self.get_duration()
+        slowest = self.slowest()
+        lines = [f"{self.name}: {total:.2f} s"]
+        for path, state in self.states.items():
+            if path not in timings:
+                continue
+            share = timings[path] / total * 100 if total > 0 else 0.0
+            marker = "  <- slowest" if path == slowest else ""
+            lines.append(f"{'  ' * (state.depth + 1)}{state.name}: {timings[path]:.2f} s "
+                         f"({share:.1f}%, {visits.get(path, 0)} visits){marker}")
+        return "\n".join(lines)
+
+    def __find_transition(self, event: str):
+        for state in self.__leaf.ancestors():
+            for transition in self.__transitions.get((state.path, event), []):
+                if transition.guard is None or transition.guard():
+                    return transition
+        for transition in self.__transitions.get((ANY, event), []):
+            if transition.guard is None or transition.guard():
+                return transition
+        return None
+
+    def __drain_queue(self):
+        # Runs after the transition in progress, whether or not it raised
+        try:
+            while self.__queue:
+                self.__handle(self.__queue.popleft())
+        finally:
+            self.__queue.clear()
+            self.__dispatching = False
+
+    def __handle(self, event: str) -> bool:
+        if self.__leaf is None:
+            raise RuntimeError("the state machine has not been started")
+        transition = self.__find_transition(event)
+        if transition is None:
+            return False
+
+        started = clock.monotonic()
+        source = self.__leaf
+        target = self.states[transition.target]
+        # A transition to the active state, or one of its ancestors, exits and re-enters it
+        target_ancestors = set(target.ancestors())
+        common = next((state for state in source.ancestors()
+                       if state in target_ancestors and state is not target), None)
+
+        for state in source.ancestors():
+            if state is common:
+                break
+            self.__exit(state)
+        if transition.action is not None:
+            transition.action()
+        self.__enter_down_to(common, target)
+
+        self.history.append(TransitionRecord(started, source.path, event, self.__leaf.path,
+                                             clock.monotonic() - started))
+        return True
+
+    def __enter_down_to(self, common: State, target: State):
+        path = []
+        state = target
+        while state is not None and state is not common:
+            path.append(state)
+            state = state.parent
+        for state in reversed(path):
+            self.__enter(state)
+        state = target
+        while state.children:
+            if state.initial is None:
+                raise RuntimeError(f"state {state.path} has sub-states but no initial sub-state")
+            state = state.children[state.initial]
+            self.__enter(state)
+        self.__leaf = state
+        if state.final:
+            self.__finished_at = clock.monotonic()
+
+    def __enter(self, state: State):
+        if not state.final:
+            # Time spent in a final state is after the mission, so it is not timed
+            self.__entered_at[state.path] = clock.monotonic()
+        self.__visits[state.path] = self.__visits.get(state.path, 0) + 1
+        if state.on_enter is not None:
+            state.on_enter()
+
+    def __exit(self, state: State):
+        if state.on_exit is not None:
+            state.on_exit()
+        entered_at = self.__entered_at.pop(state.path, None)
+        if entered_at is not None:
+            self.__total_time[state.path] = self.__total_time.get(state.path, 0.0) + clock.monotonic() - entered_at
@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+SensorSnapshot = namedtuple("SensorSnapshot", ["colour", "distance", "touch", "travelled", "elapsed"])
+SensorSnapshot.__doc__ = """Everything a stop condition can look at, read once per tick of Chassis.drive_until:
+the latest colour name, distance (cm) and touch state of the SensorHub, the distance
+travelled since the move began (m, negative backwards) and the time elapsed (s)."""
+
+Outcome = namedtuple("Outcome", ["condition", "snapshot", "overshoot"])
+Outcome.__doc__ = """Result of Chassis.drive_until: the condition which fired, the snapshot it fired
+on, and how far (m) the robot travelled past the point where it became true before coming to rest."""
+
+
+class Condition:
+    """
+    A condition on which a move stops, evaluated on a SensorSnapshot.
+
+    Conditions compose with `&` and `|`, e.g. colour_is("black") &
+    travelled(0.3) stops on the first black reading after 30 cm. Several
+    conditions passed to Chassis.drive_until are checked together on every
+    tick, the first one holding ending the move.
+
+    :ivar name: Describes the condition, to report which one fired.
+    :type name: str
+    :ivar position: Distance travelled (m) at which the condition becomes
+        true, when known in advance, which makes the overshoot exact.
+    :type position: float
+    :ivar ahead: Predicate holding once the robot is within a given distance
+        (m) of the condition holding, for conditions on distances, which lets
+        a stop be triggered early to make up for the stopping distance.
+    :type ahead: Callable[[SensorSnapshot, float], bool]
+    Author: Jack McDonald
+    """
+
+    def __init__(self, name: str, predicate, position: float = None, ahead=None):
+        """
+        :param name: Describes the condition.
+        :type name: str
+        :param predicate: A callable receiving a SensorSnapshot and returning True when the move should stop.
+        :type predicate: Callable[[SensorSnapshot], bool]
+        :param position: Distance travelled (m) at which the condition becomes true, if known in advance.
+        :type position: float
+        :param ahead: A callable receiving a SensorSnapshot and a distance (m), and returning True once
+            the condition is that close to holding. Conditions which cannot be foreseen leave it None.
+        :type ahead: Callable[[SensorSnapshot, float], bool]
+        Author: Jack McDonald
+        """
+        self.name = name
+        self.predicate = predicate
+        self.position = position
+        self.ahead = ahead
+
+    def __call__(self, snapshot: SensorSnapshot) -> bool:
+        return self.predicate(snapshot)
+
+    def __repr__(self) -> str:
+        return f"Condition({self.name})"
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return Condition(f"({self.name} and {other.name})", lambda snapshot: self(snapshot) and other(snapshot),
+                         ahead=lambda snapshot, lead: self.anticipate(snapshot, lead) and other.anticipate(snapshot, lead))
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return Condition(f"({self.name} or {other.name})", lambda snapshot: self(snapshot) or other(snapshot),
+                         ahead=lambda snapshot, lead: self.anticipate(snapshot, lead) or other.anticipate(snapshot, lead))
+
+    def anticipate(self, snapshot: SensorSnapshot, lead: float) -> bool:
+        """
+        Whether the condition holds, or will within `lead` metres of travel.
+        Conditions which cannot be foreseen, like a colour or a press of the
+        touch sensor, only hold once they do.
+        """
+        if self.ahead is None or lead <= 0:
+            return self(snapshot)
+        return self.ahead(snapshot, lead)
+
+    def fired_at(self, snapshot: SensorSnapshot) -> float:
+        """
+        The distance travelled (m, in either direction) at which the condition
+        became true, given the first snapshot it held on. Unless it is known in
+        advance, this is the distance of that snapshot, as it can only have
+        become true since the previous one.
+        """
+        return abs(snapshot.travelled) if self.position is None else self.position
+
+
+def colour_is(*colours: str) -> Condition:
+    """Holds once the colour sensor reads one of the given colour names."""
+    return Condition(f"colour in {colours}", lambda snapshot: snapshot.colour in colours)
+
+
+def distance_below(distance: float) -> Condition:
+    """Holds once the ultrasonic sensor reads `distance` centimetres or less."""
+    return Condition(f"distance <= {distance} cm",
+                     lambda snapshot: snapshot.distance is not None and 0 < snapshot.distance <= distance,
+                     ahead=lambda snapshot, lead: (snapshot.distance is not None
+                                                   and 0 < snapshot.distance <= distance + 100 * lead))
+
+
+def travelled(distance: float) -> Condition:
+    """Holds once the wheels have travelled `distance` metres, in either direction, since the move began."""
+    return Condition(f"travelled {distance} m", lambda snapshot: abs(snapshot.travelled) >= distance,
+                     position=distance, ahead=lambda snapshot, lead: abs(snapshot.travelled) >= distance - lead)
+
+
+def elapsed(seconds: float) -> Condition:
+    """Holds once `seconds` have passed since the move began."""
+    return Condition(f"elapsed {seconds} s", lambda snapshot: snapshot.elapsed >= seconds)
+
+
+def touched() -> Condition:
+    """Holds once the touch sensor is pressed."""
+    return Condition("touched", lambda snapshot: bool(snapshot.touch))
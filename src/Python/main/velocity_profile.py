@@ -0,0 +1,160 @@
+import math
+from array import array
+
+
+class VelocityProfile:
+    """
+    Speed setpoints of an acceleration-limited move, precomputed for a fixed
+    streaming rate.
+
+    A move is built from phases of constant jerk, each given as its duration,
+    the acceleration it starts with, and its jerk, and the position is
+    integrated over them exactly. A trapezoidal profile ramps the speed up at
+    constant acceleration, cruises, and ramps it down again. An S-curve
+    profile also limits the jerk, so the acceleration itself ramps up and
+    down and the wheels are never hit with a step in torque.
+
+    The profile is sampled once per period: positions[k] is the distance
+    covered at the end of period k, and speeds[k] the average speed over it,
+    so streaming each speed for one period covers exactly the distance of the
+    move. As averages of a speed that changes by at most `acceleration` per
+    second, consecutive setpoints never differ by more than acceleration * period.
+
+    Distances, speeds and accelerations are in whatever unit the caller
+    uses, which for MotorController is degrees of wheel rotation.
+
+    :ivar period: Time between two setpoints, in seconds.
+    :type period: float
+    :ivar speeds: Average speed over each period.
+    :type speeds: array[float]
+    :ivar positions: Distance covered at the end of each period.
+    :type positions: array[float]
+    :ivar duration: Time the move takes, in seconds.
+    :type duration: float
+    Author: Jack McDonald
+    """
+
+    def __init__(self, phases: list, rate: float):
+        """
+        Samples a move made of phases of constant jerk.
+
+        :param phases: (duration, starting acceleration, jerk) of each phase, in order.
+        :type phases: list[tuple[float, float, float]]
+        :param rate: Number of setpoints per second.
+        :type rate: float
+        Author: Jack McDonald
+        """
+        self.period = 1 / rate
+        self.duration = sum(duration for duration, _, _ in phases)
+        self.positions = array("d")
+        self.speeds = array("d")
+
+        # Position and speed at the start of each phase
+        starts = []
+        position = speed = 0.0
+        for duration, acceleration, jerk in phases:
+            starts.append((position, speed))
+            position += speed * duration + acceleration * duration ** 2 / 2 + jerk * duration ** 3 / 6
+            speed += acceleration * duration + jerk * duration ** 2 / 2
+        distance = position
+
+        phase, phase_start = 0, 0.0
+        previous = 0.0
+        for k in range(1, math.ceil(self.duration / self.period - 1e-9) + 1):
+            t = min(k * self.period, self.duration)
+            while phase < len(phases) - 1 and t > phase_start + phases[phase][0]:
+                phase_start += phases[phase][0]
+                phase += 1
+            if t >= self.duration:
+                position = distance  # Lands exactly on the end, whatever the rounding
+            else:
+                duration, acceleration, jerk = phases[phase]
+                start_position, start_speed = starts[phase]
+                dt = t - phase_start
+                position = start_position + start_speed * dt + acceleration * dt ** 2 / 2 + jerk * dt ** 3 / 6
+            self.positions.append(position)
+            self.speeds.append((position - previous) / self.period)
+            previous = position
+
+    def __len__(self) -> int:
+        return len(self.speeds)
+
+    @property
+    def distance(self) -> float:
+        return self.positions[-1] if self.positions else 0.0
+
+    @classmethod
+    def trapezoidal(cls, distance: float, max_speed: float, acceleration: float, rate: float) -> "VelocityProfile":
+        """
+        Creates a profile which accelerates at a constant rate up to the
+        peak speed, cruises, then decelerates at the same rate. Moves too
+        short to reach the peak speed become triangular.
+
+        :param distance: Length of the move, which must not be negative.
+        :type distance: float
+        :param max_speed: Peak speed.
+        :type max_speed: float
+        :param acceleration: Acceleration and deceleration.
+        :type acceleration: float
+        :param rate: Number of setpoints per second.
+        :type rate: float
+        :return: The profile.
+        :rtype: VelocityProfile
+        Author: Jack McDonald
+        """
+        peak = min(max_speed, math.sqrt(distance * acceleration))
+        if peak <= 0:
+            return cls([], rate)
+        ramp = peak / acceleration
+        cruise = (distance - peak * ramp) / peak
+        return cls([(ramp, acceleration, 0.0), (cruise, 0.0, 0.0), (ramp, -acceleration, 0.0)], rate)
+
+    @classmethod
+    def s_curve(cls, distance: float, max_speed: float, acceleration: float, jerk: float,
+                rate: float) -> "VelocityProfile":
+        """
+        Creates a profile which also limits the jerk, so the acceleration
+        ramps up to its limit and back down rather than switching on and off.
+        Moves too short to reach the peak speed or the acceleration limit use
+        the highest speed they can still stop from in time.
+
+        :param distance: Length of the move, which must not be negative.
+        :type distance: float
+        :param max_speed: Peak speed.
+        :type max_speed: float
+        :param acceleration: Largest acceleration and deceleration.
+        :type acceleration: float
+        :param jerk: Rate at which the acceleration changes.
+        :type jerk: float
+        :param rate: Number of setpoints per second.
+        :type rate: float
+        :return: The profile.
+        :rtype: VelocityProfile
+        Author: Jack McDonald
+        """
+        def ramp(speed):
+            # Time spent with the acceleration changing, then constant, reaching `speed` from rest
+            if speed * jerk >= acceleration ** 2:
+                return acceleration / jerk, speed / acceleration - acceleration / jerk
+            return math.sqrt(speed / jerk), 0.0
+
+        def ramp_distance(speed):
+            changing, constant = ramp(speed)
+            return speed * (2 * changing + constant) / 2  # The speed rises symmetrically, so averages speed / 2
+
+        peak = max_speed
+        if 2 * ramp_distance(peak) > distance:
+            # The distance needed to reach and leave a speed grows with it, so bisect for the one that fits
+            low, high = 0.0, max_speed
+            for _ in range(60):
+                peak = (low + high) / 2
+                low, high = (peak, high) if 2 * ramp_distance(peak) <= distance else (low, peak)
+            peak = low
+        if peak <= 0:
+            return cls([], rate)
+        changing, constant = ramp(peak)
+        top = jerk * changing  # Largest acceleration reached
+        cruise = (distance - 2 * ramp_distance(peak)) / peak
+        return cls([(changing, 0.0, jerk), (constant, top, 0.0), (changing, top, -jerk),
+                    (cruise, 0.0, 0.0),
+                    (changing, 0.0, -jerk), (constant, -top, 0.0), (changing, -top, jerk)], rate)
@@ -0,0 +1,109 @@
+import pytest
+
+from project.utils import clock
+from sensor_hub import Reading
+
+
+class FakeMotor:
+    """Stands in for a drive Motor: the encoder is set by the test, the speed follows set_dps."""
+
+    def __init__(self):
+        self.encoder = 0
+        self.dps = None
+        self.speed = 0.0
+
+    def get_encoder(self):
+        return self.encoder
+
+    def get_speed(self):
+        return self.speed
+
+    def set_dps(self, dps):
+        self.dps = dps
+        self.speed = dps
+
+    def set_power(self, power):
+        if power == 0:
+            self.speed = 0.0
+
+    def set_limits(self, power=0, dps=0):
+        pass
+
+
+class FakeScheduler:
+    def add_task(self, name, func, frequency):
+        pass
+
+
+class FakeMotorController:
+    WHEEL_RADIUS = 0.02
+    AXLE_LENGTH = 0.05
+
+    def __init__(self):
+        self.motor_left = FakeMotor()
+        self.motor_right = FakeMotor()
+
+    def stop(self):
+        self.motor_left.set_power(0)
+        self.motor_right.set_power(0)
+
+    def set_wheel_speeds(self, left, right):
+        self.motor_left.set_dps(left)
+        self.motor_right.set_dps(right)
+
+    def set_wheel_targets(self, left, right, speed):
+        for motor, target in ((self.motor_left, left), (self.motor_right, right)):
+            motor.set_dps(speed)
+            motor.set_position(target)
+
+    def check_halted(self):
+        pass
+
+
+class FakeSensors:
+    """Stands in for a SensorController: every sensor returns the value set by the test, and its reads are counted."""
+    sensor_process = None
+
+    def __init__(self, colour="white", distance=100, touch=False):
+        self.values = {"colour": colour, "distance": distance, "touch": touch}
+        self.reads = {name: 0 for name in self.values}
+
+    def read(self, name):
+        self.reads[name] += 1
+        return self.values[name]
+
+    def get_colour_name(self):
+        return self.read("colour")
+
+    def get_us_sensor_distance(self):
+        return self.read("distance")
+
+    def get_touch_sensor_state(self):
+        return self.read("touch")
+
+
+class FakeSensorHub:
+    """Holds the latest value of each sensor, and calls the subscribers of whatever is published."""
+
+    def __init__(self, **values):
+        self.scheduler = FakeScheduler()
+        self.values = values
+        self.subscribers = {}
+
+    def get_value(self, name):
+        return self.values.get(name)
+
+    def subscribe(self, name, callback):
+        self.subscribers.setdefault(name, []).append(callback)
+
+    def publish(self, name, value, timestamp=0.0):
+        self.values[name] = value
+        for callback in self.subscribers.get(name, []):
+            callback(Reading(value, timestamp))
+
+
+@pytest.fixture
+def virtual_clock():
+    clock.set_clock(clock.VirtualClock())
+    yield
+    clock.restore_default_clock()
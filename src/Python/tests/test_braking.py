@@ -0,0 +1,36 @@
+import pytest
+
+from braking import BrakingModel
+from stop_conditions import SensorSnapshot, colour_is, distance_below, travelled
+
+
+def test_stopping_distance_is_learnt_per_speed():
+    model = BrakingModel(distance_to_degrees=1000)
+    model.record(100, 0.1, 0.01)
+    model.record(300, 0.2, 0.05)
+    assert model.stopping_distance(100) == pytest.approx(0.01)
+    assert model.stopping_distance(200) == pytest.approx(0.03)
+    assert model.stopping_distance(50) == pytest.approx(0.005)
+    assert model.stopping_distance(600) == pytest.approx(0.2)  # Scaled with the square of the speed
+    assert model.latency(200) == pytest.approx(0.15)
+
+    model.record(300, 0.2, 0.09)
+    assert model.stopping_distance(300) == pytest.approx(0.05 + BrakingModel.SMOOTHING * 0.04)
+
+
+def test_braking_speed_fits_the_distance_left():
+    model = BrakingModel(distance_to_degrees=1000)
+    model.record(100, 0.1, 0.01)
+    model.record(300, 0.2, 0.05)
+    assert model.braking_speed(1.0, 300) == 300
+    assert model.stopping_distance(model.braking_speed(0.03, 300)) == pytest.approx(0.03)
+    assert model.braking_speed(0.0, 300) == BrakingModel.MIN_SPEED
+
+
+def test_distance_conditions_fire_early_by_the_lead():
+    snapshot = SensorSnapshot("white", 14, False, 0.47, 1.0)
+    assert not distance_below(10)(snapshot)
+    assert distance_below(10).anticipate(snapshot, 0.05)
+    assert travelled(0.5).anticipate(snapshot, 0.05)
+    assert not colour_is("black").anticipate(snapshot, 0.05)  # A line cannot be seen coming
+    assert (colour_is("black") | distance_below(10)).anticipate(snapshot, 0.05)
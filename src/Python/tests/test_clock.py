@@ -0,0 +1,59 @@
+import time
+from threading import Event, Thread
+
+from project.utils import clock
+from scheduler import Rate
+
+
+def test_virtual_sleep_does_not_take_real_time():
+    virtual = clock.VirtualClock()
+    started = time.monotonic()
+    virtual.sleep(60)
+    assert virtual.monotonic() == 60
+    assert time.monotonic() - started < 1
+
+
+def test_threads_are_released_in_deadline_order():
+    virtual = clock.VirtualClock()
+    log = []
+
+    def ticker(name, period):
+        for _ in range(3):
+            virtual.sleep(period)
+            log.append((virtual.monotonic(), name))
+
+    threads = [Thread(target=ticker, args=("fast", 1)), Thread(target=ticker, args=("slow", 2.5))]
+    for thread in threads:
+        virtual.attach(thread)
+        thread.start()
+    virtual.sleep(10)
+    assert log == [(1, "fast"), (2, "fast"), (2.5, "slow"), (3, "fast"), (5.0, "slow"), (7.5, "slow")]
+
+
+def test_wait_returns_when_event_is_set():
+    virtual = clock.VirtualClock()
+    event = Event()
+
+    def setter():
+        virtual.sleep(3)
+        event.set()
+
+    thread = Thread(target=setter)
+    virtual.attach(thread)
+    thread.start()
+    assert virtual.wait(event, timeout=10)
+    assert virtual.monotonic() == 3
+    assert not virtual.wait(Event(), timeout=2)
+    assert virtual.monotonic() == 5
+
+
+def test_rate_runs_on_the_installed_clock():
+    clock.set_clock(clock.VirtualClock())
+    try:
+        rate = Rate(1)
+        for _ in range(100):
+            rate.sleep()
+        assert clock.monotonic() == 100
+        assert rate.stats.max_jitter == 0
+    finally:
+        clock.restore_default_clock()
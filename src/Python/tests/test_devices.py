@@ -0,0 +1,67 @@
+import pytest
+
+from project.utils import clock
+from project.utils.brick import Sensor
+from project.utils.devices import DeviceRegistry
+
+
+class ConfiguringSensor(Sensor):
+    """Reports valid data `delay` seconds after it is created, as a sensor whose port is being configured."""
+
+    def __init__(self, port, delay):
+        self.port = port
+        self.ready_at = clock.monotonic() + delay
+
+    def get_status(self):
+        return Sensor.Status.VALID_DATA if clock.monotonic() >= self.ready_at else Sensor.Status.CONFIGURING
+
+
+def make_registry(delays, timeout=5):
+    registry = DeviceRegistry(timeout)
+    created = []
+
+    def factory(port, delay):
+        def create():
+            created.append(port)
+            return ConfiguringSensor(port, delay)
+        return create
+
+    for port, delay in enumerate(delays, start=1):
+        registry.register(f"sensor{port}", factory(port, delay))
+    return registry, created
+
+
+def test_devices_are_created_on_first_use(virtual_clock):
+    registry, created = make_registry([0.1, 0.1])
+    assert created == []
+    assert not registry.is_created("sensor1")
+
+    sensor = registry.get("sensor1")
+    assert created == [1]
+    assert registry.is_created("sensor1") and not registry.is_created("sensor2")
+    assert registry.get("sensor1") is sensor
+    assert created == [1]
+    assert registry.names() == ["sensor1", "sensor2"]
+
+
+def test_initialize_waits_for_the_sensors_together(virtual_clock):
+    registry, created = make_registry([0.3, 0.5, 0.2])
+    start = clock.monotonic()
+    devices = registry.initialize()
+    # As long as the slowest sensor, not the sum of all three
+    assert clock.monotonic() - start == pytest.approx(0.5, abs=0.05)
+    assert sorted(created) == [1, 2, 3]
+    assert all(device.get_status() == Sensor.Status.VALID_DATA for device in devices.values())
+    assert registry.get("sensor2") is devices["sensor2"]
+    assert sorted(created) == [1, 2, 3]
+
+
+def test_a_sensor_never_ready_times_out(virtual_clock, capsys):
+    registry, _ = make_registry([0.1, 60], timeout=1)
+    start = clock.monotonic()
+    with pytest.raises(TimeoutError, match="port 2"):
+        registry.initialize()
+    assert clock.monotonic() - start == pytest.approx(1, abs=0.05)
+    assert "not ready" in capsys.readouterr().err
+    # Neither sensor was kept, so both are brought up again on the next attempt
+    assert not registry.is_created("sensor1") and not registry.is_created("sensor2")
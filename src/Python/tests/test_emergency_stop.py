@@ -0,0 +1,79 @@
+import sys
+
+import pytest
+
+from chassis import Chassis
+from conftest import FakeMotor, FakeSensorHub
+from emergency_stop import EmergencyStop
+from motor import MotorController, MotorsHalted
+from stop_conditions import elapsed
+
+
+class PressingHub(FakeSensorHub):
+    """Presses the emergency stop on the given read of the colour sensor, as if from the watcher thread."""
+
+    def __init__(self, emergency_stop, press_on):
+        super().__init__(colour="white")
+        self.emergency_stop = emergency_stop
+        self.press_on = press_on
+        self.reads = 0
+
+    def get_value(self, name):
+        if name == "colour":
+            self.reads += 1
+            if self.reads == self.press_on:
+                self.emergency_stop.trigger()
+        return super().get_value(name)
+
+
+class FakeRobot:
+    def __init__(self, sensor_hub):
+        self.sensor_hub = sensor_hub
+
+
+def make_chassis():
+    controller = MotorController()
+    controller.motor_left, controller.motor_right, controller.motor_dispenser = FakeMotor(), FakeMotor(), FakeMotor()
+    stop = EmergencyStop(None, on_stop=controller.halt)
+    chassis = Chassis(FakeRobot(PressingHub(stop, press_on=5)))
+    chassis.MotorController = controller
+    return chassis, controller
+
+
+def test_stop_latches_the_motors_of_a_running_drive(virtual_clock):
+    chassis, controller = make_chassis()
+    commands = []
+
+    def governor(snapshot, speed):
+        # Commands the wheels on every tick, as the line follower does
+        commands.append(speed)
+        return speed + 1
+
+    with pytest.raises(MotorsHalted):
+        chassis.drive_until(elapsed(10), speed=100, governor=governor)
+    # The stop lands in the fifth snapshot, and the governor's command right after it is refused
+    assert len(commands) == 5
+    assert controller.motor_left.speed == controller.motor_right.speed == 0
+    with pytest.raises(MotorsHalted):
+        controller.set_wheel_speeds(100, 100)
+    assert controller.motor_left.speed == 0
+
+    controller.release()
+    controller.set_wheel_speeds(100, 100)
+    assert controller.motor_left.speed == 100
+
+
+class ReleasedButton:
+    def get_value(self):
+        return 0
+
+
+def test_stop_restores_the_switch_interval():
+    before = sys.getswitchinterval()
+    stop = EmergencyStop(ReleasedButton())
+    stop.start()
+    try:
+        assert sys.getswitchinterval() == pytest.approx(min(before, EmergencyStop.SWITCH_INTERVAL))
+    finally:
+        stop.stop()
+    assert sys.getswitchinterval() == before
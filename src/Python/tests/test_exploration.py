@@ -0,0 +1,50 @@
+import random
+
+from exploration import Explorer
+from grid import Cell, Grid
+from navigation import FORWARD, NORTH, TURN_RIGHT, Navigation
+
+
+def make_explorer(rows=5, cols=5, position=(2, 2)):
+    navigation = Navigation()
+    navigation.search_array = Grid(rows, cols)
+    navigation.search_array[position] = Cell.CURRENT
+    navigation.position, navigation.heading = position, NORTH
+    navigation.set_costs(forward_time=1.0, turn_time=2.0, around_time=3.0)
+    return navigation, Explorer(navigation)
+
+
+def test_frontier_is_updated_incrementally():
+    navigation, explorer = make_explorer(12, 12, (6, 6))
+    assert explorer.frontier == {(5, 6), (7, 6), (6, 5), (6, 7)}
+    random.seed(3)
+    for _ in range(200):
+        tile = (random.randrange(12), random.randrange(12))
+        if navigation.search_array.is_free(tile) and random.random() < 0.8:
+            navigation.update_position(*tile)
+        else:
+            navigation.set_cell(*tile, random.choice([Cell.WALL, Cell.FURNITURE, Cell.UNSEARCHED]))
+        incremental = set(explorer.frontier)
+        explorer.rescan()
+        assert incremental == explorer.frontier
+
+
+def test_direct_writes_trigger_a_rescan():
+    navigation, explorer = make_explorer()
+    navigation.search_array[2, 3] = Cell.SEARCHED
+    target, route = explorer.next_target()
+    assert (2, 4) in explorer.frontier
+
+
+def test_best_target_trades_gain_against_time():
+    navigation, explorer = make_explorer()
+    # Straight ahead is as informative as to the side, and quicker to reach
+    assert explorer.next_target() == ((1, 2), [FORWARD])
+    navigation.set_cell(1, 2, Cell.WALL)
+    target, route = explorer.next_target()
+    assert target in ((2, 1), (2, 3), (3, 2))
+    navigation.set_cell(2, 1, Cell.WALL)
+    navigation.set_cell(3, 2, Cell.WALL)
+    assert explorer.next_target() == ((2, 3), [TURN_RIGHT, FORWARD])
+    navigation.set_cell(2, 3, Cell.WALL)
+    assert explorer.next_target() is None
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import FakeMotorController
+from gyro_turning import GyroTurner
+from project.utils import clock
+
+
+class FakeMotors(FakeMotorController):
+    ORIENTATION_TO_DEGREES = 2.0
+    MOTOR_POLL_DELAY = 0.02
+
+
+class FakeGyro:
+    """Turns with the wheels, from a heading of `start`, whenever it is read. Counts clockwise, as the EV3 gyro."""
+
+    def __init__(self, motors, start=0.0):
+        self.motors = motors
+        self.heading = start
+        self.read = None
+
+    def get_both_measure(self):
+        now = clock.monotonic()
+        rate = (self.motors.motor_left.speed - self.motors.motor_right.speed) / 2 / self.motors.ORIENTATION_TO_DEGREES
+        if self.read is not None:
+            self.heading += rate * (now - self.read)
+        self.read = now
+        return [self.heading, rate]
+
+
+def test_wheel_speed_slows_down_to_the_minimum_near_the_target():
+    turner = GyroTurner(FakeMotors(), None)
+    assert turner.wheel_speed(90, 180) == 180
+    assert turner.wheel_speed(0.5, 180) < turner.wheel_speed(2, 180) < 180
+    assert turner.wheel_speed(0, 180) == GyroTurner.MIN_SPEED
+
+
+@pytest.mark.parametrize("angle", [90, -90, 180])
+def test_turn_stops_on_the_measured_heading(virtual_clock, angle):
+    motors = FakeMotors()
+    gyro = FakeGyro(motors, start=37.0)
+    turned = GyroTurner(motors, gyro).turn(angle, 180)
+    assert turned == pytest.approx(angle, abs=1.0)
+    assert 37.0 - gyro.heading == pytest.approx(angle, abs=1.0)  # The gyro counts clockwise
+    assert motors.motor_left.speed == motors.motor_right.speed == 0
+
+
+def test_turn_gives_up_without_a_gyro_reading(virtual_clock):
+    motors = FakeMotors()
+
+    class SilentGyro:
+        def get_both_measure(self):
+            return None
+
+    assert GyroTurner(motors, SilentGyro()).turn(90) is None
+    assert motors.motor_left.speed == 0
+
+
+def test_turn_does_not_wait_forever_for_a_wheel_to_stop(virtual_clock):
+    motors = FakeMotors()
+    motors.motor_left.set_power = lambda power: None  # The wheel ignores the stop
+    gyro = FakeGyro(motors)
+    start = clock.monotonic()
+    GyroTurner(motors, gyro).turn(90, 180)
+    assert clock.monotonic() - start < 90 / 180 * motors.ORIENTATION_TO_DEGREES + GyroTurner.SETTLE_TIMEOUT + 0.1
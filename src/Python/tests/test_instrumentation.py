@@ -0,0 +1,103 @@
+import json
+from threading import Event, Thread
+
+import pytest
+
+from project.utils import brick, clock, instrumentation
+from project.utils.instrumentation import Histogram, Instrumentation
+
+
+def test_histogram_percentiles_follow_the_buckets():
+    histogram = Histogram()
+    for _ in range(99):
+        histogram.record(0.0001)
+    histogram.record(0.5)
+    assert histogram.count == 100
+    assert histogram.percentile(50) <= 0.000128
+    assert histogram.percentile(100) == 0.5
+    assert histogram.max == 0.5
+
+
+def test_decorators_report_calls():
+    instruments = Instrumentation()
+
+    class Sensor:
+        @instruments.timed("{cls}.get_value")
+        def get_value(self):
+            return 1
+
+        @instruments.counted()
+        def reset(self):
+            pass
+
+    sensor = Sensor()
+    assert sensor.get_value() == 1
+    sensor.reset()
+    sensor.reset()
+    stats = instruments.stats()
+    assert stats["latencies"]["Sensor.get_value"]["count"] == 1
+    assert stats["counts"] == {"test_decorators_report_calls.<locals>.Sensor.reset": 2}
+
+
+def test_disabled_instruments_record_nothing():
+    instruments = Instrumentation()
+    instruments.enabled = False
+    instruments.tick("loop")
+    instruments.count("command")
+    assert instruments.stats()["loops"] == {}
+    assert instruments.stats()["counts"] == {}
+
+
+def test_recent_rate_does_not_depend_on_other_readers(virtual_clock):
+    instruments = Instrumentation()
+    for _ in range(10):
+        instruments.tick("loop")
+        clock.sleep(0.1)
+    first = instruments.stats()
+    for _ in range(20):
+        instruments.tick("loop")
+        clock.sleep(0.1)
+    instruments.stats()  # Another reader in between changes nothing
+    assert instruments.stats(first)["loops"]["loop"]["recent_rate"] == pytest.approx(10)
+    assert instruments.stats()["loops"]["loop"]["recent_rate"] == pytest.approx(10)
+    assert instruments.stats(first)["loops"]["loop"]["iterations"] == 30
+
+
+def test_dump_measures_recent_rates_between_its_own_lines(virtual_clock, tmp_path):
+    instruments = Instrumentation()
+    path = str(tmp_path / "stats.jsonl")
+    instruments.start_dump(path, period=1.0)
+    for rate in (10, 50):
+        for _ in range(rate):
+            instruments.tick("loop")
+            clock.sleep(1 / rate)
+        instruments.stats()  # Another reader in between changes nothing
+    instruments.stop_dump()
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+    # Give or take the tick landing on the same instant as the dump
+    assert [line["loops"]["loop"]["recent_rate"] for line in lines[:2]] == [pytest.approx(10, abs=1),
+                                                                             pytest.approx(50, abs=1)]
+
+
+def test_set_dps_is_counted_once():
+    motor = brick.Motor("A")
+    instrumentation.reset()
+    motor.set_dps(100)
+    counts = instrumentation.stats()["counts"]
+    assert counts.get("Motor.set_dps") == 1
+    assert "Motor.set_limits" not in counts
+
+
+def test_threads_sharing_a_name_each_get_a_cpu_time():
+    release = Event()
+    threads = [Thread(target=release.wait, name="worker", daemon=True) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        times = Instrumentation.thread_cpu_times()
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert {f"worker-{thread.ident}" for thread in threads} <= set(times)
@@ -0,0 +1,105 @@
+import itertools
+
+import pytest
+
+from chassis import Chassis
+from conftest import FakeMotor, FakeMotorController
+from motor import MotorController
+import sensors
+from line_following import LEFT_EDGE, RIGHT_EDGE, PID, LineFollower
+from sensors import SensorController
+from stop_conditions import SensorSnapshot
+
+
+def at(elapsed):
+    return SensorSnapshot(None, None, None, 0.0, elapsed)
+
+
+def test_pid_terms_and_integral_clamp():
+    pid = PID(2.0, ki=1.0, kd=0.5, integral_limit=0.3)
+    assert pid.update(1.0, 0.1) == pytest.approx(2.0 + 0.1)  # No derivative on the first update
+    assert pid.update(1.0, 0.1) == pytest.approx(2.0 + 0.2)
+    for _ in range(10):
+        output = pid.update(1.0, 0.1)
+    assert output == pytest.approx(2.0 + 0.3)
+    assert pid.update(0.0, 0.1) == pytest.approx(0.3 - 0.5 * 10)
+
+
+@pytest.mark.parametrize("edge", [LEFT_EDGE, RIGHT_EDGE])
+def test_follower_turns_back_towards_the_line(edge):
+    wheels = FakeMotorController()
+    readings = iter([0.9, 0.5])
+    follower = LineFollower(wheels, lambda: next(readings), edge)
+    assert follower(at(0.0), 100) == 100
+    # Over the floor: turn towards the line, which is on the left for the left edge
+    turning_left = wheels.motor_right.dps > wheels.motor_left.dps
+    assert turning_left == (edge == LEFT_EDGE)
+    assert wheels.motor_left.dps + wheels.motor_right.dps == pytest.approx(200)
+    assert abs(wheels.motor_right.dps - wheels.motor_left.dps) <= 2 * LineFollower.MAX_CORRECTION * 100 + 1e-9
+
+
+def test_follower_leaves_the_wheels_alone_without_a_reading():
+    wheels = FakeMotorController()
+    follower = LineFollower(wheels, lambda: None)
+    assert follower(at(0.0), 100) == 100
+    assert wheels.motor_left.dps is None
+
+
+@pytest.mark.parametrize("raw_rgb, reflectance", [
+    ([SensorController.BLACK_INTENSITY, 0, 0], 0.0),
+    ([SensorController.WHITE_INTENSITY / 2, SensorController.WHITE_INTENSITY / 2, 0], 1.0),
+    (None, None),
+    ([None, None, None], None),  # What the sensor gives when it has no sample
+])
+def test_reflectance_is_scaled_between_black_and_white(monkeypatch, raw_rgb, reflectance):
+    monkeypatch.setattr(sensors, "get_raw_rgb", lambda: raw_rgb)
+    assert SensorController().get_reflectance() == reflectance
+
+
+def test_calibration_scales_between_the_darkest_and_brightest_readings(monkeypatch):
+    monkeypatch.setattr(sensors, "get_raw_rgb", lambda: [300, 200, 100, 0])
+    controller = SensorController()
+    assert controller.calibrate_reflectance([850, None, 150, 400])
+    assert controller.reflectance_calibrated
+    assert controller.get_reflectance() == pytest.approx((600 - 150) / (850 - 150))
+
+
+def test_calibration_keeps_the_estimates_without_both_a_line_and_the_floor():
+    controller = SensorController()
+    assert not controller.calibrate_reflectance([800, 850, None])
+    assert not controller.calibrate_reflectance([])
+    assert not controller.reflectance_calibrated
+    assert (controller.black_intensity, controller.white_intensity) == (SensorController.BLACK_INTENSITY,
+                                                                        SensorController.WHITE_INTENSITY)
+
+
+class SweptSensors(SensorController):
+    """Crosses the line back and forth as the sensor is swept."""
+
+    def __init__(self):
+        super().__init__()
+        self.intensities = itertools.cycle([850, 600, 180, 600])
+
+    def get_intensity(self):
+        return next(self.intensities)
+
+
+class SweptRobot:
+    def __init__(self):
+        self.sensors = SweptSensors()
+
+
+def test_chassis_sweeps_across_the_line_and_back_to_calibrate(virtual_clock):
+    chassis = Chassis(SweptRobot())
+    controller = MotorController()
+    controller.motor_left, controller.motor_right = FakeMotor(), FakeMotor()
+    chassis.MotorController = controller
+    commands = []
+    set_wheel_speeds = controller.set_wheel_speeds
+    controller.set_wheel_speeds = lambda left, right: (commands.append((left, right)), set_wheel_speeds(left, right))
+    assert chassis.calibrate_line_sensor()
+    assert (chassis.robot.sensors.black_intensity, chassis.robot.sensors.white_intensity) == (180, 850)
+    # Turns one way, twice as far back, and returns to where it started, then stops
+    speed = controller.TRN_SPEED
+    assert commands == [(-speed, speed), (speed, -speed), (-speed, speed)]
+    assert controller.motor_left.speed == controller.motor_right.speed == 0
@@ -0,0 +1,92 @@
+import pytest
+
+from chassis import Chassis
+from conftest import FakeMotor, FakeMotorController, FakeScheduler, FakeSensorHub
+from grid import STEPS
+from localisation import Localiser
+from motor import MotorController
+from navigation import TURN_LEFT, TURN_RIGHT, Navigation
+from odometry import Odometry
+
+TILE = 0.25
+
+
+def make_localiser():
+    odometry = Odometry(FakeMotorController(), scheduler=FakeScheduler())
+    odometry.set_pose(0.0, 0.0, 0.0, ((1e-3, 0.0, 0.0), (0.0, 1e-3, 0.0), (0.0, 0.0, 1e-3)))
+    hub = FakeSensorHub()
+    return Localiser(odometry, Navigation(), hub, tile_length=TILE), odometry, hub
+
+
+def test_line_crossing_corrects_drift():
+    localiser, odometry, hub = make_localiser()
+    # Odometry believes it is 3 cm short of the line it is crossing
+    odometry.set_pose(TILE / 2 - 0.03, 0.01, 0.0, odometry.pose.covariance)
+    hub.publish("colour", "white")
+    hub.publish("colour", "black")
+    hub.publish("colour", "black")
+    assert localiser.corrections == 1
+    assert odometry.pose.x == pytest.approx(TILE / 2, abs=0.005)
+    assert odometry.pose.y == pytest.approx(0.01)
+    assert odometry.pose.covariance[0][0] < 1e-3
+
+
+def test_crossing_far_from_any_line_is_rejected():
+    localiser, odometry, hub = make_localiser()
+    odometry.set_pose(0.01, 0.0, 0.0, odometry.pose.covariance)
+    hub.publish("colour", "black")
+    assert localiser.rejected == 1
+    assert odometry.pose.x == 0.01
+
+
+def test_cell_changes_update_navigation():
+    localiser, odometry, hub = make_localiser()
+    odometry.set_pose(TILE, 0.0, 0.0)
+    localiser.update()
+    assert localiser.cell == (1, 1)
+    assert localiser.navigation.position == (1, 1)
+    assert localiser.navigation.search_array[2, 1] == 's'
+    assert localiser.navigation.search_array[1, 1] == 'c'
+
+
+class PositionedMotor(FakeMotor):
+    """Reaches every position command at once, and reports moving on the next speed read only."""
+
+    def __init__(self):
+        super().__init__()
+        self.moving = False
+
+    def set_limits(self, power=0, dps=0):
+        pass
+
+    def set_position_relative(self, degrees):
+        self.encoder += degrees
+        self.moving = True
+
+    def get_speed(self):
+        moving, self.moving = self.moving, False
+        return 1 if moving else 0
+
+
+@pytest.mark.parametrize("turn", [TURN_LEFT, TURN_RIGHT])
+def test_turns_keep_the_localiser_and_the_navigation_heading_together(virtual_clock, turn):
+    chassis = Chassis(None)
+    controller = chassis.MotorController
+    controller.motor_left, controller.motor_right = PositionedMotor(), PositionedMotor()
+    odometry = Odometry(controller, scheduler=FakeScheduler())
+    navigation = Navigation()
+    # From the middle of the arena, so either turn leads to a free tile
+    localiser = Localiser(odometry, navigation, FakeSensorHub(), origin=(1, 1))
+    start = localiser.cell
+    odometry.update()
+
+    getattr(chassis, turn)()
+    navigation.turned(turn)
+    odometry.update()
+    controller.move_distance_forward(MotorController.SQUARE_LENGTH, MotorController.FWD_SPEED)
+    odometry.update()
+    localiser.update()
+
+    step = STEPS[navigation.heading]
+    assert localiser.cell == (start[0] + step[0], start[1] + step[1])
+    assert navigation.position == localiser.cell
@@ -0,0 +1,89 @@
+import math
+import random
+
+import pytest
+
+import mapping
+from conftest import FakeMotorController, FakeScheduler, FakeSensorHub
+from grid import Cell
+from localisation import Localiser
+from mapping import Mapper, OccupancyMap
+from navigation import Navigation
+from odometry import Odometry
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    """Runs a test once with the pure Python occupancy map, and once with the NumPy one if NumPy is installed."""
+    if request.param == "numpy":
+        if numpy is None:
+            pytest.skip("NumPy is not installed")
+        monkeypatch.setattr(mapping, "numpy", numpy)
+    else:
+        monkeypatch.setattr(mapping, "numpy", None)
+    return request.param
+
+
+def test_ray_marks_crossed_cells_free_and_end_occupied(backend):
+    occupancy = OccupancyMap(0.0, 0.0, 1.0, 1.0, resolution=0.1)
+    occupancy.update([(0.05, 0.05, 0.0)], [0.5])
+    assert occupancy.get(5, 0) == pytest.approx(OccupancyMap.OCCUPIED)
+    assert [occupancy.get(i, 0) for i in range(5)] == pytest.approx([OccupancyMap.FREE] * 5)
+    assert occupancy.get(6, 0) == 0.0
+    assert occupancy.get(0, 1) == 0.0
+    # Out of range readings only clear the cells they cross
+    occupancy.update([(0.05, 0.15, 0.0)], [OccupancyMap.MAX_RANGE])
+    assert [occupancy.get(i, 1) for i in range(10)] == pytest.approx([OccupancyMap.FREE] * 10)
+
+
+def test_diagonal_ray_marks_the_corner_it_cuts(backend):
+    occupancy = OccupancyMap(0.0, 0.0, 1.0, 1.0, resolution=0.05)
+    # Leaves cell (0, 0) through its top edge just before its corner, so it crosses (0, 1) for under a centimetre
+    occupancy.update([(0.02, 0.025, math.pi / 4)], [0.5])
+    assert occupancy.get(0, 1) == pytest.approx(OccupancyMap.FREE)
+    assert occupancy.get(1, 0) == 0.0
+    assert [occupancy.get(k, k) for k in range(1, 7)] == pytest.approx([OccupancyMap.FREE] * 6)
+    assert [occupancy.get(k, k + 1) for k in range(1, 7)] == pytest.approx([OccupancyMap.FREE] * 6)
+
+
+def test_furniture_is_found_from_a_distance(backend):
+    hub = FakeSensorHub()
+    odometry = Odometry(FakeMotorController(), scheduler=FakeScheduler())
+    navigation = Navigation()
+    localiser = Localiser(odometry, navigation, hub)
+    mapper = Mapper(odometry, localiser, hub)
+    length = localiser.tile_length
+
+    # From the start tile, something one tile ahead, across the middle of the tile
+    for _ in range(5):
+        for angle in (-0.1, -0.05, 0.0, 0.05, 0.1):
+            odometry.set_pose(0.0, 0.0, angle)
+            hub.publish("distance", length / math.cos(angle) * 100)
+    mapper.update()
+    assert navigation.search_array[1, 1] == Cell.FURNITURE
+    assert navigation.search_array[0, 1] == Cell.UNSEARCHED
+    assert navigation.search_array[1, 0] == Cell.UNSEARCHED
+
+
+def test_numpy_and_python_maps_agree_on_a_random_batch(monkeypatch):
+    if numpy is None:
+        pytest.skip("NumPy is not installed")
+    generator = random.Random(17)
+    poses = [(generator.uniform(0.0, 1.0), generator.uniform(0.0, 1.0), generator.uniform(-math.pi, math.pi))
+             for _ in range(20)]
+    ranges = [generator.uniform(0.05, 1.5) for _ in poses]
+    log_odds = {}
+    for name, module in (("python", None), ("numpy", numpy)):
+        monkeypatch.setattr(mapping, "numpy", module)
+        occupancy = OccupancyMap(0.0, 0.0, 1.0, 1.0, resolution=0.05)
+        occupancy.update(poses, ranges)
+        log_odds[name] = [occupancy.get(i, j) for i in range(occupancy.rows) for j in range(occupancy.cols)]
+    # Few enough readings that no cell reaches the clamp, where the two differ
+    assert max(abs(value) for value in log_odds["python"]) < OccupancyMap.LIMIT
+    assert any(value > 0 for value in log_odds["python"]) and any(value < 0 for value in log_odds["python"])
+    assert log_odds["numpy"] == pytest.approx(log_odds["python"])
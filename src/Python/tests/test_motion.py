@@ -0,0 +1,104 @@
+import pytest
+
+from conftest import FakeMotor, FakeMotorController
+from motion import MotionQueue, Segment
+from project.utils import clock
+
+
+class TravellingMotor(FakeMotor):
+    """Runs to its position target at the commanded speed, on the clock, unless stalled."""
+
+    def __init__(self, stall_at=None):
+        super().__init__()
+        self.stall_at = stall_at
+        self.target = 0
+        self.targets = []
+        self.time = clock.monotonic()
+
+    def set_position(self, target):
+        self.advance()
+        self.target = target
+        self.targets.append(target)
+
+    def get_encoder(self):
+        self.advance()
+        return self.encoder
+
+    def get_speed(self):
+        self.advance()
+        return 0 if self.encoder == self.target or self.encoder == self.stall_at else self.speed
+
+    def advance(self):
+        now = clock.monotonic()
+        step = abs(self.speed) * (now - self.time)
+        self.time = now
+        position = self.encoder + max(-step, min(step, self.target - self.encoder))
+        if self.stall_at is not None and min(self.encoder, position) <= self.stall_at <= max(self.encoder, position):
+            position = self.stall_at
+        self.encoder = position
+
+
+class FakeController(FakeMotorController):
+    DISTANCE_TO_DEGREES = 1000
+    ORIENTATION_TO_DEGREES = 2
+    FWD_SPEED = 100
+    TRN_SPEED = 180
+    POWER_LIMIT = 80
+    MOTOR_POLL_DELAY = 0.02
+
+    def __init__(self, stall_at=None):
+        super().__init__()
+        self.motor_left = TravellingMotor()
+        self.motor_right = TravellingMotor(stall_at)
+
+
+def test_plan_merges_moves_the_wheels_run_through():
+    queue = MotionQueue(FakeController())
+    queue.straight(0.5)
+    queue.straight(0.5)
+    queue.rotate(90)
+    queue.rotate(90)
+    queue.rotate(-90)
+    queue.straight(0.25)
+    segments = queue.plan(10, 20)
+    assert segments == [
+        Segment(1010, 1020, 100),
+        Segment(650, 1380, 180),
+        Segment(830, 1200, 180),
+        Segment(1080, 1450, 100),
+    ]
+
+
+def test_plan_keeps_moves_at_different_speeds_apart():
+    queue = MotionQueue(FakeController())
+    queue.straight(0.1, speed=100)
+    queue.straight(0.1, speed=200)
+    assert [segment.left for segment in queue.plan(0, 0)] == pytest.approx([100, 200])
+
+
+def test_run_hands_over_and_ends_on_the_last_target(virtual_clock):
+    controller = FakeController()
+    queue = MotionQueue(controller)
+    queue.straight(0.2)
+    queue.rotate(90)
+    started = clock.monotonic()
+    assert queue.run()
+    assert controller.motor_left.targets == [200, 20]
+    assert controller.motor_right.targets == [200, 380]
+    assert (controller.motor_left.encoder, controller.motor_right.encoder) == (20, 380)
+    assert controller.motor_left.get_speed() == controller.motor_right.get_speed() == 0
+    # The rotation is commanded before the straight move has finished
+    assert clock.monotonic() - started < 200 / 100 + 180 / 180 + controller.MOTOR_POLL_DELAY
+    assert queue.moves == []
+
+
+def test_run_gives_up_on_a_stalled_wheel(virtual_clock):
+    controller = FakeController(stall_at=50)
+    queue = MotionQueue(controller)
+    queue.straight(0.2)
+    queue.straight(-0.1, speed=50)
+    started = clock.monotonic()
+    assert not queue.run()
+    assert clock.monotonic() - started == pytest.approx(200 / 100 + MotionQueue.TIMEOUT, abs=0.05)
+    assert controller.motor_right.targets == [200]  # The second move is abandoned
+    assert controller.motor_left.speed == controller.motor_right.speed == 0
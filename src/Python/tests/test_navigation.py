@@ -0,0 +1,90 @@
+import pytest
+
+from grid import Cell, Grid
+from navigation import EAST, FORWARD, NORTH, TURN_AROUND, TURN_LEFT, TURN_RIGHT, WEST, Navigation
+
+
+def test_route_turns_towards_goal():
+    navigation = Navigation()
+    assert navigation.route_to((1, 1)) == [FORWARD]
+    assert navigation.route_to((0, 2)) in ([FORWARD, TURN_RIGHT, FORWARD, TURN_LEFT, FORWARD],
+                                           [FORWARD, FORWARD, TURN_RIGHT, FORWARD])
+    assert navigation.route_to((2, 1), start=(1, 1), heading=NORTH) == [TURN_AROUND, FORWARD]
+    assert navigation.route_to((1, 0), start=(1, 1), heading=EAST) == [TURN_AROUND, FORWARD]
+    assert navigation.route_to((1, 2), start=(1, 1), heading=WEST) == [TURN_AROUND, FORWARD]
+
+
+def test_obstacles_are_avoided_and_tables_rebuilt():
+    navigation = Navigation()
+    assert navigation.distance((2, 1), (0, 1)) == 2
+    navigation.set_cell(1, 1, 'f')
+    assert navigation.route_to((1, 1)) is None
+    assert navigation.route_to((0, 1)) is None
+    navigation.set_cell(1, 1, 'u')
+    navigation.set_cell(0, 1, 'f')
+    assert navigation.distance((1, 0), (1, 2)) == 2
+    assert navigation.distance((0, 0), (0, 2)) == 4
+
+
+def test_next_route_leads_to_first_tile_of_tour():
+    navigation = Navigation()
+    assert navigation.get_next_route() == [FORWARD]
+    navigation.update_position(1, 1)
+    tour = navigation.plan_search()
+    assert navigation.get_next_route() == navigation.route_to(tour[0])
+    assert navigation.search_queue == tour[1:]
+
+
+def test_search_order_minimises_time_with_turn_costs():
+    navigation = Navigation()
+    navigation.set_costs(forward_time=1.0, turn_time=5.0, around_time=9.0)
+    tour = navigation.plan_search()
+    assert sorted(tour) == [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]
+    snake = [(1, 1), (1, 0), (0, 0), (0, 1), (0, 2), (1, 2)]
+    assert navigation.tour_time(tour) <= navigation.tour_time(snake)
+    # The heuristic comes close to the optimum found by trying every order
+    navigation.EXACT_TOUR_LIMIT = 0
+    assert navigation.tour_time(navigation.plan_search()) <= 1.1 * navigation.tour_time(tour)
+    assert navigation.travel_time((0, 1)) == 2.0
+    assert navigation.route_to((0, 2)) == [FORWARD, FORWARD, TURN_RIGHT, FORWARD]
+
+
+def test_replanning_repairs_route_around_new_furniture():
+    navigation = Navigation()
+    navigation.search_array = Grid(5, 5)
+    navigation.position, navigation.heading = (4, 2), NORTH
+    assert navigation.replan_route((0, 2)) == [FORWARD] * 4
+    navigation.update_position(3, 2)
+    navigation.set_cell(1, 2, 'f')
+    route = navigation.replan_route((0, 2))
+    # Round the furniture: two tiles more than straight ahead
+    assert route.count(FORWARD) == 5
+    assert route[:2] == [FORWARD, TURN_LEFT] or route[:2] == [FORWARD, TURN_RIGHT]
+    navigation.set_cell(1, 2, 'u')
+    assert navigation.replan_route((0, 2)) == [FORWARD] * 3
+
+
+def test_grid_queries_and_versions():
+    grid = Grid.from_rows([['u', 'u', 'u'], ['u', 'f', 'u'], ['w', 'c', 'w']])
+    assert grid[1, 1] == Cell.FURNITURE and grid[2, 1] == 'c'
+    assert grid.find(Cell.WALL, Cell.FURNITURE) == [(1, 1), (2, 0), (2, 2)]
+    assert grid.counts()[Cell.UNSEARCHED] == 5
+    assert grid.neighbours((1, 0)) == [(0, 0)]
+    snapshot = grid.snapshot()
+    grid[0, 0] = Cell.SEARCHED
+    assert (grid.version, grid.layout_version) == (1, 0)
+    grid[1, 1] = Cell.UNSEARCHED
+    assert grid.layout_version == 1
+    grid.restore(snapshot)
+    assert grid.to_rows() == [['u', 'u', 'u'], ['u', 'f', 'u'], ['w', 'c', 'w']]
+    assert grid.layout_version == 2
+
+
+@pytest.mark.parametrize("tile", [(-1, 0), (0, -1), (2, 0), (0, 3), (1, 3)])
+def test_tiles_off_the_grid_are_refused(tile):
+    grid = Grid(2, 3)
+    with pytest.raises(IndexError):
+        grid[tile]
+    with pytest.raises(IndexError):
+        grid[tile] = Cell.WALL
+    assert grid.version == 0
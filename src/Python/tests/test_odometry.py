@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+from conftest import FakeMotorController, FakeScheduler
+from odometry import Odometry
+
+
+def drive(odometry, controller, left, right, steps=100):
+    odometry.update()
+    for _ in range(steps):
+        controller.motor_left.encoder += left / steps
+        controller.motor_right.encoder += right / steps
+        odometry.update()
+
+
+def test_straight_line():
+    controller = FakeMotorController()
+    odometry = Odometry(controller, scheduler=FakeScheduler())
+    degrees = 0.5 / (math.pi * controller.WHEEL_RADIUS) * 180
+    drive(odometry, controller, degrees, degrees)
+    pose = odometry.pose
+    assert pose.x == pytest.approx(0.5)
+    assert pose.y == pytest.approx(0.0)
+    assert pose.theta == pytest.approx(0.0)
+    assert pose.covariance[0][0] > 0
+
+
+def test_turn_in_place():
+    controller = FakeMotorController()
+    odometry = Odometry(controller, scheduler=FakeScheduler())
+    # A left turn, as MotorController.rotate(90) drives it: the right wheel forwards, the left backwards
+    degrees = 90 * controller.AXLE_LENGTH / controller.WHEEL_RADIUS
+    drive(odometry, controller, -degrees, degrees)
+    pose = odometry.pose
+    assert pose.theta == pytest.approx(math.pi / 2)
+    assert math.hypot(pose.x, pose.y) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_set_pose_replaces_estimate():
+    controller = FakeMotorController()
+    odometry = Odometry(controller, scheduler=FakeScheduler())
+    odometry.set_pose(1.0, 2.0, math.pi)
+    degrees = 0.1 / (math.pi * controller.WHEEL_RADIUS) * 180
+    drive(odometry, controller, degrees, degrees)
+    assert odometry.pose.x == pytest.approx(0.9)
+    assert odometry.pose.y == pytest.approx(2.0)
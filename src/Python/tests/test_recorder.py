@@ -0,0 +1,63 @@
+from project.utils import brick, clock
+from recorder import COMMAND, READ, MissionRecorder, MissionReplay, RECORD, read_log
+
+
+def test_records_reads_and_commands(tmp_path):
+    path = str(tmp_path / "mission.log")
+    brick.BP.set_sensor_type(brick.BP.PORT_2, brick.BP.SENSOR_TYPE.EV3_ULTRASONIC_CM)
+    brick.BP.set_sensor(brick.BP.PORT_2, 42)
+    with MissionRecorder(path) as recorder:
+        brick.BP.get_sensor(brick.BP.PORT_2)
+        brick.BP.set_motor_power(brick.PORTS["A"], 30)
+    records = list(read_log(path))
+    assert recorder.records == 2
+    assert [(r.kind, r.operation, r.values) for r in records] == [
+        (READ, "get_sensor", (42.0,)),
+        (COMMAND, "set_motor_power", (30.0,)),
+    ]
+    assert records[0].timestamp <= records[1].timestamp
+
+
+def test_partial_last_record_is_ignored(tmp_path):
+    path = str(tmp_path / "mission.log")
+    with MissionRecorder(path):
+        brick.BP.set_motor_power(brick.PORTS["A"], 0)
+    with open(path, "ab") as file:
+        file.write(b"\0" * (RECORD.size // 2))
+    assert len(list(read_log(path))) == 1
+
+
+def test_replay_feeds_sensor_values(tmp_path):
+    path = str(tmp_path / "mission.log")
+    brick.BP.set_sensor_type(brick.BP.PORT_2, brick.BP.SENSOR_TYPE.EV3_ULTRASONIC_CM)
+    with MissionRecorder(path):
+        for distance in (10, 20, 30):
+            brick.BP.set_sensor(brick.BP.PORT_2, distance)
+            brick.BP.get_sensor(brick.BP.PORT_2)
+    brick.BP.set_sensor(brick.BP.PORT_2, 0)
+    assert MissionReplay(path, speed=None).run() == 3
+    assert brick.BP.get_sensor(brick.BP.PORT_2) == 30
+
+
+def test_records_are_written_out_within_the_flush_interval(tmp_path, virtual_clock):
+    path = str(tmp_path / "mission.log")
+    recorder = MissionRecorder(path)
+    recorder.start()
+    try:
+        brick.BP.set_motor_power(brick.PORTS["A"], 10)
+        assert list(read_log(path)) == []  # Still buffered
+        clock.sleep(MissionRecorder.FLUSH_INTERVAL)
+        brick.BP.set_motor_power(brick.PORTS["A"], 20)
+        assert [record.values for record in read_log(path)] == [(10.0,), (20.0,)]
+        brick.BP.set_motor_power(brick.PORTS["A"], 30)
+    finally:
+        recorder.stop()
+    assert len(list(read_log(path))) == 3
+
+
+def test_recording_truncates_an_earlier_log(tmp_path):
+    path = str(tmp_path / "mission.log")
+    for power in (10, 20):
+        with MissionRecorder(path):
+            brick.BP.set_motor_power(brick.PORTS["A"], power)
+    assert [record.values for record in read_log(path)] == [(20.0,)]
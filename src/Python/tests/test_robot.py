@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import robot as robot_module
+from motor import MotorsHalted
+from robot import Robot
+
+BACKGROUND = {"SensorHub.run_async", "Odometry.run_async", "Localiser.run_async", "Mapper.run_async"}
+
+
+@pytest.mark.parametrize("halted", [False, True])
+def test_run_async_cancels_the_background_coroutines(monkeypatch, halted):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "")
+    robot = Robot()
+    running = {}
+
+    async def mission(activities):
+        await asyncio.sleep(0.05)
+        for task in asyncio.all_tasks():
+            running[task.get_coro().__qualname__] = task
+        if halted:
+            raise MotorsHalted("the emergency stop was pressed")
+
+    monkeypatch.setattr(robot.state_machine, "run_async", mission)
+
+    async def main():
+        await robot.run_async()
+        await asyncio.sleep(0.01)  # Lets the cancellations land
+
+    try:
+        asyncio.run(main())
+    finally:
+        if not halted:
+            robot.stop()
+    assert BACKGROUND <= set(running)
+    assert all(running[name].cancelled() for name in BACKGROUND)
+    assert robot.state == "idle"
+
+
+def test_with_a_sensor_process_the_control_process_leaves_its_sensors_alone(monkeypatch):
+    initialized = []
+    monkeypatch.setattr(robot_module.DEVICES, "initialize", lambda names=None: initialized.append(names))
+    monkeypatch.setattr(robot_module.DEVICES, "get", lambda name: None)
+    monkeypatch.setattr(robot_module, "SensorProcess", lambda: object())
+    Robot(sensor_process=True)
+    assert initialized == [("touch",)]
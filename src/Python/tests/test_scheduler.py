@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from scheduler import AsyncRate, Rate, Scheduler, TaskStats, sleep_until
+
+
+def test_sleep_until_reaches_deadline():
+    deadline = time.monotonic() + 0.01
+    sleep_until(deadline)
+    assert time.monotonic() >= deadline
+
+
+def test_task_stats_counts_overruns():
+    stats = TaskStats(period=0.01)
+    stats.record(jitter=0.001, duration=0.005)
+    stats.record(jitter=0.003, duration=0.02)
+    assert stats.iterations == 2
+    assert stats.overruns == 1
+    assert stats.max_jitter == 0.003
+    assert abs(stats.mean_jitter - 0.002) < 1e-9
+
+
+def test_rate_does_not_drift():
+    rate = Rate(100)
+    start = time.monotonic()
+    for _ in range(20):
+        time.sleep(0.002)
+        rate.sleep()
+    elapsed = time.monotonic() - start
+    assert 0.19 <= elapsed < 0.25
+    assert rate.stats.iterations == 20
+
+
+def test_rate_skips_missed_periods():
+    rate = Rate(100)
+    time.sleep(0.05)
+    rate.sleep()
+    assert rate.stats.missed_deadlines >= 3
+
+
+def test_async_rate_paces_concurrent_loops():
+    async def loop(frequency, iterations):
+        rate = AsyncRate(frequency)
+        for _ in range(iterations):
+            await asyncio.sleep(0.002)
+            await rate.sleep()
+        return rate
+
+    async def main():
+        start = time.monotonic()
+        rates = await asyncio.gather(loop(100, 20), loop(50, 10))
+        return rates, time.monotonic() - start
+
+    (fast, slow), elapsed = asyncio.run(main())
+    assert 0.19 <= elapsed < 0.25  # Both loops share the event loop rather than running one after the other
+    assert fast.stats.iterations == 20 and slow.stats.iterations == 10
+    assert fast.stats.missed_deadlines == slow.stats.missed_deadlines == 0
+
+
+def test_async_rate_skips_missed_periods():
+    async def main():
+        rate = AsyncRate(100)
+        time.sleep(0.05)  # Blocks the event loop
+        await rate.sleep()
+        return rate
+
+    assert asyncio.run(main()).stats.missed_deadlines >= 3
+
+
+def test_scheduler_runs_tasks_at_their_frequencies():
+    counts = {"fast": 0, "slow": 0}
+    scheduler = Scheduler("test")
+    scheduler.add_task("fast", lambda: counts.__setitem__("fast", counts["fast"] + 1), 200)
+    scheduler.add_task("slow", lambda: counts.__setitem__("slow", counts["slow"] + 1), 20)
+    scheduler.start()
+    time.sleep(0.5)
+    scheduler.stop()
+    assert 80 <= counts["fast"] <= 102
+    assert 8 <= counts["slow"] <= 11
+    stats = scheduler.get_stats()
+    assert stats["fast"].iterations == counts["fast"]
+
+
+def test_scheduler_records_missed_deadlines():
+    scheduler = Scheduler("test")
+    scheduler.add_task("slow", lambda: time.sleep(0.035), 100)
+    scheduler.start()
+    time.sleep(0.2)
+    scheduler.stop()
+    stats = scheduler.get_stats()["slow"]
+    assert stats.overruns == stats.iterations
+    assert stats.missed_deadlines > 0
+
+
+def test_scheduler_can_be_stopped_from_a_task():
+    scheduler = Scheduler("test")
+    scheduler.add_task("stop", scheduler.stop, 100)
+    scheduler.start()
+    time.sleep(0.05)
+    assert not scheduler.is_running()
+
+
+def test_scheduler_survives_a_failing_task(capsys):
+    counts = {"ok": 0}
+
+    def fail():
+        raise ValueError("broken task")
+
+    scheduler = Scheduler("test")
+    scheduler.add_task("fail", fail, 100)
+    scheduler.add_task("ok", lambda: counts.__setitem__("ok", counts["ok"] + 1), 100)
+    scheduler.start()
+    time.sleep(0.1)
+    assert scheduler.is_running()
+    scheduler.stop()
+    stats = scheduler.get_stats()
+    assert stats["fail"].errors == stats["fail"].iterations >= 5
+    assert stats["ok"].errors == 0
+    assert counts["ok"] >= 5
+    assert "ValueError: broken task" in capsys.readouterr().err
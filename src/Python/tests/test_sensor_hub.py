@@ -0,0 +1,168 @@
+import asyncio
+from threading import Thread
+
+import pytest
+
+from conftest import FakeSensors
+from project.utils import clock
+from sensor_hub import SensorHub
+
+
+def start_hub(sensors, **rates):
+    hub = SensorHub(sensors, rates=rates)
+    hub.start()
+    return hub
+
+
+def in_background(target):
+    """Runs `target` on a thread attached to the clock, and returns a list its result is appended to."""
+    result = []
+    thread = Thread(target=lambda: result.append(target()), daemon=True)
+    clock.attach(thread)
+    thread.start()
+    return thread, result
+
+
+def test_wait_for_gives_up_after_the_timeout(virtual_clock):
+    hub = start_hub(FakeSensors())
+    try:
+        start = clock.monotonic()
+        assert hub.wait_for("colour", lambda colour: colour == "black", timeout=0.5) is None
+        assert clock.monotonic() - start == pytest.approx(0.5, abs=0.02)
+    finally:
+        hub.stop()
+
+
+def test_wait_for_returns_at_once_when_the_predicate_already_holds(virtual_clock):
+    hub = start_hub(FakeSensors())
+    try:
+        clock.sleep(0.1)
+        now = clock.monotonic()
+        reading = hub.wait_for("colour", lambda colour: colour == "white", timeout=1)
+        assert reading == hub.get("colour")
+        assert reading.value == "white"
+        assert clock.monotonic() == now
+    finally:
+        hub.stop()
+
+
+def test_wait_for_wakes_on_the_first_matching_reading(virtual_clock):
+    sensors = FakeSensors()
+    hub = start_hub(sensors)
+
+    def world():
+        clock.sleep(0.3)
+        sensors.values["colour"] = "black"
+
+    thread, _ = in_background(world)
+    try:
+        reading = hub.wait_for("colour", lambda colour: colour == "black", timeout=2)
+        assert reading.value == "black"
+        assert 0.3 <= reading.timestamp <= 0.3 + 1 / SensorHub.DEFAULT_RATES["colour"] + 1e-9
+    finally:
+        hub.stop()
+        thread.join()
+
+
+def test_stop_wakes_every_waiter(virtual_clock):
+    hub = start_hub(FakeSensors())
+    waiters = [in_background(lambda: hub.wait_for("colour", lambda colour: colour == "black")) for _ in range(3)]
+    clock.sleep(0.2)
+    hub.stop()
+    for thread, result in waiters:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert result == [None]
+    assert hub.wait_for("colour", lambda colour: colour == "black") is None  # Does not block once stopped
+
+
+def test_each_sensor_is_sampled_at_its_own_rate(virtual_clock):
+    sensors = FakeSensors()
+    hub = start_hub(sensors, colour=100, distance=25, touch=200)
+    try:
+        clock.sleep(1)
+    finally:
+        hub.stop()
+    assert sensors.reads["colour"] == pytest.approx(100, abs=2)
+    assert sensors.reads["distance"] == pytest.approx(25, abs=2)
+    assert sensors.reads["touch"] == pytest.approx(200, abs=2)
+
+
+def test_subscribers_get_every_reading_until_they_unsubscribe(virtual_clock):
+    sensors = FakeSensors()
+    hub = SensorHub(sensors, rates={"distance": 50})
+    readings = []
+    hub.subscribe("distance", readings.append)
+    hub.start()
+    try:
+        clock.sleep(0.5)
+        hub.unsubscribe("distance", readings.append)
+        received = len(readings)
+        clock.sleep(0.5)
+    finally:
+        hub.stop()
+    assert received == pytest.approx(25, abs=2)
+    assert len(readings) == received
+    assert [reading.value for reading in readings] == [100] * received
+    timestamps = [reading.timestamp for reading in readings]
+    assert timestamps == sorted(timestamps) and len(set(timestamps)) == received
+
+
+def run_hub_async(sensors, waiter):
+    """Samples `sensors` with run_async while `waiter` runs on the hub, and returns the waiter's result."""
+    async def main():
+        hub = SensorHub(sensors, rates={"colour": 100, "distance": 100, "touch": 100})
+        sampler = asyncio.create_task(hub.run_async())
+        try:
+            return await waiter(hub)
+        finally:
+            hub.stop()
+            await sampler
+
+    return asyncio.run(main())
+
+
+def test_wait_for_async_resolves_on_a_matching_reading():
+    sensors = FakeSensors()
+
+    async def waiter(hub):
+        asyncio.get_running_loop().call_later(0.05, sensors.values.__setitem__, "colour", "black")
+        return await hub.wait_for_async("colour", lambda colour: colour == "black", timeout=2)
+
+    reading = run_hub_async(sensors, waiter)
+    assert reading.value == "black"
+
+
+def test_wait_for_async_times_out():
+    async def waiter(hub):
+        return await hub.wait_for_async("colour", lambda colour: colour == "black", timeout=0.05)
+
+    assert run_hub_async(FakeSensors(), waiter) is None
+
+
+def test_cancelled_wait_for_async_stops_waiting():
+    sensors = FakeSensors()
+
+    async def waiter(hub):
+        wait = asyncio.create_task(hub.wait_for_async("colour", lambda colour: colour == "black"))
+        await asyncio.sleep(0.05)
+        wait.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await wait
+        # The sampler carries on, and later waits are still resolved
+        sensors.values["colour"] = "black"
+        return wait, await hub.wait_for_async("colour", lambda colour: colour == "black", timeout=1)
+
+    wait, reading = run_hub_async(sensors, waiter)
+    assert wait.cancelled()
+    assert reading.value == "black"
+
+
+def test_stop_resolves_async_waiters():
+    async def waiter(hub):
+        wait = asyncio.create_task(hub.wait_for_async("colour", lambda colour: colour == "black"))
+        await asyncio.sleep(0.05)
+        hub.stop()
+        return await asyncio.wait_for(wait, 1)
+
+    assert run_hub_async(FakeSensors(), waiter) is None
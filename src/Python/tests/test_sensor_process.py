@@ -0,0 +1,107 @@
+import time
+
+from project.utils import brick
+from recorder import MissionRecorder
+from sensor_process import SampleRing, SensorProcess, _write_sample
+from sensors import SensorController
+
+
+def test_latest_sample_is_read_back():
+    ring = SampleRing(slots=8)
+    try:
+        assert ring.latest() is None
+        ring.write(1.5, [10, 20, 30, 0])
+        ring.write(2.5, 42)
+        assert ring.latest() == ((42.0,), 2.5)
+        assert ring.count() == 2
+    finally:
+        ring.close()
+
+
+def test_overwritten_samples_are_skipped():
+    ring = SampleRing(slots=4)
+    try:
+        for i in range(10):
+            ring.write(float(i), i)
+        samples = ring.read_since(0)
+        assert [sequence for sequence, _ in samples] == [7, 8, 9, 10]
+        assert samples[-1][1].value == (9.0,)
+    finally:
+        ring.close()
+
+
+def test_reader_attaches_by_name():
+    ring = SampleRing(slots=8)
+    reader = SampleRing(ring.name, create=False)
+    try:
+        ring.write(0.5, None)
+        assert reader.latest() == (None, 0.5)
+        assert reader.slots == 8
+    finally:
+        reader.close()
+        ring.close()
+
+
+def test_a_colour_sample_without_values_reads_as_unknown():
+    ring = SampleRing(slots=8)
+    try:
+        ring.write(0.5, [None, None, None])
+
+        class Process:
+            def get_value(self, name):
+                return ring.latest().value
+
+        assert ring.latest().value == (None, None, None)
+        assert SensorController(Process()).get_colour_name() == "unknown"
+        assert SensorController(Process()).get_reflectance() is None
+    finally:
+        ring.close()
+
+
+def test_a_failed_read_is_not_sampled(capsys):
+    ring = SampleRing(slots=8)
+    try:
+        _write_sample(lambda: int(None), ring)
+        assert ring.count() == 0
+        assert "int()" in capsys.readouterr().out
+    finally:
+        ring.close()
+
+
+def wait_for_sample(process, name, predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reading = process.get(name)
+        if reading.timestamp > 0 and predicate(reading.value):
+            return reading
+        time.sleep(0.01)
+    return None
+
+
+def test_worker_samples_the_sensors_it_configured():
+    process = SensorProcess(rates={"rgb": 50, "distance": 50, "touch": 50}, core=None)
+    process.start()
+    try:
+        assert process.is_running()
+        for name in ("rgb", "distance", "touch"):
+            assert wait_for_sample(process, name, lambda value: True) is not None
+    finally:
+        process.stop()
+    assert not process.is_running()
+
+
+def test_worker_replays_a_mission_log(tmp_path):
+    path = str(tmp_path / "mission.log")
+    bp = brick.BP
+    bp.set_sensor_type(bp.PORT_3, bp.SENSOR_TYPE.EV3_ULTRASONIC_CM)
+    with MissionRecorder(path):
+        for distance in (10, 20, 37):
+            bp.set_sensor(bp.PORT_3, distance)
+            bp.get_sensor(bp.PORT_3)
+    process = SensorProcess(rates={"distance": 50}, core=None)
+    process.replay = (path, None)
+    process.start()
+    try:
+        assert wait_for_sample(process, "distance", lambda value: value == 37) is not None
+    finally:
+        process.stop()
@@ -0,0 +1,33 @@
+import pytest
+
+import sensors
+from project.utils import us_sensor
+from sensors import SensorController
+
+
+@pytest.mark.parametrize("raw_rgb, colour", [
+    (None, "unknown"),
+    ([None, None, None], "unknown"),
+    ([120, None, 40], "unknown"),
+    ([695, 205, 99, 0], "red"),
+])
+def test_colour_is_unknown_without_a_complete_sample(monkeypatch, raw_rgb, colour):
+    monkeypatch.setattr(sensors, "get_raw_rgb", lambda: raw_rgb)
+    assert SensorController().get_colour_name() == colour
+
+
+class FakeDevices:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, name):
+        return self
+
+    def get_value(self):
+        return self.value
+
+
+@pytest.mark.parametrize("value, distance", [(None, None), (42.0, 42)])
+def test_distance_is_none_without_a_reading(monkeypatch, value, distance):
+    monkeypatch.setattr(us_sensor, "DEVICES", FakeDevices(value))
+    assert us_sensor.get_distance() == distance
@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import FakeSensorHub, FakeSensors
+from project.utils import clock
+from sensor_hub import SensorHub
+from speed_governor import SpeedGovernor
+
+
+def feed(hub, rate, count, start=0.0):
+    for index in range(count):
+        hub.publish("colour", "white", start + index / rate)
+    return start + count / rate
+
+
+def test_speed_follows_the_measured_sample_rate():
+    hub = FakeSensorHub()
+    governor = SpeedGovernor(hub, max_speed=10000, line_width=0.015, samples_per_line=3, distance_to_degrees=1000)
+    assert governor.speed_limit() == SpeedGovernor.MIN_SPEED  # Nothing measured yet
+
+    end = feed(hub, 20, 200)
+    assert governor.sample_rate == pytest.approx(20)
+    assert governor.speed_limit() == pytest.approx(100)  # 3 samples over 1.5 cm at 20 Hz is 10 cm/s
+
+    feed(hub, 80, 400, start=end)
+    assert governor.sample_rate == pytest.approx(80, rel=1e-3)
+    assert governor(None, 100) == pytest.approx(400, rel=1e-3)
+
+
+def test_speed_is_capped_by_the_drive_loop_and_the_motors():
+    hub = FakeSensorHub()
+    governor = SpeedGovernor(hub, max_speed=260, loop_rate=50, line_width=0.015, samples_per_line=3,
+                             distance_to_degrees=1000)
+    feed(hub, 40, 100)
+    assert governor.speed_limit() == pytest.approx(200)
+    feed(hub, 200, 400, start=10)
+    assert governor.speed_limit() == pytest.approx(250)  # Sampled at 200 Hz, but checked at 50 Hz
+    governor.loop_rate = None
+    assert governor.speed_limit() == 260
+
+
+class WorkerSensors(FakeSensors):
+    """Reads a sensor process which samples at `rate`."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.sensor_process = self
+
+    def sample_time(self, name):
+        return int(clock.monotonic() * self.rate) / self.rate
+
+
+def test_rate_is_that_of_the_worker_samples_not_of_the_hub_polling(virtual_clock):
+    hub = SensorHub(WorkerSensors(50), rates={"colour": 200, "distance": 1, "touch": 1})
+    governor = SpeedGovernor(hub)
+    hub.start()
+    try:
+        clock.sleep(2)
+    finally:
+        hub.stop()
+    assert governor.sample_rate == pytest.approx(50, rel=0.05)
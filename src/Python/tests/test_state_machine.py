@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from state_machine import ANY, StateMachine
+
+
+def build_machine(log):
+    machine = StateMachine("test")
+    machine.add_state("idle", final=True)
+    machine.add_state("Navigation", initial="Move",
+                      on_enter=lambda: log.append("enter Navigation"),
+                      on_exit=lambda: log.append("exit Navigation"))
+    machine.add_state("Navigation.Move",
+                      on_enter=lambda: log.append("enter Move"),
+                      on_exit=lambda: log.append("exit Move"))
+    machine.add_state("Navigation.Turn",
+                      on_enter=lambda: log.append("enter Turn"),
+                      on_exit=lambda: log.append("exit Turn"))
+    machine.add_state("Search")
+    machine.add_transition("Navigation.Move", "done", "Navigation.Turn")
+    machine.add_transition("Navigation.Turn", "done", "Search")
+    machine.add_transition(ANY, "stop", "idle")
+    return machine
+
+
+def test_start_enters_initial_sub_state():
+    log = []
+    machine = build_machine(log)
+    machine.start("Navigation")
+    assert machine.state == "Navigation.Move"
+    assert machine.is_in("Navigation")
+    assert log == ["enter Navigation", "enter Move"]
+
+
+def test_transitions_run_exit_and_entry_actions_in_order():
+    log = []
+    machine = build_machine(log)
+    machine.start("Navigation")
+    log.clear()
+    assert machine.dispatch("done")
+    assert log == ["exit Move", "enter Turn"]
+    log.clear()
+    assert machine.dispatch("done")
+    assert log == ["exit Turn", "exit Navigation"]
+    assert machine.state == "Search"
+
+
+def test_unknown_event_is_not_handled():
+    machine = build_machine([])
+    machine.start("Navigation")
+    assert not machine.dispatch("unknown")
+    assert machine.state == "Navigation.Move"
+
+
+def test_wildcard_transition_applies_to_every_state():
+    machine = build_machine([])
+    machine.start("Navigation")
+    machine.dispatch("stop")
+    assert machine.state == "idle"
+    assert machine.is_finished()
+
+
+def test_guards_select_the_transition():
+    found = []
+    machine = StateMachine("test")
+    machine.add_state("Search")
+    machine.add_state("Done", final=True)
+    machine.add_transition("Search", "done", "Done", guard=lambda: len(found) >= 2)
+    machine.add_transition("Search", "done", "Search")
+    machine.start("Search")
+    machine.run({"Search": lambda: found.append(1)})
+    assert machine.state == "Done"
+    assert machine.get_visits()["Search"] == 2
+
+
+def test_events_dispatched_from_actions_are_queued():
+    machine = StateMachine("test")
+    machine.add_state("A", on_exit=lambda: machine.dispatch("done"))
+    machine.add_state("B")
+    machine.add_state("C")
+    machine.add_transition("A", "go", "B")
+    machine.add_transition("B", "done", "C")
+    machine.start("A")
+    machine.dispatch("go")
+    assert machine.state == "C"
+
+
+def test_stop_queued_by_a_failing_action_is_still_handled():
+    log = []
+    machine = build_machine(log)
+
+    def fail():
+        machine.dispatch("stop")  # As Robot.stop would, from inside the transition
+        raise IOError("motor not responding")
+
+    machine.add_state("Navigation.Fail", on_enter=fail)
+    machine.add_transition("Navigation.Move", "fail", "Navigation.Fail")
+    machine.start("Navigation")
+    with pytest.raises(IOError):
+        machine.dispatch("fail")
+    assert machine.state == "idle"
+    # Later events are handled straight away again
+    assert not machine.dispatch("done")
+
+
+def test_sub_state_without_initial_is_rejected():
+    machine = StateMachine("test")
+    machine.add_state("Parent")
+    machine.add_state("Parent.Child")
+    with pytest.raises(RuntimeError):
+        machine.start("Parent")
+
+
+def test_timings_include_sub_states():
+    machine = build_machine([])
+    machine.start("Navigation")
+    machine.run({
+        "Navigation.Move": lambda: time.sleep(0.02),
+        "Navigation.Turn": lambda: time.sleep(0.05),
+        "Search": lambda: machine.dispatch("stop"),
+    })
+    timings = machine.get_timings()
+    assert timings["Navigation.Turn"] >= 0.05
+    assert timings["Navigation"] >= timings["Navigation.Move"] + timings["Navigation.Turn"]
+    assert machine.slowest() == "Navigation.Turn"
+    assert "Turn" in machine.report()
+    assert [record.target for record in machine.history] == ["Navigation.Turn", "Search", "idle"]
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from chassis import Chassis
+from conftest import FakeMotor, FakeSensorHub
+from project.utils import clock
+from stop_conditions import SensorSnapshot, colour_is, distance_below, elapsed, touched, travelled
+
+
+class DrivenWheel(FakeMotor):
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        self.coasting = False
+
+    def get_encoder(self):
+        # Every read finds the wheel a little further on while driving
+        if self.controller.driving:
+            self.encoder += 10
+        return self.encoder
+
+    def get_speed(self):
+        if self.coasting:
+            # The wheel rolls on for one more step once its power is cut
+            self.coasting = False
+            self.encoder += 10
+            return self.controller.POWERED_SPEED
+        return self.controller.POWERED_SPEED if self.controller.driving else 0
+
+
+class FakeDriveController:
+    DISTANCE_TO_DEGREES = 1000
+    FWD_SPEED = 100
+    POWERED_SPEED = 420  # Wheel speed on the raw power of move_forward, well above FWD_SPEED
+    MOTOR_POLL_DELAY = 0.001
+    SETTLE_TIMEOUT = 1
+
+    def __init__(self):
+        self.driving = False
+        self.speeds = []
+        self.motor_left = DrivenWheel(self)
+        self.motor_right = DrivenWheel(self)
+
+    def move_forward(self):
+        self.driving = True
+
+    def set_forward_speed(self, speed):
+        self.speeds.append(speed)
+        self.driving = True
+
+    def check_halted(self):
+        pass
+
+    def stop(self):
+        if self.driving:
+            self.motor_left.coasting = self.motor_right.coasting = True
+        self.driving = False
+
+
+class FakeRobot:
+    def __init__(self, **values):
+        self.sensor_hub = FakeSensorHub(**values)
+
+
+def snapshot(colour=None, distance=None, touch=False, travelled=0.0, elapsed=0.0):
+    return SensorSnapshot(colour, distance, touch, travelled, elapsed)
+
+
+def test_conditions_and_their_composition():
+    assert colour_is("black", "yellow")(snapshot(colour="yellow"))
+    assert not colour_is("black")(snapshot(colour="white"))
+    assert distance_below(25)(snapshot(distance=25))
+    assert not distance_below(25)(snapshot())  # No reading yet
+    assert travelled(0.5)(snapshot(travelled=-0.5))
+    assert elapsed(2)(snapshot(elapsed=2.5))
+    assert touched()(snapshot(touch=True))
+
+    line_after_a_while = colour_is("black") & travelled(0.3)
+    assert not line_after_a_while(snapshot(colour="black", travelled=0.1))
+    assert line_after_a_while(snapshot(colour="black", travelled=0.4))
+    assert (touched() | elapsed(1))(snapshot(elapsed=1))
+
+
+def test_drive_until_reports_the_condition_which_fired():
+    chassis = Chassis(FakeRobot(colour="white", distance=100))
+    chassis.MotorController = FakeDriveController()
+    target = travelled(0.05)
+    outcome = chassis.drive_until(colour_is("black"), target, elapsed(10))
+    assert outcome.condition is target
+    assert outcome.snapshot.travelled == pytest.approx(0.05)
+    assert outcome.overshoot == pytest.approx(0.01)
+    assert not chassis.MotorController.driving
+
+
+def test_stops_are_learnt_at_the_measured_wheel_speed():
+    chassis = Chassis(FakeRobot(colour="white"))
+    chassis.MotorController = FakeDriveController()
+    chassis.drive_until(travelled(0.05))
+    assert list(chassis.braking.measurements) == [FakeDriveController.POWERED_SPEED]
+
+
+def test_governed_move_without_a_governor_drives_at_the_given_speed():
+    chassis = Chassis(FakeRobot(colour="black"))
+    chassis.MotorController = FakeDriveController()
+    chassis.move_until_colour("black", speed=150, governed=True)
+    assert chassis.MotorController.speeds == [150]
+
+
+def test_drive_without_a_condition_is_refused():
+    chassis = Chassis(FakeRobot(colour="white"))
+    chassis.MotorController = FakeDriveController()
+    with pytest.raises(ValueError):
+        chassis.drive_until(speed=100)
+    with pytest.raises(ValueError):
+        asyncio.run(chassis.drive_until_async())
+    assert not chassis.MotorController.driving
+
+
+class SpinningWheel(DrivenWheel):
+    """Never reports coming to rest."""
+
+    def get_speed(self):
+        return self.controller.POWERED_SPEED
+
+
+def test_a_wheel_which_never_stops_does_not_hang_the_drive(virtual_clock):
+    chassis = Chassis(FakeRobot(colour="black"))
+    controller = chassis.MotorController = FakeDriveController()
+    controller.motor_left = SpinningWheel(controller)
+    start = clock.monotonic()
+    chassis.move_until_colour("black")
+    assert clock.monotonic() - start == pytest.approx(FakeDriveController.SETTLE_TIMEOUT, abs=0.05)
+    assert not controller.driving
+    assert list(chassis.braking.measurements) == []
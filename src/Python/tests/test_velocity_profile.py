@@ -0,0 +1,71 @@
+import pytest
+
+from conftest import FakeMotor
+from motor import MotorController
+from project.utils import clock
+from velocity_profile import VelocityProfile
+
+RATE = 50
+
+
+def steps(values):
+    values = [0.0] + list(values) + [0.0]
+    return [after - before for before, after in zip(values, values[1:])]
+
+
+@pytest.mark.parametrize("distance", [1000, 50])
+def test_trapezoidal_covers_the_distance_within_the_limits(distance):
+    profile = VelocityProfile.trapezoidal(distance, 300, 600, RATE)
+    assert profile.distance == distance
+    assert sum(profile.speeds) * profile.period == pytest.approx(distance)
+    assert max(profile.speeds) <= 300 + 1e-6
+    assert max(abs(step) for step in steps(profile.speeds)) <= 600 / RATE + 1e-6
+
+
+@pytest.mark.parametrize("distance", [1000, 30])
+def test_s_curve_also_limits_the_jerk(distance):
+    profile = VelocityProfile.s_curve(distance, 300, 600, 3000, RATE)
+    assert profile.distance == distance
+    assert sum(profile.speeds) * profile.period == pytest.approx(distance)
+    assert max(profile.speeds) <= 300 + 1e-6
+    assert max(abs(step) for step in steps(profile.speeds)) <= 600 / RATE + 1e-6
+    assert max(abs(step) for step in steps(steps(profile.speeds))) <= 3000 / RATE ** 2 + 1e-6
+
+
+def test_empty_move_has_no_setpoints():
+    assert len(VelocityProfile.s_curve(0, 300, 600, 3000, RATE)) == 0
+    assert VelocityProfile.trapezoidal(0, 300, 600, RATE).distance == 0.0
+
+
+class PositionedMotor(FakeMotor):
+    """Reaches its position target as soon as it is given, unless stuck."""
+
+    def __init__(self, stuck=False):
+        super().__init__()
+        self.stuck = stuck
+
+    def set_position(self, target):
+        if not self.stuck:
+            self.encoder = target
+
+
+@pytest.mark.parametrize("stuck", [False, True])
+def test_profiled_move_gives_up_settling_on_a_stuck_wheel(virtual_clock, stuck):
+    motors = MotorController()
+    motors.motor_left, motors.motor_right = PositionedMotor(), PositionedMotor(stuck)
+    profile = motors.profile(0.1 * motors.DISTANCE_TO_DEGREES, motors.PROFILED_FWD_SPEED)
+    start = clock.monotonic()
+    motors.move_distance_profiled(0.1)
+    settling = clock.monotonic() - start - len(profile) * profile.period
+    if stuck:
+        assert settling == pytest.approx(MotorController.SETTLE_TIMEOUT, abs=0.1)
+        assert motors.motor_left.speed == motors.motor_right.speed == 0
+    else:
+        assert settling < 0.1
+
+
+def test_profiled_quarter_turn_is_no_slower_than_a_constant_speed_turn():
+    motors = MotorController()
+    degrees = 90 * motors.ORIENTATION_TO_DEGREES
+    assert motors.profile(degrees, motors.PROFILED_TRN_SPEED, turn=True).duration <= degrees / motors.TRN_SPEED
+    assert motors.profile(degrees, motors.PROFILED_TRN_SPEED).duration > degrees / motors.TRN_SPEED